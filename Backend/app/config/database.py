@@ -1,7 +1,13 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from pydantic_settings import BaseSettings
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
+import logging
+import re
+
+logger = logging.getLogger(__name__)
 
 
 class Settings(BaseSettings):
@@ -12,6 +18,34 @@ class Settings(BaseSettings):
     DATABASE_PASSWORD: str
     DATABASE_NAME: str
 
+    RULES_FILE: Optional[str] = None
+    RULES_RELOAD_INTERVAL: int = 0
+    RULE_OUTCOME_CACHE_SIZE: int = 4096
+    RULES_SHORT_CIRCUIT: bool = False
+    RULES_PROFILING: bool = False
+    VELOCITY_MAX_KEYS: int = 10000
+
+    CLAIM_LEASE_SECONDS: int = 300
+
+    SCHEDULER_ENABLED: bool = False
+    SCHEDULER_PENDING_CANCEL_HOURS: float = 48
+    SCHEDULER_REVIEW_STUCK_HOURS: float = 4
+    SCHEDULER_BATCH_SIZE: int = 500
+    SCHEDULER_SYNC_SECONDS: float = 5
+
+    EVENT_QUEUE_SIZE: int = 1000
+
+    MAINTENANCE_ENABLED: bool = False
+
+    ORDER_SNAPSHOT_INTERVAL_HOURS: float = 24
+    ORDER_SNAPSHOT_KEEP: int = 60
+
+    TRANSITION_LOG_PARTITIONING: bool = False
+    TRANSITION_LOG_PARTITIONS_AHEAD: int = 3
+    TRANSITION_LOG_RETENTION_MONTHS: int = 0
+    TRANSITION_LOG_ARCHIVE_DIR: str = "archive/transition_logs"
+    TRANSITION_LOG_MAINTENANCE_HOURS: float = 24
+
     class Config:
         env_file = ".env"
         extra = "allow"
@@ -46,6 +80,104 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+def _upgrade_schema(conn) -> None:
+    """
+    Brings tables created by an older version up to date; create_all only
+    creates missing tables.
+
+    Adds orders.state_entered_at, backfilled from creation_date, and
+    order_changes.txid. Missing indexes are built separately, by
+    create_missing_indexes.
+    """
+    inspector = inspect(conn)
+    columns = {column["name"] for column in inspector.get_columns("orders")}
+    if "state_entered_at" not in columns:
+        logger.info("Adding orders.state_entered_at")
+        conn.execute(text("ALTER TABLE orders ADD COLUMN state_entered_at TIMESTAMP"))
+        conn.execute(text("UPDATE orders SET state_entered_at = creation_date"))
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("ALTER TABLE orders ALTER COLUMN state_entered_at SET NOT NULL"))
+
+    if "txid" not in {column["name"] for column in inspector.get_columns("order_changes")}:
+        # Existing entries sort before every new one
+        logger.info("Adding order_changes.txid")
+        conn.execute(text("ALTER TABLE order_changes ADD COLUMN txid BIGINT NOT NULL DEFAULT 0"))
+
+
+def _create_indexes(conn) -> None:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+# Key of the advisory lock held while indexes are built, so only one process builds them
+INDEX_BUILD_LOCK = 7260001
+
+
+async def create_missing_indexes() -> None:
+    """
+    Builds the indexes declared on the models that an older schema lacks.
+
+    On PostgreSQL each one is built with CREATE INDEX CONCURRENTLY on an
+    autocommit connection, so writes to the table continue during the build,
+    and only by the process that gets the advisory lock. An index left invalid
+    by an interrupted build is dropped and built again. Indexes of partitioned
+    tables cannot be built concurrently and are only reported.
+    """
+    if engine.dialect.name != "postgresql":
+        async with engine.begin() as conn:
+            await conn.run_sync(_create_indexes)
+        return
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        if not (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": INDEX_BUILD_LOCK})).scalar():
+            return
+        try:
+            result = await conn.execute(text(
+                "SELECT c.relname, i.indisvalid FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relnamespace = current_schema()::regnamespace"
+            ))
+            valid = dict(result.all())
+            partitioned = set((await conn.execute(text(
+                "SELECT c.relname FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid"
+            ))).scalars())
+
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    if valid.get(index.name):
+                        continue
+                    if table.name in partitioned:
+                        logger.warning("Index %s is missing on partitioned table %s", index.name, table.name)
+                        continue
+                    if index.name in valid:
+                        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}"))
+                    logger.info("Building index %s", index.name)
+                    ddl = str(CreateIndex(index).compile(dialect=conn.dialect))
+                    await conn.execute(text(re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", ddl)))
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": INDEX_BUILD_LOCK})
+
+
 async def init_db():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_schema)
+
+    if settings.TRANSITION_LOG_PARTITIONING and engine.dialect.name == "postgresql":
+        # Imported here: repositories import the models, which import this module
+        from app.repositories.transition_log_partition_repository import TransitionLogPartitionRepository
+
+        async with AsyncSessionLocal() as db:
+            partitions = TransitionLogPartitionRepository(db)
+            if not await partitions.is_partitioned():
+                logger.warning(
+                    "TRANSITION_LOG_PARTITIONING is set but transition_logs already exists unpartitioned; "
+                    "it has to be recreated as a partitioned table before partitions are managed "
+                    "(see TransitionLogPartitionRepository for the migration steps)"
+                )
+                return
+            created = await partitions.ensure_partitions(settings.TRANSITION_LOG_PARTITIONS_AHEAD)
+            if created:
+                logger.info("Created transition log partitions %s", ", ".join(created))
\ No newline at end of file
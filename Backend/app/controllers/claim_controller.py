@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.database import get_db
+from app.repositories.order_repository import OrderRepository
+from app.repositories.order_claim_repository import OrderClaimRepository
+from app.services.order_claim_service import OrderClaimService
+from app.schemas.claim import OrderClaimResponse, ClaimHeartbeatResponse
+from typing import List, Optional
+from uuid import UUID
+
+router = APIRouter(prefix="/orders", tags=["claims"])
+
+
+def _service(db: AsyncSession) -> OrderClaimService:
+    return OrderClaimService(OrderRepository(db), OrderClaimRepository(db))
+
+
+@router.post("/claim", response_model=OrderClaimResponse)
+async def claim_orders(
+    state: str,
+    limit: int = Query(50, ge=1, le=500),
+    worker_id: Optional[str] = Query(None, max_length=100),
+    lease_seconds: Optional[int] = Query(None, ge=1, le=86400),
+    db: AsyncSession = Depends(get_db)
+):
+    """Leases up to limit unclaimed orders in state to the caller; concurrent callers get disjoint batches."""
+    try:
+        return await _service(db).claim(state, limit, worker_id, lease_seconds)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/claims/{lease_id}/heartbeat", response_model=ClaimHeartbeatResponse)
+async def heartbeat_claim(
+    lease_id: UUID,
+    lease_seconds: Optional[int] = Query(None, ge=1, le=86400),
+    db: AsyncSession = Depends(get_db)
+):
+    """Extends a lease. Orders whose claim already expired are no longer held and are not returned."""
+    try:
+        return await _service(db).heartbeat(lease_id, lease_seconds)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.delete("/claims/{lease_id}", status_code=204)
+async def release_claim(
+    lease_id: UUID,
+    order_ids: Optional[List[UUID]] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Releases a lease, or only the given orders of it, so other workers can claim them."""
+    try:
+        await _service(db).release(lease_id, order_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from app.services.event_broadcaster import get_event_broadcaster
+
+router = APIRouter(prefix="/orders", tags=["events"])
+
+
+@router.get("/events")
+async def stream_events():
+    """
+    Live feed of order_created and transition events as Server-Sent Events.
+
+    Events are pushed once committed; the data of a transition event has the
+    fields of a transition log. A client that falls too far behind receives a
+    "dropped" event and should reconnect and reload.
+    """
+    subscription = get_event_broadcaster().subscribe()
+    return StreamingResponse(
+        subscription.frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
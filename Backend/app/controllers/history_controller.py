@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.database import get_db
+from app.repositories.order_state_snapshot_repository import OrderStateSnapshotRepository
+from app.services.order_history_service import OrderHistoryService, SnapshotConflictError
+from app.schemas.order import OrderStateAsOf, OrderStatesAsOfRequest, OrderSnapshotResult
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+router = APIRouter(prefix="/orders", tags=["history"])
+
+
+def _service(db: AsyncSession) -> OrderHistoryService:
+    return OrderHistoryService(OrderStateSnapshotRepository(db))
+
+
+@router.get("/as-of")
+async def get_states_as_of(ts: datetime, state: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """Streams the state of every order that existed at ts as NDJSON, optionally only those in state."""
+    return StreamingResponse(_service(db).stream_ndjson(ts, state), media_type="application/x-ndjson")
+
+
+@router.post("/as-of", response_model=List[OrderStateAsOf])
+async def get_states_as_of_bulk(request: OrderStatesAsOfRequest, db: AsyncSession = Depends(get_db)):
+    """The state of each given order at ts; state is null for orders created after it."""
+    return await _service(db).get_states_at(request.order_ids, request.ts)
+
+
+@router.post("/as-of/snapshots", response_model=OrderSnapshotResult, status_code=201)
+async def take_snapshot(ts: Optional[datetime] = None, db: AsyncSession = Depends(get_db)):
+    """Stores every order's state at ts (by default a minute ago), so later as-of queries replay from it."""
+    try:
+        return await _service(db).take_snapshot(ts)
+    except SnapshotConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except IntegrityError:
+        # Another request stored a snapshot at the same ts in the meantime
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="A snapshot at that time already exists")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{order_id}/as-of", response_model=OrderStateAsOf)
+async def get_state_as_of(order_id: UUID, ts: datetime, db: AsyncSession = Depends(get_db)):
+    try:
+        return await _service(db).get_state_at(order_id, ts)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -1,51 +1,157 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_db
 from app.repositories.order_repository import OrderRepository
 from app.repositories.customer_repository import CustomerRepository
 from app.repositories.product_repository import ProductRepository
-from app.schemas.order import OrderCreate, OrderResponse
+from app.services.order_export_service import OrderExportService
+from app.repositories.pagination import decode_change_cursor
+from app.services.order_service import DuplicateProductError, OrderService
+from app.schemas.order import OrderCreate, OrderResponse, OrderBulkResult, OrderChangeItem, OrderChangesResponse
+from datetime import datetime
+from typing import Literal, Optional
 from uuid import UUID
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+# Bounds the request body held in memory; writes are split into transactions of INSERT_CHUNK_SIZE orders
+MAX_BULK_ORDERS = 10000
+
 
 @router.post("", response_model=OrderResponse, status_code=201)  # Sin barra
 async def create_order(
     order_data: OrderCreate,
     db: AsyncSession = Depends(get_db)
 ):
-    order_repo = OrderRepository(db)
-    customer_repo = CustomerRepository(db)
-    product_repo = ProductRepository(db)
-
-    customer = await customer_repo.get_by_id(order_data.customer_id)
-    if not customer:
-        raise HTTPException(status_code=404, detail="Customer not found")
-
-    for product_data in order_data.products:
-        product = await product_repo.get_by_id(product_data.product_id)
-        if not product:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Product {product_data.product_id} not found"
-            )
-
-    order = await order_repo.create(
-        order_data=order_data.dict(exclude={'products'}),
-        products=[p.dict() for p in order_data.products]
+    service = OrderService(
+        OrderRepository(db),
+        CustomerRepository(db),
+        ProductRepository(db)
     )
 
-    return order
+    try:
+        return await service.create_order(order_data)
+    except DuplicateProductError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/bulk", response_model=list[OrderBulkResult])
+async def create_orders_bulk(
+    orders_data: list[OrderCreate],
+    db: AsyncSession = Depends(get_db)
+):
+    """Creates a batch of orders and returns one result per item, in request order."""
+    if len(orders_data) > MAX_BULK_ORDERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ORDERS} orders per request")
+    service = OrderService(
+        OrderRepository(db),
+        CustomerRepository(db),
+        ProductRepository(db)
+    )
+    return await service.create_orders_bulk(orders_data)
 
 
 @router.get("", response_model=list[OrderResponse])  # Sin barra
-async def get_orders(db: AsyncSession = Depends(get_db)):
+async def get_orders(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_state: Optional[str] = None,
+    customer_id: Optional[UUID] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Returns one page of orders, newest first.
+
+    When more orders match, the cursor of the next page is sent in the
+    X-Next-Cursor header; pass it back as cursor to continue.
+    """
     order_repo = OrderRepository(db)
-    orders = await order_repo.get_all()
+    try:
+        orders, next_cursor = await order_repo.get_page(
+            limit=limit,
+            cursor=cursor,
+            current_state=current_state,
+            customer_id=customer_id,
+            created_from=created_from,
+            created_to=created_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return orders
 
 
+@router.get("/export")
+async def export_orders(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_state: Optional[str] = None,
+    customer_id: Optional[UUID] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Streams every matching order with its customer and line items, oldest first."""
+    service = OrderExportService(OrderRepository(db))
+    filters = {
+        "current_state": current_state,
+        "customer_id": customer_id,
+        "created_from": created_from,
+        "created_to": created_to
+    }
+
+    if format == "csv":
+        return StreamingResponse(
+            service.stream_csv(**filters),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=orders.csv"}
+        )
+    return StreamingResponse(service.stream_ndjson(**filters), media_type="application/x-ndjson")
+
+
+@router.get("/changes", response_model=OrderChangesResponse)
+async def get_order_changes(
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Orders created, transitioned or deleted after the since cursor, oldest change first.
+
+    Start without since and pass the returned cursor on the next call; each order
+    appears once, with its latest change and current data, and deleted orders
+    appear as tombstones without data. Repeat while has_more is true to catch up.
+    """
+    try:
+        position = decode_change_cursor(since) if since else (-1, 0)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    changes, cursor, has_more = await OrderRepository(db).get_changes(position, limit)
+    return OrderChangesResponse(
+        changes=[
+            OrderChangeItem(
+                seq=entry.seq,
+                order_id=entry.order_id,
+                change_type=entry.change_type,
+                current_state=entry.current_state,
+                changed_at=entry.changed_at,
+                order=order
+            )
+            for entry, order in changes
+        ],
+        cursor=cursor,
+        has_more=has_more
+    )
+
+
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(order_id: UUID, db: AsyncSession = Depends(get_db)):
     order_repo = OrderRepository(db)
@@ -0,0 +1,143 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+import json
+from typing import Optional
+from app.config.database import get_db
+from app.repositories.order_repository import OrderRepository
+from app.repositories.rule_repository import get_rule_repository, RuleSnapshot
+from app.repositories.transition_log_repository import TransitionLogRepository
+from app.schemas.rule import (
+    RuleAuditResponse,
+    RuleBacktestRequest,
+    RuleOutcomeCacheStats,
+    RuleProfileResponse,
+    RuleSetVersionResponse
+)
+from app.services import fact_providers  # registers the async fact providers on the default registry
+from app.services.batch_rule_evaluator import BatchRuleEvaluator, OrderFacts, prefetch_fact_columns, rule_fields
+from app.services.rule_backtest_service import RuleBacktestService
+from app.services.rule_outcome_cache import get_rule_outcome_cache
+from app.services.rule_profiler import get_rule_profiler
+
+router = APIRouter(prefix="/rules", tags=["rules"])
+
+
+def _version_response(snapshot: RuleSnapshot) -> RuleSetVersionResponse:
+    return RuleSetVersionResponse(
+        version=snapshot.version,
+        checksum=snapshot.checksum,
+        source=snapshot.source,
+        loaded_at=snapshot.loaded_at,
+        rule_count=len(snapshot.rules)
+    )
+
+
+@router.get("/version", response_model=RuleSetVersionResponse)
+async def get_rules_version():
+    return _version_response(get_rule_repository().snapshot())
+
+
+@router.post("/reload", response_model=RuleSetVersionResponse)
+async def reload_rules(force: bool = False):
+    """Reloads the rules file. In-flight evaluations finish on the snapshot they started with."""
+    try:
+        snapshot = get_rule_repository().reload(force=force)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _version_response(snapshot)
+
+
+@router.get("/cache", response_model=RuleOutcomeCacheStats)
+async def get_outcome_cache_stats():
+    return get_rule_outcome_cache().stats()
+
+
+@router.delete("/cache", response_model=RuleOutcomeCacheStats)
+async def clear_outcome_cache():
+    """Drops every memoized outcome and resets the counters."""
+    cache = get_rule_outcome_cache()
+    cache.clear()
+    return cache.stats()
+
+
+@router.get("/profile", response_model=RuleProfileResponse)
+async def get_rule_profile():
+    """Per-rule and per-condition counters, most expensive rule first, with a suggested condition order."""
+    profiler = get_rule_profiler()
+    return RuleProfileResponse(enabled=profiler.enabled, rules=profiler.report())
+
+
+@router.put("/profile", response_model=RuleProfileResponse)
+async def set_rule_profiling(enabled: bool):
+    profiler = get_rule_profiler()
+    profiler.enabled = enabled
+    return RuleProfileResponse(enabled=profiler.enabled, rules=profiler.report())
+
+
+@router.delete("/profile", response_model=RuleProfileResponse)
+async def reset_rule_profile():
+    profiler = get_rule_profiler()
+    profiler.reset()
+    return RuleProfileResponse(enabled=profiler.enabled, rules=[])
+
+
+@router.get("/audit", response_model=RuleAuditResponse)
+async def audit_rules(
+    action: str,
+    event: str = "order_transition",
+    current_state: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Evaluates the active rules against every matching order as if action were requested now."""
+    snapshot = get_rule_repository().snapshot()
+    rules = [rule for rule in snapshot.rules if rule.event == event and rule.enabled]
+
+    rows = await OrderRepository(db).get_rule_facts(
+        current_state=current_state,
+        created_from=created_from,
+        created_to=created_to
+    )
+    extra = await prefetch_fact_columns(
+        db,
+        [
+            {"id": order_id, "customer_id": customer_id, "amount": amount, "current_state": state}
+            for order_id, amount, state, _, _, customer_id in rows
+        ],
+        rule_fields(rules)
+    )
+    result = BatchRuleEvaluator(get_rule_repository()).evaluate(
+        OrderFacts.from_fact_rows(rows, action=action, extra=extra), event=event, rules=rules
+    )
+
+    return RuleAuditResponse(
+        version=snapshot.version,
+        action=action,
+        order_count=len(rows),
+        blocked_count=int(result.blocked.sum()),
+        taxed_count=int(result.has_tax.sum()),
+        total_tax=float(result.tax_amount.sum()),
+        rule_matches={rule.id: int(count) for rule, count in zip(rules, result.matched.sum(axis=0))}
+    )
+
+
+@router.post("/backtest")
+async def backtest_rules(request: RuleBacktestRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Replays logged transitions through the given rules (enabled or not) and streams
+    NDJSON: one progress line per evaluated partition, then per-rule totals.
+    """
+    service = RuleBacktestService(TransitionLogRepository(db), get_rule_repository())
+    try:
+        rules = service.select_rules(request.rule_ids, request.event)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def body():
+        async for event in service.run(rules, request.transition_from, request.transition_to):
+            yield (json.dumps(event) + "\n").encode()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
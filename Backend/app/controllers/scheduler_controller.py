@@ -0,0 +1,43 @@
+from fastapi import APIRouter
+from app.services.transition_scheduler import get_transition_scheduler
+from app.schemas.scheduler import SchedulePolicyResponse, SchedulerStatusResponse, StuckOrderResponse
+from typing import List
+
+router = APIRouter(prefix="/scheduler", tags=["scheduler"])
+
+
+@router.get("", response_model=SchedulerStatusResponse)
+async def get_scheduler_status():
+    """Returns the active policies and how many orders are waiting on a deadline."""
+    scheduler = get_transition_scheduler()
+    return SchedulerStatusResponse(
+        running=scheduler.running,
+        policies=[
+            SchedulePolicyResponse(
+                name=policy.name,
+                state=policy.state,
+                after_hours=policy.after.total_seconds() / 3600,
+                action=policy.action
+            )
+            for policy in scheduler.policies
+        ],
+        tracked_orders=len(scheduler),
+        next_deadline=scheduler.next_deadline(),
+        flagged_orders=len(scheduler.flagged)
+    )
+
+
+@router.get("/stuck", response_model=List[StuckOrderResponse])
+async def get_stuck_orders():
+    """Orders flagged by a policy for staying too long in a state, longest first."""
+    flagged = sorted(get_transition_scheduler().flagged.items(), key=lambda item: item[1][1])
+    return [
+        StuckOrderResponse(
+            order_id=order_id,
+            policy=policy.name,
+            state=policy.state,
+            state_entered_at=entered_at,
+            flagged_at=flagged_at
+        )
+        for order_id, (policy, entered_at, flagged_at) in flagged
+    ]
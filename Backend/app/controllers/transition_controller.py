@@ -1,29 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_db
 from app.repositories.order_repository import OrderRepository
 from app.repositories.transition_log_repository import TransitionLogRepository
 from app.repositories.ticket_repository import TicketRepository
-from app.services.transition_service import TransitionService
-from app.services.state_machine import OrderStateMachine
-from app.schemas.transition import TransitionRequest, TransitionLogResponse
+from app.services.transition_service import TransitionService, TransitionConflictError
+from app.schemas.transition import (
+    TransitionRequest,
+    TransitionLogResponse,
+    BatchTransitionRequest,
+    BatchTransitionResult,
+    AllowedActionsRequest,
+    AllowedActionsResult
+)
 from app.schemas.order import OrderResponse
+from datetime import datetime
 from uuid import UUID
-from typing import List
+from typing import List, Optional
 
 router = APIRouter(prefix="/orders", tags=["transitions"])
 
+# Every write of a batch is chunked, so this only bounds the request body and the transaction
+MAX_BATCH_TRANSITIONS = 10000
+
 
 @router.get("/logs", response_model=List[TransitionLogResponse])
 async def get_all_logs(
+    response: Response,
     db: AsyncSession = Depends(get_db),
-    limit: int = 100
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    action: Optional[str] = None,
+    new_state: Optional[str] = None,
+    order_id: Optional[UUID] = None,
+    transition_from: Optional[datetime] = None,
+    transition_to: Optional[datetime] = None
 ):
+    """Returns a page of logs, newest first. The next page cursor is sent in the X-Next-Cursor header."""
     log_repo = TransitionLogRepository(db)
-    logs = await log_repo.get_all(limit=limit)
+    try:
+        logs, next_cursor = await log_repo.get_page(
+            limit=limit,
+            cursor=cursor,
+            action=action,
+            new_state=new_state,
+            order_id=order_id,
+            transition_from=transition_from,
+            transition_to=transition_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return logs
 
 
+@router.post("/transitions:batch", response_model=List[BatchTransitionResult])
+async def transition_orders_batch(
+    batch: BatchTransitionRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Applies many transitions in one request and reports the outcome for each order."""
+    if len(batch.transitions) > MAX_BATCH_TRANSITIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_TRANSITIONS} transitions per request")
+    order_repo = OrderRepository(db)
+    log_repo = TransitionLogRepository(db)
+    ticket_repo = TicketRepository(db)
+    service = TransitionService(order_repo, log_repo, ticket_repo)
+
+    try:
+        return await service.transition_orders_batch(batch.transitions)
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al realizar transiciones: {str(e)}")
+
+
+@router.post("/allowed-actions", response_model=List[AllowedActionsResult])
+async def get_allowed_actions_batch(
+    request: AllowedActionsRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Returns the allowed actions of many orders at once, with the same rules as the single-order endpoint."""
+    order_repo = OrderRepository(db)
+    log_repo = TransitionLogRepository(db)
+    service = TransitionService(order_repo, log_repo)
+    return await service.get_allowed_actions_batch(request.order_ids)
+
+
 @router.post("/{order_id}/transition", response_model=OrderResponse)
 async def transition_order(
     order_id: UUID,
@@ -36,14 +100,15 @@ async def transition_order(
     service = TransitionService(order_repo, log_repo, ticket_repo)
 
     try:
-        await service.transition_order(
+        result = await service.transition_order(
             order_id,
             transition_data.action,
             transition_data.cancellation_reason
         )
-
-        updated_order = await order_repo.get_by_id(order_id)
-        return updated_order
+        return result["order"]
+    except TransitionConflictError as e:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -74,11 +139,11 @@ async def get_allowed_actions(
 ):
     """Returns valid actions based on current state and business rules (e.g., amount > 1000 requires review)."""
     order_repo = OrderRepository(db)
-    order = await order_repo.get_by_id(order_id)
+    log_repo = TransitionLogRepository(db)
+    service = TransitionService(order_repo, log_repo)
 
-    if not order:
+    try:
+        return await service.get_allowed_actions(order_id)
+    except ValueError:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
 
-    allowed_actions = OrderStateMachine.get_allowed_actions(order.current_state)
-    return allowed_actions
-
@@ -6,15 +6,161 @@ from app.controllers.customer_controller import router as customer_router
 from app.controllers.product_controller import router as product_router
 from app.controllers.transition_controller import router as transition_router
 from app.controllers.ticket_controller import router as ticket_router
-from app.config.database import init_db, settings
+from app.controllers.rule_controller import router as rule_router
+from app.controllers.claim_controller import router as claim_router
+from app.controllers.event_controller import router as event_router
+from app.controllers.history_controller import router as history_router
+from app.controllers.scheduler_controller import router as scheduler_router
+from app.config.database import AsyncSessionLocal, create_missing_indexes, engine, init_db, settings
+from app.repositories.order_repository import OrderRepository
+from app.repositories.pagination import decode_change_cursor
+from app.repositories.order_state_snapshot_repository import OrderStateSnapshotRepository
+from app.repositories.rule_repository import get_rule_repository
+from app.repositories.ticket_repository import TicketRepository
+from app.repositories.transition_log_repository import TransitionLogRepository
+from app.repositories.transition_log_partition_repository import TransitionLogPartitionRepository
+from app.schemas.transition import BatchTransitionItem
+from app.services.transition_scheduler import SchedulePolicy, TransitionScheduler, get_transition_scheduler
+from app.services.transition_service import TransitionService
+from app.services.order_history_service import OrderHistoryService
+from app.services.transition_log_retention_service import TransitionLogRetentionService
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from uuid import UUID
+import asyncio
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+
+async def watch_rules_file(interval: int):
+    repository = get_rule_repository()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            snapshot = repository.reload()
+        except (OSError, ValueError) as e:
+            logger.warning("Keeping rules version %s: %s", repository.version, e)
+            continue
+        logger.debug("Rules version %s", snapshot.version)
+
+
+async def take_order_snapshots(interval_hours: float):
+    # Due interval_hours after the latest stored snapshot, not after startup, so restarts do not take extra ones
+    interval = timedelta(hours=interval_hours)
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                snapshot_repo = OrderStateSnapshotRepository(db)
+                latest = await snapshot_repo.latest_snapshot_at(datetime.utcnow())
+                if latest is None or latest + interval <= datetime.utcnow():
+                    result = await OrderHistoryService(snapshot_repo).take_snapshot()
+                    latest = result.snapshot_at
+                    logger.info("Snapshot of %s order states at %s", result.orders, result.snapshot_at)
+            wait = latest + interval - datetime.utcnow()
+        except Exception:
+            logger.exception("Order state snapshot failed")
+            wait = interval
+        await asyncio.sleep(max(wait.total_seconds(), 0))
+
+
+async def maintain_log_partitions(interval_hours: float):
+    while True:
+        await asyncio.sleep(interval_hours * 3600)
+        try:
+            async with AsyncSessionLocal() as db:
+                archived = await TransitionLogRetentionService(
+                    TransitionLogPartitionRepository(db),
+                    settings.TRANSITION_LOG_ARCHIVE_DIR,
+                    retention_months=settings.TRANSITION_LOG_RETENTION_MONTHS,
+                    months_ahead=settings.TRANSITION_LOG_PARTITIONS_AHEAD
+                ).run()
+        except Exception:
+            logger.exception("Transition log partition maintenance failed")
+            continue
+        for segment in archived:
+            logger.info("Archived %s transition logs of %s to %s", segment.rows, segment.partition, segment.path)
+
+
+async def load_scheduled_orders(states: List[str]):
+    async with AsyncSessionLocal() as db:
+        async for chunk in OrderRepository(db).stream_state_entries(states):
+            yield chunk
+
+
+async def follow_order_changes(scheduler: TransitionScheduler, position: Tuple[int, int], interval: float):
+    """Tracks the state changes committed by every process, read from the change feed."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as db:
+                order_repo = OrderRepository(db)
+                has_more = True
+                while has_more:
+                    changes, cursor, has_more = await order_repo.get_changes(position, 1000)
+                    position = decode_change_cursor(cursor)
+                    for entry, order in changes:
+                        if order is None:
+                            scheduler.forget(entry.order_id)
+                    scheduler.merge(
+                        (order.id, order.current_state, order.state_entered_at)
+                        for _, order in changes
+                        if order is not None
+                    )
+        except Exception:
+            logger.exception("Following order changes failed")
+
+
+async def fire_scheduled_transitions(policy: SchedulePolicy, order_ids: List[UUID]) -> List[UUID]:
+    async with AsyncSessionLocal() as db:
+        service = TransitionService(OrderRepository(db), TransitionLogRepository(db), TicketRepository(db))
+        results = await service.transition_orders_batch([
+            BatchTransitionItem(order_id=order_id, action=policy.action, cancellation_reason=policy.cancellation_reason)
+            for order_id in order_ids
+        ])
+    failed = [result for result in results if not result.success]
+    logger.info("%s: %s orders transitioned, %s failed", policy.name, len(results) - len(failed), len(failed))
+    for result in failed:
+        logger.debug("%s: order %s not transitioned: %s", policy.name, result.order_id, result.error)
+    return [result.order_id for result in failed]
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    get_rule_repository()
+
+    background_tasks = []
+    if settings.RULES_RELOAD_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(watch_rules_file(settings.RULES_RELOAD_INTERVAL)))
+
+    if settings.MAINTENANCE_ENABLED and settings.ORDER_SNAPSHOT_INTERVAL_HOURS > 0:
+        background_tasks.append(asyncio.create_task(take_order_snapshots(settings.ORDER_SNAPSHOT_INTERVAL_HOURS)))
+
+    partitioned_logs = settings.TRANSITION_LOG_PARTITIONING and engine.dialect.name == "postgresql"
+    if settings.MAINTENANCE_ENABLED and partitioned_logs and settings.TRANSITION_LOG_MAINTENANCE_HOURS > 0:
+        background_tasks.append(asyncio.create_task(maintain_log_partitions(settings.TRANSITION_LOG_MAINTENANCE_HOURS)))
+
+    background_tasks.append(asyncio.create_task(create_missing_indexes()))
+
+    scheduler = get_transition_scheduler()
+    if settings.SCHEDULER_ENABLED and scheduler.policies:
+        # Taken before the load, so changes committed while it runs are read again from the feed
+        async with AsyncSessionLocal() as db:
+            position = await OrderRepository(db).get_changes_head()
+        await scheduler.start(load_scheduled_orders)
+        background_tasks.append(asyncio.create_task(scheduler.run(fire_scheduled_transitions)))
+        background_tasks.append(asyncio.create_task(
+            follow_order_changes(scheduler, position, settings.SCHEDULER_SYNC_SECONDS)
+        ))
+
     yield
 
+    for task in background_tasks:
+        task.cancel()
+    scheduler.stop()
+
 
 app = FastAPI(
     title="Orders Management API",
@@ -30,14 +176,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["*"]
+    expose_headers=["X-Next-Cursor"]
 )
 
 app.include_router(transition_router)
+app.include_router(claim_router)
+app.include_router(event_router)
+app.include_router(history_router)
 app.include_router(order_router)
 app.include_router(customer_router)
 app.include_router(product_router)
 app.include_router(ticket_router)
+app.include_router(rule_router)
+app.include_router(scheduler_router)
 
 
 @app.get("/")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, Text, ForeignKey
+from sqlalchemy import Column, String, Float, DateTime, Text, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -8,11 +8,18 @@ from app.config.database import Base
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_creation_date_id", "creation_date", "id"),
+        Index("ix_orders_state_creation_date_id", "current_state", "creation_date", "id"),
+        Index("ix_orders_customer_creation_date_id", "customer_id", "creation_date", "id"),
+        Index("ix_orders_state_entered_at", "current_state", "state_entered_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     amount = Column(Float, nullable=False)
     current_state = Column(String(50), nullable=False, default="pending")
     creation_date = Column(DateTime, default=datetime.utcnow, nullable=False)
+    state_entered_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     notes = Column(Text, nullable=True)
 
     customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id"), nullable=False)
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, String, DateTime, BigInteger, Integer, Index
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+from app.config.database import Base
+
+
+class OrderChange(Base):
+    """
+    One entry of the order change feed, written in the same transaction as the change.
+
+    The feed is read in (txid, seq) order, a range scan on one index. txid is
+    the id of the writing transaction on PostgreSQL and 0 elsewhere. There is
+    no foreign key to orders: the entry of a deleted order stays as its
+    tombstone.
+    """
+
+    __tablename__ = "order_changes"
+    __table_args__ = (
+        Index("ix_order_changes_txid_seq", "txid", "seq"),
+    )
+
+    # SQLite only autoincrements INTEGER PRIMARY KEY columns
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    order_id = Column(UUID(as_uuid=True), nullable=False)
+    change_type = Column(String(20), nullable=False)  # created, transitioned or deleted
+    current_state = Column(String(50), nullable=True)
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    txid = Column(BigInteger, nullable=False, default=0, server_default="0")
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+from app.config.database import Base
+
+
+class OrderClaim(Base):
+    """A worker's lease on an order, taken with POST /orders/claim and valid until expires_at."""
+
+    __tablename__ = "order_claims"
+    __table_args__ = (
+        Index("ix_order_claims_lease_id", "lease_id"),
+    )
+
+    order_id = Column(UUID(as_uuid=True), ForeignKey("orders.id", ondelete="CASCADE"), primary_key=True)
+    lease_id = Column(UUID(as_uuid=True), nullable=False)
+    worker_id = Column(String(100), nullable=True)
+    claimed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
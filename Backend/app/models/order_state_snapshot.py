@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.dialects.postgresql import UUID
+from app.config.database import Base
+
+
+class OrderStateSnapshot(Base):
+    """The state of every order at snapshot_at, the starting point for as-of queries."""
+
+    __tablename__ = "order_state_snapshots"
+
+    snapshot_at = Column(DateTime, primary_key=True)
+    order_id = Column(UUID(as_uuid=True), primary_key=True)
+    state = Column(String(50), nullable=False)
@@ -1,19 +1,47 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
-from app.config.database import Base
+from app.config.database import Base, settings
+
+
+# Range-partitioned by month on PostgreSQL when enabled (see
+# TransitionLogPartitionRepository); the primary key of a partitioned table
+# must include the partition column
+PARTITIONED = settings.TRANSITION_LOG_PARTITIONING
 
 
 class TransitionLog(Base):
     __tablename__ = "transition_logs"
+    # One (filter column, transition_date, id) index per supported filter, so each
+    # log page is a range scan; on PostgreSQL they also include the remaining
+    # columns, so pages are read from the index alone
+    __table_args__ = (
+        Index(
+            "ix_transition_logs_date_id", "transition_date", "id",
+            postgresql_include=["order_id", "previous_state", "new_state", "action_taken"]
+        ),
+        Index(
+            "ix_transition_logs_order_date_id", "order_id", "transition_date", "id",
+            postgresql_include=["previous_state", "new_state", "action_taken"]
+        ),
+        Index(
+            "ix_transition_logs_action_date_id", "action_taken", "transition_date", "id",
+            postgresql_include=["order_id", "previous_state", "new_state"]
+        ),
+        Index(
+            "ix_transition_logs_new_state_date_id", "new_state", "transition_date", "id",
+            postgresql_include=["order_id", "previous_state", "action_taken"]
+        ),
+        {"postgresql_partition_by": "RANGE (transition_date)"} if PARTITIONED else {},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     order_id = Column(UUID(as_uuid=True), ForeignKey("orders.id"), nullable=False)
     previous_state = Column(String(50), nullable=True)  # Puede ser None en la creación inicial
     new_state = Column(String(50), nullable=False)
     action_taken = Column(String(50), nullable=False)
-    transition_date = Column(DateTime, default=datetime.utcnow, nullable=False)
+    transition_date = Column(DateTime, default=datetime.utcnow, nullable=False, primary_key=PARTITIONED)
 
     order = relationship("Order", backref="transition_logs")
\ No newline at end of file
@@ -1,7 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models.customer import Customer
-from typing import Optional
+from typing import Dict, Iterable, Optional
 from uuid import UUID
 
 
@@ -22,6 +22,15 @@ class CustomerRepository:
         )
         return result.scalar_one_or_none()
 
+    async def get_by_ids(self, customer_ids: Iterable[UUID]) -> Dict[UUID, Customer]:
+        ids = set(customer_ids)
+        if not ids:
+            return {}
+        result = await self.db.execute(
+            select(Customer).where(Customer.id.in_(ids))
+        )
+        return {customer.id: customer for customer in result.scalars().all()}
+
     async def get_by_email(self, email: str) -> Optional[Customer]:
         result = await self.db.execute(
             select(Customer).where(Customer.email == email)
@@ -0,0 +1,97 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, delete
+from app.models.order import Order
+from app.models.order_claim import OrderClaim
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from uuid import UUID, uuid4
+
+
+class OrderClaimRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def claim(
+        self,
+        state: str,
+        limit: int,
+        lease_seconds: int,
+        worker_id: Optional[str] = None
+    ) -> Tuple[UUID, datetime, List[UUID]]:
+        """
+        Leases up to limit unclaimed orders in state, oldest first, and commits.
+
+        The candidate orders are locked with SELECT ... FOR UPDATE SKIP LOCKED, so
+        concurrent claimers pass over each other's rows instead of waiting on them
+        and always get disjoint batches. Orders whose lease expired are claimable
+        again. Returns (lease id, expiry, claimed order ids).
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=lease_seconds)
+        lease_id = uuid4()
+
+        live_claim = (
+            select(OrderClaim.order_id)
+            .where(OrderClaim.order_id == Order.id, OrderClaim.expires_at > now)
+            .exists()
+        )
+        result = await self.db.execute(
+            select(Order.id)
+            .where(Order.current_state == state, ~live_claim)
+            .order_by(Order.creation_date, Order.id)
+            .limit(limit)
+            .with_for_update(of=Order, skip_locked=True)
+        )
+        order_ids = list(result.scalars().all())
+
+        if order_ids:
+            await self.db.execute(
+                delete(OrderClaim)
+                .where(OrderClaim.order_id.in_(order_ids), OrderClaim.expires_at <= now)
+            )
+            # A claim committed after this transaction's snapshot was taken is
+            # visible to this new statement; the order locks keep any more out
+            result = await self.db.execute(select(OrderClaim.order_id).where(OrderClaim.order_id.in_(order_ids)))
+            taken = set(result.scalars().all())
+            order_ids = [order_id for order_id in order_ids if order_id not in taken]
+
+        if order_ids:
+            await self.db.execute(
+                insert(OrderClaim).values([
+                    {
+                        "order_id": order_id,
+                        "lease_id": lease_id,
+                        "worker_id": worker_id,
+                        "claimed_at": now,
+                        "expires_at": expires_at
+                    }
+                    for order_id in order_ids
+                ])
+            )
+        await self.db.commit()
+
+        return lease_id, expires_at, order_ids
+
+    async def heartbeat(self, lease_id: UUID, lease_seconds: int) -> Tuple[datetime, List[UUID]]:
+        """Extends the unexpired claims of a lease and commits. Returns the new expiry and the orders still held."""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=lease_seconds)
+        result = await self.db.execute(
+            update(OrderClaim)
+            .where(OrderClaim.lease_id == lease_id, OrderClaim.expires_at > now)
+            .values(expires_at=expires_at)
+            .returning(OrderClaim.order_id)
+            .execution_options(synchronize_session=False)
+        )
+        order_ids = list(result.scalars().all())
+        await self.db.commit()
+        return expires_at, order_ids
+
+    async def release(self, lease_id: UUID, order_ids: Optional[List[UUID]] = None) -> int:
+        """Drops the claims of a lease, or only those on order_ids, and commits. Returns how many were dropped."""
+        statement = delete(OrderClaim).where(OrderClaim.lease_id == lease_id)
+        if order_ids:
+            statement = statement.where(OrderClaim.order_id.in_(order_ids))
+        result = await self.db.execute(statement)
+        await self.db.commit()
+        return result.rowcount
@@ -1,70 +1,339 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, insert, update, delete, func, case, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from app.models.order import Order
+from app.models.order_change import OrderChange
 from app.models.order_product import OrderProduct
+from app.models.product import Product
 from app.models.transition_log import TransitionLog
-from typing import List, Dict, Optional
+from app.repositories.pagination import encode_cursor, decode_cursor, encode_change_cursor
+from app.services.velocity_counters import get_velocity_counters
+from app.services.transition_scheduler import get_transition_scheduler
+from app.services.event_broadcaster import get_event_broadcaster
+from datetime import datetime
+from collections import defaultdict
+from typing import AsyncIterator, Iterable, List, Dict, Optional, Set, Tuple
 from uuid import UUID, uuid4
 
 
 class OrderRepository:
+    INSERT_CHUNK_SIZE = 1000
+
     def __init__(self, db: AsyncSession):
         self.db = db
 
     async def create(self, order_data: Dict, products: List[Dict]) -> Order:
-        order = Order(
-            id=uuid4(),
-            amount=order_data["amount"],
-            current_state=order_data["current_state"],
-            customer_id=order_data["customer_id"],
-            notes=order_data.get("notes")
-        )
-        self.db.add(order)
-        await self.db.flush()
-
-        for product in products:
-            order_product = OrderProduct(
-                order_id=order.id,
-                product_id=product["product_id"],
-                quantity=product["quantity"],
-                unit_price=product["unit_price"]
+        """
+        Inserts the order, its lines and the initial transition log in one transaction.
+
+        Lines go in as a single multi-row INSERT and nothing is read back: the
+        returned Order is built from the values already in hand and is not
+        attached to the session.
+        """
+        orders = await self.create_many([(order_data, products)])
+        return orders[0]
+
+    async def create_many(self, items: List[Tuple[Dict, List[Dict]]]) -> List[Order]:
+        """
+        Inserts many orders with their lines and initial logs in one transaction.
+
+        Each table is written with multi-row INSERTs of at most INSERT_CHUNK_SIZE
+        rows, which keeps every statement under the driver's bind parameter limit.
+        If a write fails the transaction is rolled back and the error re-raised.
+        """
+        now = datetime.utcnow()
+        orders = []
+        order_rows = []
+        line_rows = []
+        log_rows = []
+
+        for order_data, products in items:
+            order = Order(
+                id=uuid4(),
+                amount=order_data["amount"],
+                current_state=order_data["current_state"],
+                customer_id=order_data["customer_id"],
+                notes=order_data.get("notes"),
+                creation_date=now,
+                state_entered_at=now
             )
-            self.db.add(order_product)
-
-        initial_log = TransitionLog(
-            id=uuid4(),
-            order_id=order.id,
-            previous_state=None,
-            new_state=order_data["current_state"],
-            action_taken="create"
-        )
-        self.db.add(initial_log)
+            orders.append(order)
+            order_rows.append({
+                "id": order.id,
+                "amount": order.amount,
+                "current_state": order.current_state,
+                "customer_id": order.customer_id,
+                "notes": order.notes,
+                "creation_date": now,
+                "state_entered_at": now
+            })
+            line_rows.extend(
+                {
+                    "order_id": order.id,
+                    "product_id": product["product_id"],
+                    "quantity": product["quantity"],
+                    "unit_price": product["unit_price"]
+                }
+                for product in products
+            )
+            log_rows.append({
+                "id": uuid4(),
+                "order_id": order.id,
+                "previous_state": None,
+                "new_state": order.current_state,
+                "action_taken": "create",
+                "transition_date": now
+            })
+
+        change_rows = [
+            {"order_id": row["id"], "change_type": "created", "current_state": row["current_state"], "changed_at": now}
+            for row in order_rows
+        ]
+
+        try:
+            for statement, rows in (
+                (insert(Order.__table__), order_rows),
+                (insert(OrderProduct.__table__), line_rows),
+                (insert(TransitionLog.__table__), log_rows),
+                (insert(OrderChange.__table__).values(txid=self._change_txid()), change_rows)
+            ):
+                await self._insert_chunked(statement, rows)
+            await self.db.commit()
+        except SQLAlchemyError:
+            await self.db.rollback()
+            raise
 
-        await self.db.commit()
+        counters = get_velocity_counters()
+        scheduler = get_transition_scheduler()
+        broadcaster = get_event_broadcaster()
+        for order in orders:
+            counters.record("order_created", order)
+            scheduler.track(order.id, order.current_state, now)
+            broadcaster.publish("order_created", {
+                "id": order.id,
+                "customer_id": order.customer_id,
+                "amount": order.amount,
+                "current_state": order.current_state,
+                "creation_date": now
+            })
 
-        return await self.get_by_id(order.id)
+        return orders
 
     async def get_by_id(self, order_id: UUID) -> Optional[Order]:
+        result = await self.db.execute(
+            select(Order)
+            .options(
+                joinedload(Order.order_products).joinedload(OrderProduct.product),
+                joinedload(Order.customer)
+            )
+            .where(Order.id == order_id)
+        )
+        return result.unique().scalar_one_or_none()
+
+    async def get_by_ids(self, order_ids: Iterable[UUID]) -> Dict[UUID, Order]:
+        ids = set(order_ids)
+        if not ids:
+            return {}
         result = await self.db.execute(
             select(Order)
             .options(
                 selectinload(Order.order_products).selectinload(OrderProduct.product),
                 selectinload(Order.customer)
             )
-            .where(Order.id == order_id)
+            .where(Order.id.in_(ids))
         )
-        return result.scalar_one_or_none()
+        return {order.id: order for order in result.scalars().all()}
 
     async def get_all(self) -> List[Order]:
         result = await self.db.execute(
             select(Order).options(
-                selectinload(Order.order_products),
+                selectinload(Order.order_products).selectinload(OrderProduct.product),
                 selectinload(Order.customer)
             )
         )
         return list(result.scalars().all())
 
+    async def get_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        current_state: Optional[str] = None,
+        customer_id: Optional[UUID] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None
+    ) -> Tuple[List[Order], Optional[str]]:
+        """
+        Returns one page of orders, newest first, and the cursor of the next page.
+
+        Keyset pagination on (creation_date, id): the cursor points at the last row
+        returned, so the next page is a range scan on the composite index and costs
+        the same no matter how deep it is.
+        """
+        query = (
+            select(Order)
+            .options(
+                selectinload(Order.order_products).selectinload(OrderProduct.product),
+                joinedload(Order.customer)
+            )
+            .order_by(Order.creation_date.desc(), Order.id.desc())
+            .limit(limit + 1)
+        )
+
+        query = self._apply_filters(query, current_state, customer_id, created_from, created_to)
+        if cursor is not None:
+            last_date, last_id = decode_cursor(cursor)
+            query = query.where(tuple_(Order.creation_date, Order.id) < (last_date, last_id))
+
+        result = await self.db.execute(query)
+        orders = list(result.scalars().all())
+
+        next_cursor = None
+        if len(orders) > limit:
+            orders = orders[:limit]
+            last = orders[-1]
+            next_cursor = encode_cursor(last.creation_date, last.id)
+
+        return orders, next_cursor
+
+    async def stream_chunks(
+        self,
+        chunk_size: int = 500,
+        current_state: Optional[str] = None,
+        customer_id: Optional[UUID] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None
+    ) -> AsyncIterator[List[Order]]:
+        """
+        Yields orders with their customer and line items in chunks read from a server-side cursor.
+
+        Each chunk is expunged once the caller is done with it, so the identity map
+        never holds more than one chunk regardless of the table size.
+        """
+        query = (
+            select(Order)
+            .options(
+                selectinload(Order.order_products).selectinload(OrderProduct.product),
+                joinedload(Order.customer)
+            )
+            .order_by(Order.creation_date, Order.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        query = self._apply_filters(query, current_state, customer_id, created_from, created_to)
+
+        result = await self.db.stream_scalars(query)
+        async for chunk in result.partitions():
+            yield chunk
+            self.db.expunge_all()
+
+    async def stream_state_entries(
+        self,
+        states: Iterable[str],
+        chunk_size: int = 5000
+    ) -> AsyncIterator[List[Tuple[UUID, str, datetime]]]:
+        """
+        Yields (id, current_state, state_entered_at) of the orders in states, in chunks.
+
+        Reads only the (current_state, state_entered_at) index range of each state,
+        never the rest of the table.
+        """
+        states = list(states)
+        if not states:
+            return
+        result = await self.db.stream(
+            select(Order.id, Order.current_state, Order.state_entered_at)
+            .where(Order.current_state.in_(states))
+            .order_by(Order.current_state, Order.state_entered_at)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for rows in result.partitions():
+            yield [tuple(row) for row in rows]
+
+    async def get_rule_facts(
+        self,
+        current_state: Optional[str] = None,
+        customer_id: Optional[UUID] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None
+    ) -> List[Tuple[UUID, float, str, int, bool, UUID]]:
+        """
+        Returns (id, amount, current_state, total_products, has_high_value_product, customer_id)
+        per order.
+
+        The line-item facts are aggregated in SQL, so no Order or OrderProduct
+        objects are loaded.
+        """
+        query = (
+            select(
+                Order.id,
+                Order.amount,
+                Order.current_state,
+                func.count(OrderProduct.product_id),
+                func.max(OrderProduct.unit_price),
+                Order.customer_id
+            )
+            .outerjoin(OrderProduct, OrderProduct.order_id == Order.id)
+            .group_by(Order.id, Order.amount, Order.current_state, Order.customer_id)
+            .order_by(Order.id)
+        )
+        query = self._apply_filters(query, current_state, customer_id, created_from, created_to)
+
+        result = await self.db.execute(query)
+        return [
+            (order_id, amount, state, total_products, max_price is not None and max_price > 500, customer_id)
+            for order_id, amount, state, total_products, max_price, customer_id in result.all()
+        ]
+
+    async def get_customer_order_counts(self, customer_ids: Iterable[UUID]) -> Dict[UUID, Tuple[int, int]]:
+        """Returns (orders, cancelled orders) per customer, in one grouped query."""
+        ids = set(customer_ids)
+        if not ids:
+            return {}
+        result = await self.db.execute(
+            select(
+                Order.customer_id,
+                func.count(Order.id),
+                func.sum(case((Order.current_state == "cancelled", 1), else_=0))
+            )
+            .where(Order.customer_id.in_(ids))
+            .group_by(Order.customer_id)
+        )
+        return {customer_id: (total, cancelled or 0) for customer_id, total, cancelled in result.all()}
+
+    async def get_line_products(self, order_ids: Iterable[UUID]) -> Dict[UUID, List[Tuple[UUID, str]]]:
+        """Returns the (product id, name) of every line, per order, in one query."""
+        ids = set(order_ids)
+        if not ids:
+            return {}
+        result = await self.db.execute(
+            select(OrderProduct.order_id, Product.id, Product.name)
+            .join(Product, Product.id == OrderProduct.product_id)
+            .where(OrderProduct.order_id.in_(ids))
+        )
+        lines = defaultdict(list)
+        for order_id, product_id, name in result.all():
+            lines[order_id].append((product_id, name))
+        return dict(lines)
+
+    @staticmethod
+    def _apply_filters(
+        query,
+        current_state: Optional[str],
+        customer_id: Optional[UUID],
+        created_from: Optional[datetime],
+        created_to: Optional[datetime]
+    ):
+        if current_state is not None:
+            query = query.where(Order.current_state == current_state)
+        if customer_id is not None:
+            query = query.where(Order.customer_id == customer_id)
+        if created_from is not None:
+            query = query.where(Order.creation_date >= created_from)
+        if created_to is not None:
+            query = query.where(Order.creation_date < created_to)
+        return query
+
     async def delete(self, order_id: UUID) -> bool:
         result = await self.db.execute(
             select(Order).where(Order.id == order_id)
@@ -74,6 +343,7 @@ class OrderRepository:
             await self.db.execute(
                 delete(Order).where(Order.id == order_id)
             )
+            await self._record_changes([order_id], "deleted", None)
             await self.db.commit()
             return True
         return False
@@ -82,6 +352,159 @@ class OrderRepository:
         order = await self.get_by_id(order_id)
         if order:
             order.current_state = new_state
+            order.state_entered_at = datetime.utcnow()
+            await self._record_changes([order_id], "transitioned", new_state)
             await self.db.commit()
             await self.db.refresh(order)
-        return order
\ No newline at end of file
+        return order
+
+    async def compare_and_set_state(self, order: Order, new_state: str) -> bool:
+        """
+        Moves the order to new_state only if it is still in the state it was loaded with.
+
+        Runs a single UPDATE ... WHERE current_state = :expected RETURNING and does not
+        commit. On success the loaded instance is updated in place without being marked
+        dirty and the change feed entry is added; False means another transaction
+        changed the order first.
+        """
+        result = await self.db.execute(
+            update(Order)
+            .where(Order.id == order.id, Order.current_state == order.current_state)
+            .values(current_state=new_state, state_entered_at=datetime.utcnow())
+            .returning(Order.current_state, Order.state_entered_at)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return False
+        set_committed_value(order, "current_state", row[0])
+        set_committed_value(order, "state_entered_at", row[1])
+        await self._record_changes([order.id], "transitioned", new_state)
+        return True
+
+    async def update_states(self, changes: List[Tuple[UUID, str, str]]) -> Set[UUID]:
+        """
+        Applies (order_id, expected_state, new_state) changes without committing.
+
+        Orders sharing the same transition are updated by one statement, and only
+        rows still in the expected state are touched and added to the change feed.
+        Returns the ids that changed.
+        """
+        groups: Dict[Tuple[str, str], List[UUID]] = defaultdict(list)
+        for order_id, expected_state, new_state in changes:
+            groups[(expected_state, new_state)].append(order_id)
+
+        now = datetime.utcnow()
+        updated: Set[UUID] = set()
+        for (expected_state, new_state), order_ids in groups.items():
+            # The IN list is one bind parameter per id
+            for start in range(0, len(order_ids), self.INSERT_CHUNK_SIZE):
+                result = await self.db.execute(
+                    update(Order)
+                    .where(
+                        Order.id.in_(order_ids[start:start + self.INSERT_CHUNK_SIZE]),
+                        Order.current_state == expected_state
+                    )
+                    .values(current_state=new_state, state_entered_at=now)
+                    .returning(Order.id)
+                    .execution_options(synchronize_session=False)
+                )
+                changed = list(result.scalars().all())
+                await self._record_changes(changed, "transitioned", new_state)
+                updated.update(changed)
+        return updated
+
+    async def _insert_chunked(self, statement, rows: List[Dict]) -> None:
+        """
+        Runs statement for rows, at most INSERT_CHUNK_SIZE rows per execution.
+
+        Each execution is an executemany, which SQLAlchemy sends as multi-row
+        INSERTs paged under the driver's bind parameter limit; the statement is
+        compiled once and cached, unlike a literal multi-row values() that is
+        compiled again for every distinct number of rows.
+        """
+        for start in range(0, len(rows), self.INSERT_CHUNK_SIZE):
+            await self.db.execute(statement, rows[start:start + self.INSERT_CHUNK_SIZE])
+
+    def _change_txid(self):
+        """
+        The transaction id stored with change feed entries.
+
+        On PostgreSQL this is the writing transaction's id, which get_changes uses
+        to only read entries no running transaction can still precede. Other
+        databases serialize writers, so commit order already follows seq there.
+        """
+        if self.db.get_bind().dialect.name == "postgresql":
+            return func.txid_current()
+        return 0
+
+    async def _record_changes(self, order_ids: List[UUID], change_type: str, current_state: Optional[str]) -> None:
+        """Appends change feed entries in the current transaction, without committing."""
+        if not order_ids:
+            return
+        now = datetime.utcnow()
+        await self._insert_chunked(
+            insert(OrderChange.__table__).values(txid=self._change_txid()),
+            [
+                {"order_id": order_id, "change_type": change_type, "current_state": current_state, "changed_at": now}
+                for order_id in order_ids
+            ]
+        )
+
+    async def get_changes_head(self) -> Tuple[int, int]:
+        """
+        The (txid, seq) position of the latest entry get_changes can return now,
+        so a reader can start following the feed from the present.
+        """
+        query = (
+            select(OrderChange.txid, OrderChange.seq)
+            .order_by(OrderChange.txid.desc(), OrderChange.seq.desc())
+            .limit(1)
+        )
+        if self.db.get_bind().dialect.name == "postgresql":
+            query = query.where(OrderChange.txid < func.txid_snapshot_xmin(func.txid_current_snapshot()))
+        row = (await self.db.execute(query)).first()
+        return (row.txid, row.seq) if row else (-1, 0)
+
+    async def get_changes(
+        self,
+        since: Tuple[int, int],
+        limit: int
+    ) -> Tuple[List[Tuple[OrderChange, Optional[Order]]], str, bool]:
+        """
+        Returns the orders changed after the (txid, seq) position since, the cursor
+        to resume from, and whether the limit was reached, so there may be more.
+
+        Reads at most limit feed entries in (txid, seq) order, a range scan on
+        one index, and keeps the latest entry per order with the order as it is
+        now (None once deleted).
+
+        On PostgreSQL only entries of transactions older than the oldest one still
+        running are read. Every transaction that commits later has a higher txid,
+        so nothing is ever written behind a returned cursor: a slow commit holds
+        the feed back until it finishes instead of being skipped.
+        """
+        query = (
+            select(OrderChange)
+            .where(tuple_(OrderChange.txid, OrderChange.seq) > since)
+            .order_by(OrderChange.txid, OrderChange.seq)
+            .limit(limit)
+        )
+        if self.db.get_bind().dialect.name == "postgresql":
+            query = query.where(OrderChange.txid < func.txid_snapshot_xmin(func.txid_current_snapshot()))
+
+        result = await self.db.execute(query)
+        entries = list(result.scalars().all())
+        if not entries:
+            return [], encode_change_cursor(*since), False
+
+        latest: Dict[UUID, OrderChange] = {}
+        for entry in entries:
+            latest.pop(entry.order_id, None)
+            latest[entry.order_id] = entry
+
+        orders = await self.get_by_ids(
+            order_id for order_id, entry in latest.items() if entry.change_type != "deleted"
+        )
+        changes = [(entry, orders.get(order_id)) for order_id, entry in latest.items()]
+        return changes, encode_change_cursor(entries[-1].txid, entries[-1].seq), len(entries) == limit
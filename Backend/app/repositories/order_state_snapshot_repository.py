@@ -0,0 +1,126 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, delete, func, literal, text, union_all, DateTime
+from app.models.order_state_snapshot import OrderStateSnapshot
+from app.models.transition_log import TransitionLog
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+
+class OrderStateSnapshotRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def settled_at(self) -> datetime:
+        """
+        The latest time a snapshot can be taken at: every transition log dated
+        at or before it has committed.
+
+        Logs are dated inside their transaction, so on PostgreSQL this is the
+        start of the oldest transaction still open in another session, or now
+        when there is none. Other databases serialize writers, so it is now.
+        """
+        if self.db.get_bind().dialect.name != "postgresql":
+            return datetime.utcnow()
+        result = await self.db.execute(text(
+            "SELECT LEAST(timezone('utc', statement_timestamp()), "
+            "(SELECT min(timezone('utc', xact_start)) FROM pg_stat_activity "
+            "WHERE xact_start IS NOT NULL AND pid <> pg_backend_pid()))"
+        ))
+        return result.scalar_one()
+
+    async def latest_snapshot_at(self, at: datetime) -> Optional[datetime]:
+        result = await self.db.execute(
+            select(func.max(OrderStateSnapshot.snapshot_at)).where(OrderStateSnapshot.snapshot_at <= at)
+        )
+        return result.scalar_one_or_none()
+
+    async def states_as_of_query(self, at: datetime, order_ids: Optional[List[UUID]] = None):
+        """
+        Builds a query of (order_id, state) for every order that existed at at.
+
+        Starts from the latest snapshot taken at or before at and applies only
+        the logs written after it: the last log per order in that interval,
+        picked with a window function over the (transition_date, id) index,
+        replaces the snapshot state. Orders created after at have no rows.
+        """
+        base = await self.latest_snapshot_at(at)
+
+        logs = select(
+            TransitionLog.order_id,
+            TransitionLog.new_state,
+            func.row_number().over(
+                partition_by=TransitionLog.order_id,
+                order_by=(TransitionLog.transition_date.desc(), TransitionLog.id.desc())
+            ).label("position")
+        ).where(TransitionLog.transition_date <= at)
+        if base is not None:
+            logs = logs.where(TransitionLog.transition_date > base)
+        if order_ids is not None:
+            logs = logs.where(TransitionLog.order_id.in_(order_ids))
+        ranked = logs.subquery("ranked_logs")
+        latest = (
+            select(ranked.c.order_id, ranked.c.new_state.label("state"))
+            .where(ranked.c.position == 1)
+            .cte("latest_logs")
+        )
+        if base is None:
+            return select(latest.c.order_id, latest.c.state)
+
+        snapshot = select(OrderStateSnapshot.order_id, OrderStateSnapshot.state).where(
+            OrderStateSnapshot.snapshot_at == base,
+            ~select(latest.c.order_id).where(latest.c.order_id == OrderStateSnapshot.order_id).exists()
+        )
+        if order_ids is not None:
+            snapshot = snapshot.where(OrderStateSnapshot.order_id.in_(order_ids))
+        states = union_all(select(latest.c.order_id, latest.c.state), snapshot).subquery("states")
+        return select(states.c.order_id, states.c.state)
+
+    async def get_states_as_of(self, at: datetime, order_ids: Iterable[UUID]) -> Dict[UUID, str]:
+        order_ids = list(set(order_ids))
+        if not order_ids:
+            return {}
+        result = await self.db.execute(await self.states_as_of_query(at, order_ids))
+        return dict(result.all())
+
+    async def stream_states_as_of(
+        self,
+        at: datetime,
+        chunk_size: int = 10000
+    ) -> AsyncIterator[List[Tuple[UUID, str]]]:
+        """Yields the (order_id, state) of every order at at, in chunks read from a server-side cursor."""
+        query = (await self.states_as_of_query(at)).execution_options(yield_per=chunk_size)
+        result = await self.db.stream(query)
+        async for rows in result.partitions():
+            yield [tuple(row) for row in rows]
+
+    async def create_snapshot(self, at: datetime, keep: int = 0) -> int:
+        """
+        Stores the state of every order at at, computed from the previous snapshot, and commits.
+
+        With keep > 0, only the keep most recent snapshots are kept afterwards.
+        Returns the number of orders in the snapshot.
+        """
+        states = (await self.states_as_of_query(at)).subquery("snapshot_states")
+        await self.db.execute(
+            insert(OrderStateSnapshot).from_select(
+                ["snapshot_at", "order_id", "state"],
+                select(literal(at, DateTime), states.c.order_id, states.c.state)
+            )
+        )
+
+        if keep > 0:
+            kept = (
+                select(OrderStateSnapshot.snapshot_at)
+                .distinct()
+                .order_by(OrderStateSnapshot.snapshot_at.desc())
+                .limit(keep)
+            )
+            oldest_kept = (await self.db.execute(select(func.min(kept.subquery().c.snapshot_at)))).scalar_one()
+            await self.db.execute(delete(OrderStateSnapshot).where(OrderStateSnapshot.snapshot_at < oldest_kept))
+
+        result = await self.db.execute(
+            select(func.count()).select_from(OrderStateSnapshot).where(OrderStateSnapshot.snapshot_at == at)
+        )
+        await self.db.commit()
+        return result.scalar_one()
@@ -0,0 +1,31 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+from uuid import UUID
+
+
+def encode_cursor(position: datetime, row_id: UUID) -> str:
+    raw = f"{position.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        position, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(position), UUID(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def encode_change_cursor(txid: int, seq: int) -> str:
+    return f"{txid}.{seq}"
+
+
+def decode_change_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        txid, seq = cursor.split(".", 1)
+        return int(txid), int(seq)
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
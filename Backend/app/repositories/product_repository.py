@@ -1,7 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models.product import Product
-from typing import Optional, List
+from typing import Dict, Iterable, Optional, List
 from uuid import UUID
 
 
@@ -22,6 +22,15 @@ class ProductRepository:
         )
         return result.scalar_one_or_none()
 
+    async def get_by_ids(self, product_ids: Iterable[UUID]) -> Dict[UUID, Product]:
+        ids = set(product_ids)
+        if not ids:
+            return {}
+        result = await self.db.execute(
+            select(Product).where(Product.id.in_(ids))
+        )
+        return {product.id: product for product in result.scalars().all()}
+
     async def get_all(self) -> List[Product]:
         result = await self.db.execute(select(Product))
         return result.scalars().all()
\ No newline at end of file
@@ -1,4 +1,12 @@
-from typing import List
+import copy
+import dataclasses
+import hashlib
+import os
+import threading
+import yaml
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from app.config.database import settings
 from app.services.rule_engine import (
     Rule,
     RuleCondition,
@@ -6,164 +14,254 @@ from app.services.rule_engine import (
     RuleConditionType,
     RuleActionType
 )
+from app.services.rule_compiler import CompiledRule, compile_rule
+from app.services.rule_index import RuleIndex
+
+
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(__file__), "..", "config", "rules.yaml")
+
+
+def _condition_from_dict(data: Dict[str, Any]) -> RuleCondition:
+    return RuleCondition(
+        condition_type=RuleConditionType(data["condition_type"]),
+        field=data.get("field", ""),
+        value=data.get("value"),
+        operator=data.get("operator"),
+        sub_conditions=[_condition_from_dict(sub) for sub in data["sub_conditions"]]
+        if data.get("sub_conditions") is not None else None,
+        window_seconds=data.get("window_seconds")
+    )
+
+
+def _rule_from_dict(data: Dict[str, Any]) -> Rule:
+    return Rule(
+        id=data["id"],
+        name=data["name"],
+        description=data.get("description", ""),
+        event=data["event"],
+        conditions=[_condition_from_dict(c) for c in data.get("conditions") or []],
+        actions=[
+            RuleAction(
+                action_type=RuleActionType(a["action_type"]),
+                parameters=a.get("parameters") or {},
+                priority=a.get("priority", 0)
+            )
+            for a in data.get("actions") or []
+        ],
+        enabled=data.get("enabled", True),
+        priority=data.get("priority", 0)
+    )
+
+
+def load_rules_file(path: str) -> Tuple[List[Rule], str]:
+    """Parses a YAML (or JSON) rules file, returning the rules and a checksum of its content."""
+    with open(path, "rb") as f:
+        content = f.read()
+
+    try:
+        data = yaml.safe_load(content) or {}
+        rules = [_rule_from_dict(item) for item in data.get("rules") or []]
+    except (yaml.YAMLError, KeyError, TypeError, ValueError, AttributeError) as e:
+        raise ValueError(f"Invalid rules file {path}: {e}") from e
+
+    ids = [rule.id for rule in rules]
+    if len(ids) != len(set(ids)):
+        raise ValueError(f"Invalid rules file {path}: duplicate rule ids")
+
+    return rules, hashlib.sha256(content).hexdigest()
+
+
+class RuleSnapshot:
+    """
+    An immutable, versioned view of the rule set.
+
+    Readers take the current snapshot once and keep using it for a whole
+    evaluation, so a concurrent reload or edit never changes rules under them.
+    The candidate index is built on first use. The snapshot owns its Rule
+    objects: the repository copies rules on the way in and out, so they are
+    never mutated after being compiled. checksum is that of the rules file the
+    snapshot derives from, edits included.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        rules: Tuple[Rule, ...],
+        compiled: Dict[str, CompiledRule],
+        source: Optional[str] = None,
+        checksum: Optional[str] = None
+    ):
+        self.version = version
+        self.rules = rules
+        self.source = source
+        self.checksum = checksum
+        self.loaded_at = datetime.utcnow()
+        self._compiled = compiled
+        self._index: Optional[RuleIndex] = None
+        self._fields: Dict[str, FrozenSet[str]] = {}
+
+    @classmethod
+    def build(cls, version: int, rules: List[Rule], previous: Optional["RuleSnapshot"] = None, **kwargs) -> "RuleSnapshot":
+        # Rules that are the same object as in the previous snapshot keep their compiled form
+        reusable = previous._compiled if previous else {}
+        compiled = {}
+        for rule in rules:
+            existing = reusable.get(rule.id)
+            compiled[rule.id] = existing if existing is not None and existing.rule is rule else compile_rule(rule)
+        return cls(version, tuple(rules), compiled, **kwargs)
+
+    @property
+    def index(self) -> RuleIndex:
+        if self._index is None:
+            self._index = RuleIndex([self._compiled[rule.id] for rule in self.rules if rule.enabled])
+        return self._index
+
+    def compiled_rule(self, rule_id: str) -> Optional[CompiledRule]:
+        return self._compiled.get(rule_id)
+
+    def fields_for(self, event: str) -> FrozenSet[str]:
+        """Every field read by the enabled rules for the event."""
+        fields = self._fields.get(event)
+        if fields is None:
+            fields = self._fields[event] = frozenset().union(*(
+                self._compiled[rule.id].fields for rule in self.rules if rule.event == event and rule.enabled
+            ))
+        return fields
 
 
 class RuleRepository:
+    """
+    Holds the active rule snapshot and swaps it atomically on every change.
+
+    Writers (reload, add/update/delete/toggle) are serialized by a lock and publish a
+    new snapshot with the next version; readers never take the lock.
+
+    Edits made through the API live in memory: they are kept across reloads
+    while the rules file is unchanged, and replaced by the file's rules once
+    its content changes.
+    """
+
+    def __init__(self, rules_file: Optional[str] = None):
+        self._rules_file = rules_file or settings.RULES_FILE or DEFAULT_RULES_FILE
+        self._write_lock = threading.Lock()
+        rules, checksum = load_rules_file(self._rules_file)
+        self._file_checksum = checksum
+        self._snapshot = RuleSnapshot.build(1, rules, source=self._rules_file, checksum=checksum)
+
+    @property
+    def rules_file(self) -> str:
+        return self._rules_file
 
-    def __init__(self):
-        self._rules = self._initialize_rules()
-
-    def _initialize_rules(self) -> List[Rule]:
-        return [
-            # Rule 1: Threshold Review - orders > $1000 require review
-            Rule(
-                id="rule_001",
-                name="High Value Order Review",
-                description="Orders over $1000 must go through review process",
-                event="order_transition",
-                conditions=[
-                    RuleCondition(
-                        condition_type=RuleConditionType.GREATER_THAN,
-                        field="amount",
-                        value=1000.0
-                    ),
-                    RuleCondition(
-                        condition_type=RuleConditionType.EQUALS,
-                        field="action",
-                        value="start_preparation"
-                    ),
-                    RuleCondition(
-                        condition_type=RuleConditionType.EQUALS,
-                        field="current_state",
-                        value="pending"
-                    )
-                ],
-                actions=[
-                    RuleAction(
-                        action_type=RuleActionType.BLOCK_TRANSITION,
-                        parameters={
-                            "reason": "Orders over $1000 require review"
-                        },
-                        priority=1
-                    ),
-                    RuleAction(
-                        action_type=RuleActionType.ADD_METADATA,
-                        parameters={
-                            "data": {
-                                "requires_review": True,
-                                "review_threshold": 1000.0
-                            }
-                        },
-                        priority=2
-                    )
-                ],
-                enabled=True,
-                priority=1
-            ),
-
-            # Rule 2: High tax for high value orders
-            Rule(
-                id="rule_003",
-                name="Premium Tax Calculation",
-                description="Apply 15% tax for orders over $1000",
-                event="order_transition",
-                conditions=[
-                    RuleCondition(
-                        condition_type=RuleConditionType.GREATER_THAN,
-                        field="amount",
-                        value=1000.0
-                    ),
-                    RuleCondition(
-                        condition_type=RuleConditionType.IN_LIST,
-                        field="action",
-                        value=["approve", "start_preparation"]
-                    )
-                ],
-                actions=[
-                    RuleAction(
-                        action_type=RuleActionType.CALCULATE_TAX,
-                        parameters={
-                            "rate": 0.15,
-                            "description": "Premium tax rate for high-value orders"
-                        },
-                        priority=3
-                    )
-                ],
-                enabled=True,
-                priority=2
-            ),
-
-            # Rule 3: Notification for cancelled orders
-            Rule(
-                id="rule_005",
-                name="Cancellation Notification",
-                description="Send notification when order is cancelled",
-                event="order_transition",
-                conditions=[
-                    RuleCondition(
-                        condition_type=RuleConditionType.EQUALS,
-                        field="action",
-                        value="cancel"
-                    )
-                ],
-                actions=[
-                    RuleAction(
-                        action_type=RuleActionType.SEND_NOTIFICATION,
-                        parameters={
-                            "type": "email",
-                            "template": "order_cancelled",
-                            "recipients": ["customer", "admin"]
-                        },
-                        priority=1
-                    ),
-                    RuleAction(
-                        action_type=RuleActionType.ADD_METADATA,
-                        parameters={
-                            "data": {
-                                "notification_sent": True,
-                                "cancellation_processed": True
-                            }
-                        },
-                        priority=2
-                    )
-                ],
-                enabled=True,
-                priority=1
+    def snapshot(self) -> RuleSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def reload(self, force: bool = False) -> RuleSnapshot:
+        """
+        Re-reads the rules file and publishes it as a new snapshot.
+
+        Raises ValueError, keeping the current snapshot, if the file is invalid.
+        Unless forced, a file unchanged since it was last read does not bump the
+        version, and edits made since then are kept.
+        """
+        rules, checksum = load_rules_file(self._rules_file)
+        with self._write_lock:
+            current = self._snapshot
+            if not force and checksum == self._file_checksum:
+                return current
+            self._file_checksum = checksum
+            self._snapshot = RuleSnapshot.build(
+                current.version + 1, rules, source=self._rules_file, checksum=checksum
             )
-        ]
+            return self._snapshot
+
+    def _publish(self, rules: List[Rule]) -> None:
+        current = self._snapshot
+        owned = {id(rule) for rule in current.rules}
+        # Rules from outside are copied, so the caller cannot change them once compiled
+        rules = [rule if id(rule) in owned else copy.deepcopy(rule) for rule in rules]
+        self._snapshot = RuleSnapshot.build(
+            current.version + 1, rules, previous=current, source=current.source, checksum=current.checksum
+        )
 
     def get_all_rules(self) -> List[Rule]:
-        return self._rules
+        """Copies of every rule; changing them has no effect until passed to update_rule."""
+        return copy.deepcopy(list(self._snapshot.rules))
 
     def get_rules_by_event(self, event: str) -> List[Rule]:
-        return [rule for rule in self._rules if rule.event == event and rule.enabled]
+        return [rule for rule in self._snapshot.rules if rule.event == event and rule.enabled]
+
+    def get_compiled_rules_by_event(self, event: str) -> List[CompiledRule]:
+        snapshot = self._snapshot
+        return [snapshot.compiled_rule(rule.id) for rule in snapshot.rules if rule.event == event and rule.enabled]
+
+    def get_candidate_rules(self, event: str, action: Optional[str], current_state: Optional[str]) -> List[CompiledRule]:
+        """Enabled rules for the event whose action/state pins do not rule them out."""
+        return self._snapshot.index.candidates(event, action, current_state)
+
+    def get_candidate_tiers(
+        self,
+        event: str,
+        action: Optional[str],
+        current_state: Optional[str]
+    ) -> List[List[Tuple[int, CompiledRule]]]:
+        """The candidate rules grouped by Rule.priority, for short-circuit evaluation."""
+        return self._snapshot.index.tiers(event, action, current_state)
 
     def get_rule_by_id(self, rule_id: str) -> Rule:
-        for rule in self._rules:
+        """A copy of the rule; changing it has no effect until passed to update_rule."""
+        for rule in self._snapshot.rules:
             if rule.id == rule_id:
-                return rule
+                return copy.deepcopy(rule)
         return None
 
     def add_rule(self, rule: Rule) -> None:
-        self._rules.append(rule)
+        with self._write_lock:
+            self._publish(list(self._snapshot.rules) + [rule])
 
     def update_rule(self, rule_id: str, updated_rule: Rule) -> bool:
-        for i, rule in enumerate(self._rules):
-            if rule.id == rule_id:
-                self._rules[i] = updated_rule
-                return True
+        with self._write_lock:
+            rules = list(self._snapshot.rules)
+            for i, rule in enumerate(rules):
+                if rule.id == rule_id:
+                    rules[i] = updated_rule
+                    self._publish(rules)
+                    return True
         return False
 
     def delete_rule(self, rule_id: str) -> bool:
-        for i, rule in enumerate(self._rules):
-            if rule.id == rule_id:
-                self._rules.pop(i)
-                return True
+        with self._write_lock:
+            rules = list(self._snapshot.rules)
+            for i, rule in enumerate(rules):
+                if rule.id == rule_id:
+                    rules.pop(i)
+                    self._publish(rules)
+                    return True
         return False
 
     def toggle_rule(self, rule_id: str, enabled: bool) -> bool:
-        for rule in self._rules:
-            if rule.id == rule_id:
-                rule.enabled = enabled
-                return True
+        with self._write_lock:
+            rules = list(self._snapshot.rules)
+            for i, rule in enumerate(rules):
+                if rule.id == rule_id:
+                    rules[i] = dataclasses.replace(rule, enabled=enabled)
+                    self._publish(rules)
+                    return True
         return False
+
+
+_default_repository: Optional[RuleRepository] = None
+_default_repository_lock = threading.Lock()
+
+
+def get_rule_repository() -> RuleRepository:
+    """Returns the process-wide rule repository, loading it on first use."""
+    global _default_repository
+    if _default_repository is None:
+        with _default_repository_lock:
+            if _default_repository is None:
+                _default_repository = RuleRepository()
+    return _default_repository
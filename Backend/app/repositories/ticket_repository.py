@@ -1,11 +1,15 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import insert
 from app.models.ticket import Ticket
-from uuid import UUID
+from datetime import datetime
+from uuid import UUID, uuid4
 from typing import List, Optional
 
 
 class TicketRepository:
+    INSERT_CHUNK_SIZE = 1000
+
     def __init__(self, db: AsyncSession):
         self.db = db
 
@@ -16,6 +20,20 @@ class TicketRepository:
         await self.db.refresh(ticket)
         return ticket
 
+    async def create_many(self, tickets_data: List[dict]) -> None:
+        if not tickets_data:
+            return
+        rows = [
+            {
+                "id": uuid4(),
+                "creation_date": datetime.utcnow(),
+                **data
+            }
+            for data in tickets_data
+        ]
+        for start in range(0, len(rows), self.INSERT_CHUNK_SIZE):
+            await self.db.execute(insert(Ticket.__table__), rows[start:start + self.INSERT_CHUNK_SIZE])
+
     async def get_by_id(self, ticket_id: UUID) -> Optional[Ticket]:
         result = await self.db.execute(
             select(Ticket).where(Ticket.id == ticket_id)
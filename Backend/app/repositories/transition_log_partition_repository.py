@@ -0,0 +1,245 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import column, select, table, text
+from app.models.transition_log import TransitionLog
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+import re
+
+
+PARTITION_PREFIX = f"{TransitionLog.__tablename__}_p"
+DEFAULT_PARTITION = f"{TransitionLog.__tablename__}_default"
+_PARTITION_NAME = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+# Advisory lock keys: creating partitions, and archiving expired ones
+PARTITION_DDL_LOCK = 7260002
+ARCHIVE_LOCK = 7260003
+_DEFAULT_BATCH_NAME = re.compile(rf"^{DEFAULT_PARTITION}_\d{{14}}$")
+
+
+def month_start(at: datetime) -> datetime:
+    return datetime(at.year, at.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[datetime]:
+    """The first day of the month a partition holds, or None for tables that are not monthly partitions."""
+    match = _PARTITION_NAME.match(name)
+    return datetime(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def is_archivable(name: str) -> bool:
+    """Whether name is a monthly partition or a batch of expired rows moved out of the default partition."""
+    return partition_month(name) is not None or _DEFAULT_BATCH_NAME.match(name) is not None
+
+
+@dataclass(frozen=True)
+class LogPartition:
+    name: str
+    start: datetime
+    end: datetime
+
+
+class TransitionLogPartitionRepository:
+    """
+    Monthly range partitions of transition_logs on PostgreSQL.
+
+    Partitions are named transition_logs_pYYYYMM and hold [month, next month)
+    of transition_date. A default partition catches rows outside every month
+    created so far, so an insert never fails for lack of a partition. Its rows
+    are moved into a month's partition when that month is created, and its
+    expired rows into a standalone transition_logs_default_<timestamp> table
+    that is archived like a detached month.
+
+    Every process may call ensure_partitions (init_db does at startup): it
+    serializes on a transaction-level advisory lock. Archiving runs under
+    archive_lock, so at most one process exports and drops tables at a time.
+
+    An existing unpartitioned transition_logs is not converted automatically.
+    With the application stopped, rename it (and its indexes) to
+    transition_logs_legacy, start with TRANSITION_LOG_PARTITIONING enabled so
+    the partitioned table is created, then copy the rows over in batches of
+    transition_date ranges with INSERT ... SELECT and drop the legacy table.
+    Months older than the partitions created land in the default partition,
+    from where retention archives them once expired.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def is_partitioned(self) -> bool:
+        result = await self.db.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass(:table))"
+            ),
+            {"table": TransitionLog.__tablename__}
+        )
+        return bool(result.scalar())
+
+    async def get_partitions(self) -> List[LogPartition]:
+        """The monthly partitions currently attached, oldest first."""
+        result = await self.db.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = to_regclass(:table)"
+            ),
+            {"table": TransitionLog.__tablename__}
+        )
+        partitions = []
+        for name in result.scalars():
+            month = partition_month(name)
+            if month is not None:
+                partitions.append(LogPartition(name=name, start=month, end=add_months(month, 1)))
+        return sorted(partitions, key=lambda partition: partition.start)
+
+    async def get_detached(self) -> List[str]:
+        """Monthly partition tables that were detached but not dropped yet, oldest first."""
+        result = await self.db.execute(
+            text(
+                "SELECT c.relname FROM pg_class c "
+                "WHERE c.relkind = 'r' AND c.relnamespace = current_schema()::regnamespace "
+                "AND c.relname LIKE :prefix "
+                "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)"
+            ),
+            {"prefix": f"{TransitionLog.__tablename__}_%"}
+        )
+        return sorted(name for name in result.scalars() if is_archivable(name))
+
+    async def ensure_partitions(self, months_ahead: int, now: Optional[datetime] = None) -> List[str]:
+        """
+        Creates the default partition and the monthly partitions from the current
+        month to months_ahead months later that do not exist yet, and commits.
+
+        PostgreSQL refuses to create a partition for a range the default
+        partition already holds rows of. For such a month the default is
+        detached, the partition created, the rows moved into it and the default
+        re-attached, all in one transaction that blocks writes to the table
+        until it commits.
+
+        Returns the names of the partitions created.
+        """
+        current = month_start(now or datetime.utcnow())
+        # Held until the commit below; the existing partitions are read after it is acquired
+        await self.db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_DDL_LOCK})
+        existing = {partition.name for partition in await self.get_partitions()}
+        created = []
+
+        await self.db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TransitionLog.__tablename__} DEFAULT"
+        ))
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            name = partition_name(month)
+            if name in existing:
+                continue
+            bounds = {"start": month, "end": add_months(month, 1)}
+            has_rows = await self.db.execute(
+                text(
+                    f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} "
+                    "WHERE transition_date >= :start AND transition_date < :end)"
+                ),
+                bounds
+            )
+            moving = bool(has_rows.scalar())
+            if moving:
+                await self.db.execute(text(
+                    f"ALTER TABLE {TransitionLog.__tablename__} DETACH PARTITION {DEFAULT_PARTITION}"
+                ))
+            # Bounds are literals from datetime, never user input
+            await self.db.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {TransitionLog.__tablename__} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{bounds['end']:%Y-%m-%d}')"
+            ))
+            if moving:
+                await self.db.execute(
+                    text(
+                        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                        "WHERE transition_date >= :start AND transition_date < :end RETURNING *) "
+                        f"INSERT INTO {name} SELECT * FROM moved"
+                    ),
+                    bounds
+                )
+                await self.db.execute(text(
+                    f"ALTER TABLE {TransitionLog.__tablename__} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"
+                ))
+            created.append(name)
+
+        await self.db.commit()
+        return created
+
+    @asynccontextmanager
+    async def archive_lock(self) -> AsyncIterator[bool]:
+        """
+        Tries to take the archive lock for the block and yields whether it did.
+
+        Archiving commits several times, so the lock is a session-level one held
+        on a connection of its own rather than on this session's.
+        """
+        async with self.db.bind.connect() as conn:
+            acquired = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ARCHIVE_LOCK})).scalar()
+            try:
+                yield bool(acquired)
+            finally:
+                if acquired:
+                    await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ARCHIVE_LOCK})
+
+    async def move_expired_default_rows(self, before: datetime) -> Optional[str]:
+        """
+        Moves the default partition's rows dated before before into a new
+        standalone table, and commits.
+
+        Returns the table's name, or None when there was nothing to move. The
+        move is one statement, so a row is either still in the default
+        partition or in the table.
+        """
+        name = f"{DEFAULT_PARTITION}_{datetime.utcnow():%Y%m%d%H%M%S}"
+        await self.db.execute(text(f"CREATE TABLE {name} (LIKE {TransitionLog.__tablename__})"))
+        result = await self.db.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE transition_date < :before RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ),
+            {"before": before}
+        )
+        if not result.rowcount:
+            await self.db.rollback()
+            return None
+        await self.db.commit()
+        return name
+
+    async def detach_partition(self, name: str) -> None:
+        """Detaches a monthly partition into a standalone table, and commits."""
+        if partition_month(name) is None:
+            raise ValueError(f"{name} is not a monthly partition of {TransitionLog.__tablename__}")
+        await self.db.execute(text(f"ALTER TABLE {TransitionLog.__tablename__} DETACH PARTITION {name}"))
+        await self.db.commit()
+
+    async def stream_rows(self, name: str, chunk_size: int = 50000) -> AsyncIterator[List[tuple]]:
+        """Yields the rows of a detached partition in TransitionLog column order, in chunks."""
+        if not is_archivable(name):
+            raise ValueError(f"{name} is not an archivable table of {TransitionLog.__tablename__}")
+        columns = [column(c.name) for c in TransitionLog.__table__.columns]
+        query = (
+            select(*columns)
+            .select_from(table(name, *columns))
+            .execution_options(yield_per=chunk_size)
+        )
+        result = await self.db.stream(query)
+        async for chunk in result.partitions():
+            yield [tuple(row) for row in chunk]
+
+    async def drop_detached(self, name: str) -> None:
+        if not is_archivable(name):
+            raise ValueError(f"{name} is not an archivable table of {TransitionLog.__tablename__}")
+        await self.db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        await self.db.commit()
@@ -1,11 +1,17 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, func, tuple_
+from app.models.order import Order
+from app.models.order_product import OrderProduct
 from app.models.transition_log import TransitionLog
-from typing import List, Dict
+from app.repositories.pagination import encode_cursor, decode_cursor
+from datetime import datetime
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from uuid import UUID, uuid4
 
 
 class TransitionLogRepository:
+    INSERT_CHUNK_SIZE = 1000
+
     def __init__(self, db: AsyncSession):
         self.db = db
 
@@ -18,21 +24,162 @@ class TransitionLogRepository:
             action_taken=log_data["action_taken"]
         )
         self.db.add(log)
-        await self.db.flush()
         return log
 
-    async def get_by_order_id(self, order_id: UUID) -> List[TransitionLog]:
-        result = await self.db.execute(
+    async def create_many(self, logs_data: List[Dict]) -> List[Dict]:
+        """
+        Inserts the logs without committing, returning the rows written.
+
+        Rows go in as executemany batches of at most INSERT_CHUNK_SIZE, which
+        keeps every statement under the driver's bind parameter limit.
+        """
+        if not logs_data:
+            return []
+        rows = [
+            {
+                "id": uuid4(),
+                "order_id": log_data["order_id"],
+                "previous_state": log_data["previous_state"],
+                "new_state": log_data["new_state"],
+                "action_taken": log_data["action_taken"],
+                "transition_date": datetime.utcnow()
+            }
+            for log_data in logs_data
+        ]
+        for start in range(0, len(rows), self.INSERT_CHUNK_SIZE):
+            await self.db.execute(insert(TransitionLog.__table__), rows[start:start + self.INSERT_CHUNK_SIZE])
+        return rows
+
+    async def get_by_order_id(self, order_id: UUID, since: Optional[datetime] = None) -> List[TransitionLog]:
+        """
+        The order's logs, oldest first.
+
+        since is a lower bound on transition_date, typically the order's
+        creation_date: on a partitioned table only the months from then on
+        are scanned.
+        """
+        query = (
             select(TransitionLog)
             .where(TransitionLog.order_id == order_id)
             .order_by(TransitionLog.transition_date.asc())
         )
+        if since is not None:
+            query = query.where(TransitionLog.transition_date >= since)
+        result = await self.db.execute(query)
         return list(result.scalars().all())
 
-    async def get_all(self, limit: int = 100) -> List[TransitionLog]:
-        result = await self.db.execute(
+    async def get_all(
+        self,
+        limit: int = 100,
+        transition_from: Optional[datetime] = None,
+        transition_to: Optional[datetime] = None
+    ) -> List[TransitionLog]:
+        """The newest logs in [transition_from, transition_to); partitions outside the range are not scanned."""
+        query = (
             select(TransitionLog)
             .order_by(TransitionLog.transition_date.desc())
             .limit(limit)
         )
+        if transition_from is not None:
+            query = query.where(TransitionLog.transition_date >= transition_from)
+        if transition_to is not None:
+            query = query.where(TransitionLog.transition_date < transition_to)
+        result = await self.db.execute(query)
         return list(result.scalars().all())
+
+    async def get_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        action: Optional[str] = None,
+        new_state: Optional[str] = None,
+        order_id: Optional[UUID] = None,
+        transition_from: Optional[datetime] = None,
+        transition_to: Optional[datetime] = None
+    ) -> Tuple[List[TransitionLog], Optional[str]]:
+        """
+        Returns one page of logs, newest first, and the cursor of the next page.
+
+        Keyset pagination on (transition_date, id), like OrderRepository.get_page.
+        Each filter has a (column, transition_date, id) index, so a page is a
+        range scan of at most limit + 1 index entries however deep it is. On a
+        partitioned table transition_from and transition_to also limit the scan
+        to the months they cover.
+        """
+        query = (
+            select(TransitionLog)
+            .order_by(TransitionLog.transition_date.desc(), TransitionLog.id.desc())
+            .limit(limit + 1)
+        )
+
+        if action is not None:
+            query = query.where(TransitionLog.action_taken == action)
+        if new_state is not None:
+            query = query.where(TransitionLog.new_state == new_state)
+        if order_id is not None:
+            query = query.where(TransitionLog.order_id == order_id)
+        if transition_from is not None:
+            query = query.where(TransitionLog.transition_date >= transition_from)
+        if transition_to is not None:
+            query = query.where(TransitionLog.transition_date < transition_to)
+        if cursor is not None:
+            last_date, last_id = decode_cursor(cursor)
+            query = query.where(tuple_(TransitionLog.transition_date, TransitionLog.id) < (last_date, last_id))
+
+        result = await self.db.execute(query)
+        logs = list(result.scalars().all())
+
+        next_cursor = None
+        if len(logs) > limit:
+            logs = logs[:limit]
+            last = logs[-1]
+            next_cursor = encode_cursor(last.transition_date, last.id)
+
+        return logs, next_cursor
+
+    async def stream_rule_replay_rows(
+        self,
+        chunk_size: int = 50000,
+        transition_from: Optional[datetime] = None,
+        transition_to: Optional[datetime] = None
+    ) -> AsyncIterator[List[tuple]]:
+        """
+        Yields (previous_state, action_taken, amount, total_products, has_high_value_product,
+        order_id, customer_id) for every logged transition, in chunks read from a
+        server-side cursor.
+
+        previous_state is the order's state when the action was requested. Creation
+        logs are skipped: they were not transitions and no rule ran for them.
+        """
+        lines = (
+            select(
+                OrderProduct.order_id,
+                func.count(OrderProduct.product_id).label("total_products"),
+                func.max(OrderProduct.unit_price).label("max_unit_price")
+            )
+            .group_by(OrderProduct.order_id)
+            .subquery()
+        )
+        query = (
+            select(
+                TransitionLog.previous_state,
+                TransitionLog.action_taken,
+                Order.amount,
+                func.coalesce(lines.c.total_products, 0),
+                func.coalesce(lines.c.max_unit_price, 0) > 500,
+                TransitionLog.order_id,
+                Order.customer_id
+            )
+            .join(Order, Order.id == TransitionLog.order_id)
+            .outerjoin(lines, lines.c.order_id == TransitionLog.order_id)
+            .where(TransitionLog.action_taken != "create")
+            .execution_options(yield_per=chunk_size)
+        )
+        if transition_from is not None:
+            query = query.where(TransitionLog.transition_date >= transition_from)
+        if transition_to is not None:
+            query = query.where(TransitionLog.transition_date < transition_to)
+
+        result = await self.db.stream(query)
+        async for chunk in result.partitions():
+            yield [tuple(row) for row in chunk]
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from datetime import datetime
+from uuid import UUID
+from typing import List, Optional
+from app.schemas.order import OrderResponse
+
+
+class OrderClaimResponse(BaseModel):
+    lease_id: UUID
+    worker_id: Optional[str] = None
+    expires_at: datetime
+    orders: List[OrderResponse]
+
+
+class ClaimHeartbeatResponse(BaseModel):
+    lease_id: UUID
+    expires_at: datetime
+    order_ids: List[UUID]
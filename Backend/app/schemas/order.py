@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, computed_field
+from pydantic import AliasChoices, BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
 from uuid import UUID
@@ -20,24 +20,65 @@ class OrderResponse(BaseModel):
     current_state: str
     creation_date: datetime
     customer: CustomerResponse
+    products: List[ProductInOrder] = Field(
+        default_factory=list,
+        validation_alias=AliasChoices("products", "order_products")
+    )
     notes: Optional[str]
 
     class Config:
         from_attributes = True
 
-    @computed_field
-    @property
-    def products(self) -> List[ProductInOrder]:
+    @field_validator("products", mode="before")
+    @classmethod
+    def _convert_order_products(cls, value):
         """Convert order_products to the expected structure"""
-        if not hasattr(self, 'order_products'):
-            return []
-
         result = []
-        for op in self.order_products:
+        for item in value or []:
+            if isinstance(item, (dict, ProductInOrder)):
+                result.append(item)
+                continue
             result.append(ProductInOrder(
-                product_id=op.product_id,
-                name=op.product.name if hasattr(op, 'product') and op.product else "Unknown",
-                quantity=op.quantity,
-                unit_price=op.unit_price
+                product_id=item.product_id,
+                name=item.product.name if getattr(item, "product", None) else "Unknown",
+                quantity=item.quantity,
+                unit_price=item.unit_price
             ))
         return result
+
+
+class OrderBulkResult(BaseModel):
+    index: int
+    success: bool
+    order_id: Optional[UUID] = None
+    error: Optional[str] = None
+
+
+class OrderChangeItem(BaseModel):
+    seq: int
+    order_id: UUID
+    change_type: str
+    current_state: Optional[str] = None
+    changed_at: datetime
+    order: Optional[OrderResponse] = None
+
+
+class OrderChangesResponse(BaseModel):
+    changes: List[OrderChangeItem]
+    cursor: str
+    has_more: bool
+
+
+class OrderStateAsOf(BaseModel):
+    order_id: UUID
+    state: Optional[str] = None
+
+
+class OrderStatesAsOfRequest(BaseModel):
+    ts: datetime
+    order_ids: List[UUID]
+
+
+class OrderSnapshotResult(BaseModel):
+    snapshot_at: datetime
+    orders: int
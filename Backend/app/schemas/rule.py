@@ -0,0 +1,68 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class RuleSetVersionResponse(BaseModel):
+    version: int
+    checksum: Optional[str]
+    source: Optional[str]
+    loaded_at: datetime
+    rule_count: int
+
+
+class RuleAuditResponse(BaseModel):
+    version: int
+    action: str
+    order_count: int
+    blocked_count: int
+    taxed_count: int
+    total_tax: float
+    rule_matches: Dict[str, int]
+
+
+class RuleBacktestRequest(BaseModel):
+    rule_ids: Optional[List[str]] = None
+    event: str = "order_transition"
+    transition_from: Optional[datetime] = None
+    transition_to: Optional[datetime] = None
+
+
+class RuleOutcomeCacheStats(BaseModel):
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    hit_rate: float
+    rules_version: Optional[int]
+
+
+class RuleConditionProfile(BaseModel):
+    index: int
+    path: str
+    condition: str
+    evaluations: int
+    passed: int
+    short_circuits: int
+    pass_rate: Optional[float]
+    mean_us: Optional[float]
+
+
+class RuleProfile(BaseModel):
+    rule_id: str
+    name: str
+    evaluations: int
+    matches: int
+    cache_hits: int
+    match_rate: Optional[float]
+    total_ms: float
+    mean_us: Optional[float]
+    histogram: Dict[str, int]
+    conditions: List[RuleConditionProfile]
+    recommended_order: List[int]
+    reorder_suggested: bool
+
+
+class RuleProfileResponse(BaseModel):
+    enabled: bool
+    rules: List[RuleProfile]
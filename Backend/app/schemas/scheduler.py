@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from datetime import datetime
+from uuid import UUID
+from typing import List, Optional
+
+
+class SchedulePolicyResponse(BaseModel):
+    name: str
+    state: str
+    after_hours: float
+    action: Optional[str] = None
+
+
+class SchedulerStatusResponse(BaseModel):
+    running: bool
+    policies: List[SchedulePolicyResponse]
+    tracked_orders: int
+    next_deadline: Optional[datetime] = None
+    flagged_orders: int
+
+
+class StuckOrderResponse(BaseModel):
+    order_id: UUID
+    policy: str
+    state: str
+    state_entered_at: datetime
+    flagged_at: datetime
@@ -1,7 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from uuid import UUID
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 
 class TransitionRequest(BaseModel):
@@ -18,4 +18,34 @@ class TransitionLogResponse(BaseModel):
     transition_date: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class BatchTransitionItem(BaseModel):
+    order_id: UUID
+    action: str
+    cancellation_reason: Optional[str] = None
+
+
+class BatchTransitionRequest(BaseModel):
+    transitions: List[BatchTransitionItem]
+
+
+class BatchTransitionResult(BaseModel):
+    order_id: UUID
+    success: bool
+    previous_state: Optional[str] = None
+    new_state: Optional[str] = None
+    rule_metadata: Dict[str, Any] = {}
+    calculations: Dict[str, Any] = {}
+    error: Optional[str] = None
+
+
+class AllowedActionsRequest(BaseModel):
+    # A page of orders; also keeps the IN lists of the lookup under the driver's parameter limit
+    order_ids: List[UUID] = Field(..., max_length=1000)
+
+
+class AllowedActionsResult(BaseModel):
+    order_id: UUID
+    allowed_actions: List[str] = []
+    error: Optional[str] = None
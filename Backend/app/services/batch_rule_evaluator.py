@@ -0,0 +1,380 @@
+import numbers
+import numpy as np
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Union
+from app.services.rule_engine import (
+    Rule,
+    RuleAction,
+    RuleActionType,
+    RuleCondition,
+    RuleConditionType
+)
+from app.services.fact_context import FactContext, FactRegistry, default_fact_registry
+from app.services.rule_compiler import condition_fields
+from app.services.velocity_counters import SCOPE_KEYS, get_velocity_counters, parse_counter
+
+
+def _object_array(values: Sequence[Any]) -> np.ndarray:
+    # np.asarray would turn a list of tuples/lists into a 2-D array
+    array = np.empty(len(values), dtype=object)
+    array[:] = list(values)
+    return array
+
+
+@dataclass
+class Categorical:
+    """A string column stored as integer codes into a small list of labels."""
+    codes: np.ndarray
+    labels: np.ndarray
+
+    @classmethod
+    def from_values(cls, values: Sequence[Any]) -> "Categorical":
+        objects = _object_array(values)
+        _, first, codes = np.unique(objects.astype(str), return_index=True, return_inverse=True)
+        # Labels are the original objects (e.g. None), not their str()
+        return cls(codes=codes.astype(np.int32).reshape(-1), labels=objects[first])
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def label_mask(self, predicate) -> np.ndarray:
+        """Evaluates predicate once per distinct label and broadcasts it to the rows."""
+        per_label = np.fromiter((bool(predicate(label)) for label in self.labels), dtype=bool, count=len(self.labels))
+        return per_label[self.codes]
+
+
+Column = Union[np.ndarray, Categorical]
+
+
+@dataclass
+class OrderFacts:
+    """
+    Columnar facts for many orders, in the shape the rule conditions read them.
+
+    action may be a single action applied to every order or one action per row.
+    Fields outside the built-in columns can be supplied in extra, one value per row.
+    """
+    order_ids: List[Any]
+    amount: np.ndarray
+    current_state: Categorical
+    total_products: np.ndarray
+    has_high_value_product: np.ndarray
+    action: Optional[Union[str, Categorical]] = None
+    extra: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.order_ids)
+
+    @classmethod
+    def from_columns(
+        cls,
+        order_ids: Sequence[Any],
+        amount: Sequence[float],
+        current_state: Sequence[str],
+        total_products: Sequence[int],
+        has_high_value_product: Sequence[bool],
+        action: Optional[Union[str, Sequence[str]]] = None,
+        extra: Optional[Dict[str, Sequence[Any]]] = None
+    ) -> "OrderFacts":
+        return cls(
+            order_ids=list(order_ids),
+            amount=np.asarray(amount, dtype=np.float64),
+            current_state=Categorical.from_values(list(current_state)),
+            total_products=np.asarray(total_products, dtype=np.int64),
+            has_high_value_product=np.asarray(has_high_value_product, dtype=bool),
+            action=action if action is None or isinstance(action, str) else Categorical.from_values(list(action)),
+            extra={name: _object_array(values) for name, values in (extra or {}).items()}
+        )
+
+    @classmethod
+    def from_fact_rows(
+        cls,
+        rows: Sequence[tuple],
+        action: Optional[Union[str, Sequence[str]]] = None,
+        extra: Optional[Dict[str, Sequence[Any]]] = None
+    ) -> "OrderFacts":
+        """Builds the columns from OrderRepository.get_rule_facts rows, with customer_id as an extra column."""
+        if not rows:
+            return cls.from_columns([], [], [], [], [], action=action, extra={"customer_id": [], **(extra or {})})
+        order_ids, amount, current_state, total_products, has_high_value_product, customer_ids = zip(*rows)
+        return cls.from_columns(
+            order_ids, amount, current_state, total_products, has_high_value_product,
+            action=action,
+            extra={"customer_id": customer_ids, **(extra or {})}
+        )
+
+    @classmethod
+    def from_orders(
+        cls,
+        orders: Sequence[Any],
+        action: Optional[Union[str, Sequence[str]]] = None,
+        extra_fields: Sequence[str] = (),
+        registry: Optional[FactRegistry] = None,
+        prefetched: Optional[Dict[Any, Dict[str, Any]]] = None
+    ) -> "OrderFacts":
+        """
+        Reads the columns from loaded orders; every field is resolved as FactContext
+        resolves it, with prefetched async facts keyed by order id.
+        """
+        prefetched = prefetched or {}
+        contexts = [
+            FactContext(order, registry=registry or default_fact_registry, prefetched=prefetched.get(order.id))
+            for order in orders
+        ]
+        return cls.from_columns(
+            order_ids=[order.id for order in orders],
+            amount=[order.amount for order in orders],
+            current_state=[order.current_state for order in orders],
+            total_products=[context.get("total_products") for context in contexts],
+            has_high_value_product=[context.get("has_high_value_product") for context in contexts],
+            action=action,
+            extra={name: [context.get(name) for context in contexts] for name in extra_fields}
+        )
+
+    def column(self, name: str) -> Column:
+        if name == "action":
+            if isinstance(self.action, Categorical):
+                return self.action
+            return Categorical(codes=np.zeros(len(self), dtype=np.int32), labels=np.array([self.action], dtype=object))
+        if name in ("amount", "current_state", "total_products", "has_high_value_product"):
+            return getattr(self, name)
+        if name in self.extra:
+            return self.extra[name]
+        return np.full(len(self), None, dtype=object)
+
+
+def rule_fields(rules: Sequence[Rule]) -> FrozenSet[str]:
+    """Every field read by the conditions of rules."""
+    return frozenset().union(*(condition_fields(rule.conditions) for rule in rules))
+
+
+async def prefetch_fact_columns(
+    db: Any,
+    orders: Sequence[Dict[str, Any]],
+    fields: FrozenSet[str],
+    registry: Optional[FactRegistry] = None
+) -> Dict[str, List[Any]]:
+    """
+    Loads the async facts among fields for rows that are not loaded orders,
+    one load per provider, as columns aligned with orders.
+
+    Each row is a dict with at least id and customer_id, and is handed to the
+    providers as a stand-in order with those attributes. Rows of the same order
+    share one stand-in.
+    """
+    registry = registry or default_fact_registry
+    providers = registry.async_providers_for(fields)
+    if not providers or not orders:
+        return {}
+
+    stand_ins = {}
+    for row in orders:
+        if row["id"] not in stand_ins:
+            stand_ins[row["id"]] = SimpleNamespace(**row)
+    prefetched = await registry.prefetch(db, list(stand_ins.values()), fields)
+
+    names = sorted(frozenset().union(*(provider.facts for provider in providers)) & fields)
+    return {name: [prefetched.get(row["id"], {}).get(name) for row in orders] for name in names}
+
+
+@dataclass
+class BatchEvaluationResult:
+    rules: List[Rule]
+    matched: np.ndarray
+    blocked: np.ndarray
+    block_reason: np.ndarray
+    has_tax: np.ndarray
+    tax_rate: np.ndarray
+    tax_amount: np.ndarray
+    total_with_tax: np.ndarray
+    amount: np.ndarray
+
+    def outcome(self, row: int) -> Dict[str, Any]:
+        """Rebuilds the RuleEngine.execute_actions result for one order."""
+        results = {
+            "blocked": bool(self.blocked[row]),
+            "block_reason": self.block_reason[row],
+            "metadata": {},
+            "calculations": {}
+        }
+        if self.has_tax[row]:
+            results["calculations"]["tax"] = {
+                "rate": float(self.tax_rate[row]),
+                "amount": float(self.tax_amount[row]),
+                "total_with_tax": float(self.total_with_tax[row])
+            }
+        for rule_index, action in _ordered_actions(self.rules):
+            if not self.matched[row, rule_index]:
+                continue
+            if action.action_type == RuleActionType.ADD_METADATA:
+                results["metadata"].update(action.parameters.get("data", {}))
+            elif action.action_type == RuleActionType.SEND_NOTIFICATION:
+                results["metadata"]["notification_sent"] = True
+                results["metadata"]["notification_type"] = action.parameters.get("type", "email")
+        return results
+
+
+def _ordered_actions(rules: List[Rule]) -> List[tuple]:
+    # Same order RuleEngine.evaluate produces: rule order, then a stable sort by priority
+    actions = [(i, action) for i, rule in enumerate(rules) for action in rule.actions]
+    actions.sort(key=lambda item: item[1].priority)
+    return actions
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, numbers.Number)
+
+
+class BatchRuleEvaluator:
+    """
+    Evaluates the rule set over many orders at once with NumPy masks.
+
+    Each condition becomes a boolean array over the orders and each rule the AND
+    of its conditions; CALCULATE_TAX and blocking actions are then applied as
+    array operations in the same priority order as RuleEngine.execute_actions,
+    so per-order outcomes match the scalar engine exactly.
+    """
+
+    def __init__(self, rule_repository):
+        self.rule_repository = rule_repository
+
+    def evaluate(self, facts: OrderFacts, event: str = "order_transition", rules: Optional[List[Rule]] = None) -> BatchEvaluationResult:
+        rules = rules if rules is not None else self.rule_repository.get_rules_by_event(event)
+        n = len(facts)
+
+        matched = np.zeros((n, len(rules)), dtype=bool)
+        for i, rule in enumerate(rules):
+            matched[:, i] = self._conditions_mask(facts, rule.conditions)
+
+        blocked = np.zeros(n, dtype=bool)
+        block_reason = np.full(n, None, dtype=object)
+        has_tax = np.zeros(n, dtype=bool)
+        tax_rate = np.zeros(n, dtype=np.float64)
+
+        for rule_index, action in _ordered_actions(rules):
+            mask = matched[:, rule_index]
+            if not mask.any():
+                continue
+            self._apply_action(action, mask, blocked, block_reason, has_tax, tax_rate)
+
+        tax_amount = np.where(has_tax, facts.amount * tax_rate, 0.0)
+        total_with_tax = np.where(has_tax, facts.amount + tax_amount, facts.amount)
+
+        return BatchEvaluationResult(
+            rules=list(rules),
+            matched=matched,
+            blocked=blocked,
+            block_reason=block_reason,
+            has_tax=has_tax,
+            tax_rate=tax_rate,
+            tax_amount=tax_amount,
+            total_with_tax=total_with_tax,
+            amount=facts.amount
+        )
+
+    @staticmethod
+    def _apply_action(
+        action: RuleAction,
+        mask: np.ndarray,
+        blocked: np.ndarray,
+        block_reason: np.ndarray,
+        has_tax: np.ndarray,
+        tax_rate: np.ndarray
+    ) -> None:
+        if action.action_type == RuleActionType.REQUIRE_REVIEW:
+            blocked |= mask
+            block_reason[mask] = action.parameters.get("reason", "Review required")
+
+        elif action.action_type == RuleActionType.BLOCK_TRANSITION:
+            blocked |= mask
+            block_reason[mask] = action.parameters.get("reason", "Transition not allowed")
+
+        elif action.action_type == RuleActionType.CALCULATE_TAX:
+            has_tax |= mask
+            tax_rate[mask] = action.parameters.get("rate", 0.0)
+
+    def _conditions_mask(self, facts: OrderFacts, conditions: List[RuleCondition]) -> np.ndarray:
+        mask = np.ones(len(facts), dtype=bool)
+        for condition in conditions or []:
+            mask &= self._condition_mask(facts, condition)
+        return mask
+
+    def _condition_mask(self, facts: OrderFacts, condition: RuleCondition) -> np.ndarray:
+        n = len(facts)
+        try:
+            condition_type = RuleConditionType(condition.condition_type)
+        except ValueError:
+            return np.zeros(n, dtype=bool)
+
+        if condition_type == RuleConditionType.AND:
+            return self._conditions_mask(facts, condition.sub_conditions or [])
+
+        if condition_type == RuleConditionType.OR:
+            mask = np.zeros(n, dtype=bool)
+            for sub in condition.sub_conditions or []:
+                mask |= self._condition_mask(facts, sub)
+            return mask
+
+        if condition_type == RuleConditionType.VELOCITY:
+            # Read from the live counters, so only meaningful for orders evaluated as of now;
+            # the key column comes from extra (ids for order scope)
+            counters = get_velocity_counters()
+            scope, _ = parse_counter(condition.field)
+            key_field = SCOPE_KEYS[scope]
+            if scope == "order":
+                keys = facts.order_ids
+            elif key_field in facts.extra:
+                keys = facts.extra[key_field]
+            else:
+                raise ValueError(f"Velocity condition on {condition.field} needs a {key_field} column")
+            return np.fromiter(
+                (counters.count(condition.field, condition.window_seconds, key) > condition.value for key in keys),
+                dtype=bool,
+                count=n
+            )
+
+        column = facts.column(condition.field)
+        value = condition.value
+
+        if isinstance(column, Categorical):
+            return column.label_mask(self._scalar_predicate(condition_type, value))
+
+        if column.dtype == object:
+            predicate = self._scalar_predicate(condition_type, value)
+            return np.fromiter((bool(predicate(v)) for v in column), dtype=bool, count=n)
+
+        if condition_type == RuleConditionType.GREATER_THAN:
+            return column > value
+
+        if condition_type == RuleConditionType.LESS_THAN:
+            return column < value
+
+        if condition_type == RuleConditionType.EQUALS:
+            if not _is_number(value):
+                return np.zeros(n, dtype=bool)
+            return column == value
+
+        if condition_type == RuleConditionType.IN_LIST:
+            candidates = [v for v in value if _is_number(v)]
+            return np.isin(column, candidates) if candidates else np.zeros(n, dtype=bool)
+
+        if condition_type == RuleConditionType.CONTAINS:
+            # Same failure as the scalar engine: numbers do not support "in"
+            raise TypeError(f"argument of type '{column.dtype}' is not iterable")
+
+        return np.zeros(n, dtype=bool)
+
+    @staticmethod
+    def _scalar_predicate(condition_type: RuleConditionType, value: Any):
+        if condition_type == RuleConditionType.GREATER_THAN:
+            return lambda v: v > value
+        if condition_type == RuleConditionType.LESS_THAN:
+            return lambda v: v < value
+        if condition_type == RuleConditionType.EQUALS:
+            return lambda v: v == value
+        if condition_type == RuleConditionType.IN_LIST:
+            return lambda v: v in value
+        if condition_type == RuleConditionType.CONTAINS:
+            return lambda v: value in v
+        return lambda v: False
@@ -0,0 +1,109 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional, Set
+from app.config.database import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(value: Any) -> str:
+    # ISO 8601 like the REST responses, rather than str()'s "YYYY-MM-DD HH:MM:SS"
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+class Subscription:
+    """One subscriber's bounded queue of encoded Server-Sent Events frames."""
+
+    def __init__(self, broadcaster: "EventBroadcaster", queue_size: int):
+        self.broadcaster = broadcaster
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def _drop(self) -> None:
+        # Only called with a full queue: empty it so the end-of-stream marker fits
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def frames(self, heartbeat_seconds: float = 15.0) -> AsyncIterator[str]:
+        """
+        Yields the frames published from now on, until the subscriber is dropped.
+
+        A comment frame is sent when nothing was published for heartbeat_seconds,
+        so proxies keep the connection open and disconnects are noticed.
+        """
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(self.queue.get(), heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if frame is None:
+                    yield "event: dropped\ndata: {}\n\n"
+                    return
+                yield frame
+        finally:
+            self.broadcaster.unsubscribe(self)
+
+
+class EventBroadcaster:
+    """
+    In-process fan-out of order events to live feed subscribers.
+
+    publish encodes an event once and puts the same frame on every subscriber's
+    queue without waiting, so one event costs one encode and one enqueue per
+    subscriber, and no database access. A subscriber whose queue is full is
+    dropped rather than slowing down the publisher or the others; its stream
+    ends with a "dropped" event and the client is expected to reconnect and
+    reload. Events are only seen by subscribers of this process.
+    """
+
+    def __init__(self, queue_size: int = 1000):
+        self.queue_size = queue_size
+        self._subscribers: Set[Subscription] = set()
+        self._sequence = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self, self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> None:
+        if not self._subscribers:
+            return
+
+        frame = f"id: {next(self._sequence)}\nevent: {event_type}\ndata: {json.dumps(data, default=_encode)}\n\n"
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self.unsubscribe(subscription)
+                subscription._drop()
+                logger.info("Dropped a live feed subscriber that fell %s events behind", self.queue_size)
+
+
+_default_broadcaster: Optional[EventBroadcaster] = None
+_default_broadcaster_lock = threading.Lock()
+
+
+def get_event_broadcaster() -> EventBroadcaster:
+    """Returns the process-wide broadcaster behind GET /orders/events."""
+    global _default_broadcaster
+    if _default_broadcaster is None:
+        with _default_broadcaster_lock:
+            if _default_broadcaster is None:
+                _default_broadcaster = EventBroadcaster(queue_size=settings.EVENT_QUEUE_SIZE)
+    return _default_broadcaster
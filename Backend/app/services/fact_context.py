@@ -0,0 +1,148 @@
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional
+
+
+FactProvider = Callable[[Any], Any]
+
+_MISSING = object()
+
+
+class AsyncFactProvider(ABC):
+    """
+    Supplies facts that need a query, for many orders at once.
+
+    Subclasses list the fact names they supply in facts and implement load,
+    which must read everything it needs for all the orders in a single query.
+    """
+
+    facts: FrozenSet[str] = frozenset()
+
+    @abstractmethod
+    async def load(self, db: Any, orders: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        """Returns {order id: {fact name: value}} for the given orders."""
+
+
+class FactRegistry:
+    """
+    Named facts derived from an order, for fields the order does not carry itself.
+
+    Providers take the order and return the value; register one with
+    registry.register("name", provider) or as a decorator. Facts that need the
+    database come from AsyncFactProviders, which are prefetched for a whole
+    batch of orders before evaluation (see register_async).
+    """
+
+    def __init__(self):
+        self._providers: Dict[str, FactProvider] = {}
+        self._async_providers: List[AsyncFactProvider] = []
+
+    def register(self, name: str, provider: Optional[FactProvider] = None):
+        if provider is None:
+            def decorator(func: FactProvider) -> FactProvider:
+                self._providers[name] = func
+                return func
+            return decorator
+        self._providers[name] = provider
+        return provider
+
+    def unregister(self, name: str) -> None:
+        self._providers.pop(name, None)
+
+    def register_async(self, provider: AsyncFactProvider) -> AsyncFactProvider:
+        self._async_providers.append(provider)
+        return provider
+
+    def get(self, name: str) -> Optional[FactProvider]:
+        return self._providers.get(name)
+
+    def async_providers_for(self, fields: Iterable[str]) -> List[AsyncFactProvider]:
+        """The async providers that supply at least one of fields."""
+        wanted = set(fields)
+        return [provider for provider in self._async_providers if provider.facts & wanted]
+
+    async def prefetch(self, db: Any, orders: List[Any], fields: Iterable[str]) -> Dict[Any, Dict[str, Any]]:
+        """
+        Loads the async facts among fields for all orders, one load per provider.
+
+        Returns {order id: {fact name: value}}, ready to pass to FactContext.
+        """
+        facts: Dict[Any, Dict[str, Any]] = {}
+        if not orders:
+            return facts
+        for provider in self.async_providers_for(fields):
+            for order_id, values in (await provider.load(db, orders)).items():
+                facts.setdefault(order_id, {}).update(values)
+        return facts
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._providers
+
+
+default_fact_registry = FactRegistry()
+
+
+@default_fact_registry.register("total_products")
+def total_products(order: Any) -> Any:
+    return len(order.order_products) if hasattr(order, 'order_products') else 0
+
+
+@default_fact_registry.register("has_high_value_product")
+def has_high_value_product(order: Any) -> bool:
+    if hasattr(order, 'order_products'):
+        for op in order.order_products:
+            if hasattr(op, 'unit_price') and op.unit_price > 500:
+                return True
+    return False
+
+
+class FactContext:
+    """
+    The facts about one order for one evaluation.
+
+    Prefetched facts come first. Other fields resolve, in order, to the
+    transition action, the order state, a plain attribute, a dotted path, then a
+    registered provider. Each field is resolved at most once per context,
+    however many conditions read it.
+    """
+
+    __slots__ = ("order", "action", "registry", "_cache")
+
+    def __init__(
+        self,
+        order: Any,
+        action: Optional[str] = None,
+        registry: Optional[FactRegistry] = None,
+        prefetched: Optional[Dict[str, Any]] = None
+    ):
+        self.order = order
+        self.action = action
+        self.registry = registry or default_fact_registry
+        self._cache: Dict[str, Any] = dict(prefetched) if prefetched else {}
+
+    def get(self, field: str) -> Any:
+        value = self._cache.get(field, _MISSING)
+        if value is _MISSING:
+            value = self._cache[field] = self._resolve(field)
+        return value
+
+    def _resolve(self, field: str) -> Any:
+        if field == "action":
+            return self.action
+
+        if field == "current_state":
+            return self.order.current_state
+
+        value = getattr(self.order, field, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        if "." in field:
+            value = self.order
+            for part in field.split("."):
+                value = getattr(value, part, _MISSING)
+                if value is _MISSING:
+                    return None
+            return value
+
+        provider = self.registry.get(field)
+        return provider(self.order) if provider is not None else None
@@ -0,0 +1,41 @@
+from typing import Any, Dict, List
+from app.repositories.order_repository import OrderRepository
+from app.services.fact_context import AsyncFactProvider, default_fact_registry
+
+
+class CustomerHistoryProvider(AsyncFactProvider):
+    """The customer's order count and cancelled order count, across all their orders."""
+
+    facts = frozenset(["customer_order_count", "customer_cancelled_orders"])
+
+    async def load(self, db: Any, orders: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        counts = await OrderRepository(db).get_customer_order_counts(order.customer_id for order in orders)
+        facts = {}
+        for order in orders:
+            total, cancelled = counts.get(order.customer_id, (0, 0))
+            facts[order.id] = {"customer_order_count": total, "customer_cancelled_orders": cancelled}
+        return facts
+
+
+class ProductAttributesProvider(AsyncFactProvider):
+    """
+    The products on the order, as tuples so rules can test them with CONTAINS
+    (e.g. product_names contains "Laptop").
+    """
+
+    facts = frozenset(["product_ids", "product_names"])
+
+    async def load(self, db: Any, orders: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        lines = await OrderRepository(db).get_line_products(order.id for order in orders)
+        facts = {}
+        for order in orders:
+            products = lines.get(order.id, [])
+            facts[order.id] = {
+                "product_ids": tuple(str(product_id) for product_id, _ in products),
+                "product_names": tuple(name for _, name in products)
+            }
+        return facts
+
+
+default_fact_registry.register_async(CustomerHistoryProvider())
+default_fact_registry.register_async(ProductAttributesProvider())
@@ -0,0 +1,57 @@
+from app.config.database import settings
+from app.models.enums import OrderState
+from app.repositories.order_repository import OrderRepository
+from app.repositories.order_claim_repository import OrderClaimRepository
+from app.schemas.claim import OrderClaimResponse, ClaimHeartbeatResponse
+from typing import List, Optional
+from uuid import UUID
+
+
+class OrderClaimService:
+    """
+    Leases orders to workers so that each order in a state is processed by one of them.
+
+    A worker claims a batch, keeps the lease alive with heartbeats while it works
+    and releases it when done; orders it stops heartbeating for become claimable
+    again once the lease expires. Claims are advisory: transitions do not check
+    them, and an order that leaves the state is simply not offered again.
+    """
+
+    def __init__(self, order_repo: OrderRepository, claim_repo: OrderClaimRepository):
+        self.order_repo = order_repo
+        self.claim_repo = claim_repo
+
+    async def claim(
+        self,
+        state: str,
+        limit: int,
+        worker_id: Optional[str] = None,
+        lease_seconds: Optional[int] = None
+    ) -> OrderClaimResponse:
+        try:
+            OrderState(state)
+        except ValueError:
+            raise ValueError(f"Invalid state '{state}'")
+
+        lease_seconds = lease_seconds or settings.CLAIM_LEASE_SECONDS
+        lease_id, expires_at, order_ids = await self.claim_repo.claim(state, limit, lease_seconds, worker_id)
+
+        orders = await self.order_repo.get_by_ids(order_ids)
+        return OrderClaimResponse(
+            lease_id=lease_id,
+            worker_id=worker_id,
+            expires_at=expires_at,
+            orders=[orders[order_id] for order_id in order_ids if order_id in orders]
+        )
+
+    async def heartbeat(self, lease_id: UUID, lease_seconds: Optional[int] = None) -> ClaimHeartbeatResponse:
+        expires_at, order_ids = await self.claim_repo.heartbeat(
+            lease_id, lease_seconds or settings.CLAIM_LEASE_SECONDS
+        )
+        if not order_ids:
+            raise ValueError("Lease not found or expired")
+        return ClaimHeartbeatResponse(lease_id=lease_id, expires_at=expires_at, order_ids=order_ids)
+
+    async def release(self, lease_id: UUID, order_ids: Optional[List[UUID]] = None) -> None:
+        if not await self.claim_repo.release(lease_id, order_ids):
+            raise ValueError("Lease not found")
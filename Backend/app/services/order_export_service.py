@@ -0,0 +1,100 @@
+import csv
+import io
+import json
+from app.repositories.order_repository import OrderRepository
+from typing import Any, AsyncIterator, Dict, List
+
+
+class OrderExportService:
+
+    CSV_COLUMNS = [
+        "order_id",
+        "creation_date",
+        "current_state",
+        "amount",
+        "notes",
+        "customer_id",
+        "customer_name",
+        "customer_email",
+        "product_id",
+        "product_name",
+        "quantity",
+        "unit_price",
+    ]
+
+    def __init__(self, order_repo: OrderRepository, chunk_size: int = 500):
+        self.order_repo = order_repo
+        self.chunk_size = chunk_size
+
+    async def stream_ndjson(self, **filters) -> AsyncIterator[bytes]:
+        """Yields one JSON document per order, one encoded chunk of lines at a time."""
+        async for orders in self.order_repo.stream_chunks(self.chunk_size, **filters):
+            lines = [json.dumps(self._order_to_dict(order), default=str) for order in orders]
+            yield ("\n".join(lines) + "\n").encode()
+
+    async def stream_csv(self, **filters) -> AsyncIterator[bytes]:
+        """Yields one CSV row per line item, with the order and customer columns repeated."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.CSV_COLUMNS)
+        yield self._drain(buffer)
+
+        async for orders in self.order_repo.stream_chunks(self.chunk_size, **filters):
+            for order in orders:
+                writer.writerows(self._order_to_rows(order))
+            yield self._drain(buffer)
+
+    @staticmethod
+    def _drain(buffer: io.StringIO) -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    @staticmethod
+    def _order_to_dict(order) -> Dict[str, Any]:
+        return {
+            "id": order.id,
+            "amount": order.amount,
+            "current_state": order.current_state,
+            "creation_date": order.creation_date.isoformat(),
+            "notes": order.notes,
+            "customer": {
+                "id": order.customer.id,
+                "name": order.customer.name,
+                "email": order.customer.email,
+            },
+            "products": [
+                {
+                    "product_id": op.product_id,
+                    "name": op.product.name if op.product else None,
+                    "quantity": op.quantity,
+                    "unit_price": op.unit_price,
+                }
+                for op in order.order_products
+            ],
+        }
+
+    @staticmethod
+    def _order_to_rows(order) -> List[List[Any]]:
+        head = [
+            order.id,
+            order.creation_date.isoformat(),
+            order.current_state,
+            order.amount,
+            order.notes or "",
+            order.customer.id,
+            order.customer.name,
+            order.customer.email,
+        ]
+        if not order.order_products:
+            return [head + ["", "", "", ""]]
+        return [
+            head + [
+                op.product_id,
+                op.product.name if op.product else "",
+                op.quantity,
+                op.unit_price,
+            ]
+            for op in order.order_products
+        ]
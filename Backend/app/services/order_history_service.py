@@ -0,0 +1,66 @@
+import json
+from datetime import datetime, timezone
+from app.config.database import settings
+from app.repositories.order_state_snapshot_repository import OrderStateSnapshotRepository
+from app.schemas.order import OrderStateAsOf, OrderSnapshotResult
+from typing import AsyncIterator, Iterable, List, Optional
+from uuid import UUID
+
+
+def as_utc(at: datetime) -> datetime:
+    """Timestamps are stored as naive UTC; aware inputs are converted, naive ones taken as UTC."""
+    if at.tzinfo is not None:
+        return at.astimezone(timezone.utc).replace(tzinfo=None)
+    return at
+
+
+class SnapshotConflictError(Exception):
+    """A snapshot already exists at the requested time."""
+    pass
+
+
+class OrderHistoryService:
+    """Order states at past points in time, replayed from the latest snapshot before them."""
+
+    def __init__(self, snapshot_repo: OrderStateSnapshotRepository):
+        self.snapshot_repo = snapshot_repo
+
+    async def get_state_at(self, order_id: UUID, at: datetime) -> OrderStateAsOf:
+        states = await self.snapshot_repo.get_states_as_of(as_utc(at), [order_id])
+        if order_id not in states:
+            raise ValueError("Order did not exist at that time")
+        return OrderStateAsOf(order_id=order_id, state=states[order_id])
+
+    async def get_states_at(self, order_ids: Iterable[UUID], at: datetime) -> List[OrderStateAsOf]:
+        """One result per requested order, with state None for orders that did not exist yet."""
+        order_ids = list(order_ids)
+        states = await self.snapshot_repo.get_states_as_of(as_utc(at), order_ids)
+        return [OrderStateAsOf(order_id=order_id, state=states.get(order_id)) for order_id in order_ids]
+
+    async def stream_ndjson(self, at: datetime, state: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Yields {"order_id", "state"} for every order that existed at at, one encoded chunk at a time."""
+        async for rows in self.snapshot_repo.stream_states_as_of(as_utc(at)):
+            lines = [
+                json.dumps({"order_id": str(order_id), "state": order_state})
+                for order_id, order_state in rows
+                if state is None or order_state == state
+            ]
+            if lines:
+                yield ("\n".join(lines) + "\n").encode()
+
+    async def take_snapshot(self, at: Optional[datetime] = None) -> OrderSnapshotResult:
+        """
+        Stores every order's state at at, by default the latest settled time.
+
+        Times after the start of the oldest open transaction are rejected: a
+        log it commits later, dated before the snapshot, would be skipped by
+        every replay starting from it and by every snapshot built on it.
+        """
+        settled_at = await self.snapshot_repo.settled_at()
+        at = as_utc(at) if at is not None else settled_at
+        if at > settled_at:
+            raise ValueError(f"Transactions started at {settled_at.isoformat()} are still open; pick an earlier time")
+        if await self.snapshot_repo.latest_snapshot_at(at) == at:
+            raise SnapshotConflictError(f"A snapshot at {at.isoformat()} already exists")
+        orders = await self.snapshot_repo.create_snapshot(at, keep=settings.ORDER_SNAPSHOT_KEEP)
+        return OrderSnapshotResult(snapshot_at=at, orders=orders)
@@ -1,12 +1,22 @@
 from app.repositories.order_repository import OrderRepository
 from app.repositories.customer_repository import CustomerRepository
 from app.repositories.product_repository import ProductRepository
-from app.schemas.order import OrderCreate, OrderResponse
+from app.schemas.customer import CustomerResponse
+from app.schemas.order import OrderCreate, OrderResponse, OrderBulkResult
 from app.schemas.product import ProductInOrder
-from typing import List
+from sqlalchemy.exc import SQLAlchemyError
+from typing import List, Optional
 from uuid import UUID
 
 
+class DuplicateProductError(ValueError):
+    """An order lists the same product on more than one line."""
+
+    def __init__(self, product_id: UUID):
+        super().__init__(f"Product {product_id} is listed more than once")
+        self.product_id = product_id
+
+
 class OrderService:
     def __init__(
         self,
@@ -23,9 +33,15 @@ class OrderService:
         if not customer:
             raise ValueError("Customer not found")
 
+        duplicate = self._duplicate_product(order_data)
+        if duplicate:
+            raise DuplicateProductError(duplicate)
+
+        catalog = await self.product_repo.get_by_ids(p.product_id for p in order_data.products)
+
         products_with_prices = []
         for product_data in order_data.products:
-            product = await self.product_repo.get_by_id(product_data.product_id)
+            product = catalog.get(product_data.product_id)
             if not product:
                 raise ValueError(f"Product {product_data.product_id} not found")
 
@@ -44,7 +60,100 @@ class OrderService:
 
         order = await self.order_repo.create(order_dict, products_with_prices)
 
-        return await self._build_order_response(order)
+        return OrderResponse(
+            id=order.id,
+            amount=order.amount,
+            current_state=order.current_state,
+            creation_date=order.creation_date,
+            customer=CustomerResponse.model_validate(customer),
+            products=[
+                ProductInOrder(
+                    product_id=line["product_id"],
+                    name=catalog[line["product_id"]].name,
+                    quantity=line["quantity"],
+                    unit_price=line["unit_price"]
+                )
+                for line in products_with_prices
+            ],
+            notes=order.notes
+        )
+
+    async def create_orders_bulk(self, orders_data: List[OrderCreate]) -> List[OrderBulkResult]:
+        """
+        Creates many orders at once, reporting success or failure per item.
+
+        Customers and products for the whole batch are validated with one query
+        each; the valid orders are then written in transactions of
+        OrderRepository.INSERT_CHUNK_SIZE orders. If one of those writes fails,
+        only the orders in it are reported as failed.
+        """
+        customers = await self.customer_repo.get_by_ids(o.customer_id for o in orders_data)
+        catalog = await self.product_repo.get_by_ids(
+            p.product_id for o in orders_data for p in o.products
+        )
+
+        results: List[OrderBulkResult] = []
+        to_create = []
+        created_indexes = []
+
+        for index, order_data in enumerate(orders_data):
+            if order_data.customer_id not in customers:
+                results.append(OrderBulkResult(index=index, success=False, error="Customer not found"))
+                continue
+
+            duplicate = self._duplicate_product(order_data)
+            if duplicate:
+                results.append(OrderBulkResult(index=index, success=False, error=str(DuplicateProductError(duplicate))))
+                continue
+
+            missing = next((p.product_id for p in order_data.products if p.product_id not in catalog), None)
+            if missing:
+                results.append(OrderBulkResult(index=index, success=False, error=f"Product {missing} not found"))
+                continue
+
+            to_create.append((
+                {
+                    "amount": order_data.amount,
+                    "current_state": order_data.current_state,
+                    "customer_id": order_data.customer_id,
+                    "notes": order_data.notes
+                },
+                [
+                    {
+                        "product_id": p.product_id,
+                        "quantity": p.quantity,
+                        "unit_price": catalog[p.product_id].unit_price
+                    }
+                    for p in order_data.products
+                ]
+            ))
+            created_indexes.append(index)
+            results.append(None)
+
+        chunk_size = OrderRepository.INSERT_CHUNK_SIZE
+        for start in range(0, len(to_create), chunk_size):
+            indexes = created_indexes[start:start + chunk_size]
+            try:
+                orders = await self.order_repo.create_many(to_create[start:start + chunk_size])
+            except SQLAlchemyError as e:
+                error = f"Batch write failed: {e.__class__.__name__}"
+                for index in indexes:
+                    results[index] = OrderBulkResult(index=index, success=False, error=error)
+                continue
+            for index, order in zip(indexes, orders):
+                results[index] = OrderBulkResult(index=index, success=True, order_id=order.id)
+
+        return results
+
+    @staticmethod
+    def _duplicate_product(order_data: OrderCreate) -> Optional[UUID]:
+        # Lines are keyed by (order_id, product_id): a product appears once, with its total quantity
+        seen = set()
+        for product in order_data.products:
+            if product.product_id in seen:
+                return product.product_id
+            seen.add(product.product_id)
+        return None
 
     async def get_order(self, order_id: UUID) -> OrderResponse:
         order = await self.order_repo.get_by_id(order_id)
@@ -63,8 +172,6 @@ class OrderService:
         return True
 
     async def _build_order_response(self, order) -> OrderResponse:
-        from app.schemas.customer import CustomerResponse
-
         products = [
             ProductInOrder(
                 product_id=op.product.id,
@@ -0,0 +1,179 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from app.repositories.transition_log_repository import TransitionLogRepository
+from app.services.batch_rule_evaluator import BatchRuleEvaluator, OrderFacts, prefetch_fact_columns, rule_fields
+from app.services.fact_context import FactRegistry, default_fact_registry
+from app.services.rule_compiler import has_velocity
+from app.services.rule_engine import Rule, RuleActionType, TERMINAL_ACTIONS
+
+
+def _empty_totals(rules: List[Rule]) -> Dict[str, Any]:
+    return {
+        "rows": 0,
+        "blocked": 0,
+        "taxed": 0,
+        "total_tax": 0.0,
+        "rules": {rule.id: {"matched": 0, "blocked": 0, "taxed": 0} for rule in rules}
+    }
+
+
+def evaluate_partition(rules: List[Rule], columns: tuple, extra: Optional[Dict[str, List[Any]]] = None) -> Dict[str, Any]:
+    """
+    Evaluates one partition of replayed transitions and returns its aggregate counts.
+
+    Runs in a worker process, so it only takes and returns picklable values.
+    """
+    previous_state, action, amount, total_products, has_high_value_product, order_ids, customer_ids = columns
+    facts = OrderFacts.from_columns(
+        order_ids=order_ids,
+        amount=amount,
+        current_state=previous_state,
+        total_products=total_products,
+        has_high_value_product=has_high_value_product,
+        action=action,
+        extra={"customer_id": customer_ids, **(extra or {})}
+    )
+    result = BatchRuleEvaluator(None).evaluate(facts, rules=rules)
+
+    totals = _empty_totals(rules)
+    totals["rows"] = len(facts)
+    totals["blocked"] = int(result.blocked.sum())
+    totals["taxed"] = int(result.has_tax.sum())
+    totals["total_tax"] = float(result.tax_amount.sum())
+
+    matched = result.matched.sum(axis=0)
+    for i, rule in enumerate(rules):
+        action_types = {action.action_type for action in rule.actions}
+        counts = totals["rules"][rule.id]
+        counts["matched"] = int(matched[i])
+        if action_types.intersection(TERMINAL_ACTIONS):
+            counts["blocked"] = counts["matched"]
+        if RuleActionType.CALCULATE_TAX in action_types:
+            counts["taxed"] = counts["matched"]
+    return totals
+
+
+def _merge(totals: Dict[str, Any], partial: Dict[str, Any]) -> None:
+    for key in ("rows", "blocked", "taxed", "total_tax"):
+        totals[key] += partial[key]
+    for rule_id, counts in partial["rules"].items():
+        for key, value in counts.items():
+            totals["rules"][rule_id][key] += value
+
+
+class RuleBacktestService:
+    """
+    Replays logged transitions through a candidate rule set.
+
+    Each transition is evaluated with the order's facts and the state it was in
+    when the action was requested. The history is streamed from the database in
+    partitions that worker processes evaluate with the batch evaluator; at most
+    max_in_flight partitions are held in memory at a time. Async facts the rules
+    read are loaded per partition before it is dispatched, with their current
+    values: the database holds no history of them.
+    """
+
+    def __init__(
+        self,
+        log_repo: TransitionLogRepository,
+        rule_repository,
+        partition_size: int = 50000,
+        max_workers: Optional[int] = None,
+        executor_factory: Callable[[int], Executor] = ProcessPoolExecutor,
+        fact_registry: Optional[FactRegistry] = None
+    ):
+        self.log_repo = log_repo
+        self.rule_repository = rule_repository
+        self.fact_registry = fact_registry or default_fact_registry
+        self.partition_size = partition_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_in_flight = self.max_workers * 2
+        self.executor_factory = executor_factory
+
+    def select_rules(self, rule_ids: Optional[List[str]] = None, event: str = "order_transition") -> List[Rule]:
+        """
+        Returns the candidate rules in repository order.
+
+        Without ids, the enabled rules for the event. With ids, exactly those rules,
+        enabled or not, so a rule can be backtested before it is switched on.
+
+        Rules with VELOCITY conditions are rejected: their counters only hold
+        recent events of this process, not the rates at the time of each
+        logged transition, so a replay would report made-up results.
+        """
+        rules = [rule for rule in self.rule_repository.get_all_rules() if rule.event == event]
+        if rule_ids is None:
+            rules = [rule for rule in rules if rule.enabled]
+        else:
+            wanted = set(rule_ids)
+            missing = wanted - {rule.id for rule in rules}
+            if missing:
+                raise ValueError(f"Rules not found for event {event}: {', '.join(sorted(missing))}")
+            rules = [rule for rule in rules if rule.id in wanted]
+
+        velocity = [rule.id for rule in rules if has_velocity(rule.conditions)]
+        if velocity:
+            raise ValueError(f"Rules with velocity conditions cannot be backtested: {', '.join(velocity)}")
+        return rules
+
+    async def run(
+        self,
+        rules: List[Rule],
+        transition_from: Optional[datetime] = None,
+        transition_to: Optional[datetime] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yields a progress event per finished partition, then the aggregate result."""
+        loop = asyncio.get_running_loop()
+        fields = rule_fields(rules)
+        totals = _empty_totals(rules)
+        partitions = 0
+        pending = set()
+
+        def collect(done):
+            nonlocal partitions
+            for future in done:
+                _merge(totals, future.result())
+                partitions += 1
+            return {"type": "progress", "partitions": partitions, "rows": totals["rows"]}
+
+        executor = self.executor_factory(self.max_workers)
+        try:
+            async for rows in self.log_repo.stream_rule_replay_rows(
+                self.partition_size, transition_from, transition_to
+            ):
+                columns = tuple(list(column) for column in zip(*rows))
+                extra = await prefetch_fact_columns(
+                    self.log_repo.db,
+                    [
+                        {"id": row[5], "customer_id": row[6], "amount": row[2], "current_state": row[0]}
+                        for row in rows
+                    ],
+                    fields,
+                    self.fact_registry
+                )
+                pending.add(loop.run_in_executor(executor, evaluate_partition, rules, columns, extra))
+                if len(pending) >= self.max_in_flight:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    yield collect(done)
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                yield collect(done)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        yield {
+            "type": "result",
+            "partitions": partitions,
+            "rows": totals["rows"],
+            "blocked": totals["blocked"],
+            "taxed": totals["taxed"],
+            "total_tax": totals["total_tax"],
+            "rules": [
+                {"rule_id": rule.id, "name": rule.name, "enabled": rule.enabled, **totals["rules"][rule.id]}
+                for rule in rules
+            ]
+        }
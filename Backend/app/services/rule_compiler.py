@@ -0,0 +1,133 @@
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+from dataclasses import dataclass, field
+from app.services.fact_context import FactContext
+from app.services.rule_engine import Rule, RuleActionType, RuleCondition, RuleConditionType, TERMINAL_ACTIONS
+from app.services.velocity_counters import SCOPE_KEYS, get_velocity_counters, parse_counter
+
+
+ConditionMatcher = Callable[[FactContext], bool]
+
+
+@dataclass
+class CompiledRule:
+    rule: Rule
+    matches: ConditionMatcher
+    # Matcher of every leaf condition by id(), for the profiler's walk of the tree
+    leaves: Dict[int, ConditionMatcher] = field(default_factory=dict)
+    fields: FrozenSet[str] = frozenset()
+    calculates_tax: bool = False
+    terminal: bool = False
+    volatile: bool = False
+
+    def leaf(self, condition: RuleCondition) -> ConditionMatcher:
+        return self.leaves[id(condition)]
+
+
+def condition_fields(conditions: List[RuleCondition]) -> FrozenSet[str]:
+    """The fields a condition list can read, including those in nested AND/OR groups."""
+    fields = set()
+    for condition in conditions or []:
+        if condition.condition_type in (RuleConditionType.AND, RuleConditionType.OR):
+            fields |= condition_fields(condition.sub_conditions or [])
+        elif condition.condition_type == RuleConditionType.VELOCITY:
+            fields.add(SCOPE_KEYS[parse_counter(condition.field)[0]])
+        else:
+            fields.add(condition.field)
+    return frozenset(fields)
+
+
+def has_velocity(conditions: List[RuleCondition]) -> bool:
+    return any(
+        condition.condition_type == RuleConditionType.VELOCITY
+        or has_velocity(condition.sub_conditions or [])
+        for condition in conditions or []
+    )
+
+
+def compile_condition(condition: RuleCondition, leaves: Optional[Dict[int, ConditionMatcher]] = None) -> ConditionMatcher:
+    """
+    Turns a condition tree into a closure over a FactContext.
+
+    The condition type and operands are resolved once here; field values come
+    from the context, which computes each one at most once per evaluation.
+    The matchers of the leaf conditions are also stored in leaves, if given.
+    """
+    if condition.condition_type in (RuleConditionType.AND, RuleConditionType.OR):
+        subs = tuple(compile_condition(sub, leaves) for sub in condition.sub_conditions or [])
+        if condition.condition_type == RuleConditionType.AND:
+            return lambda ctx: all(sub(ctx) for sub in subs)
+        return lambda ctx: any(sub(ctx) for sub in subs)
+
+    matcher = _compile_leaf(condition)
+    if leaves is not None:
+        leaves[id(condition)] = matcher
+    return matcher
+
+
+def _compile_leaf(condition: RuleCondition) -> ConditionMatcher:
+    try:
+        condition_type = RuleConditionType(condition.condition_type)
+    except ValueError:
+        return lambda ctx: False
+
+    field = condition.field
+    value = condition.value
+
+    if condition_type == RuleConditionType.VELOCITY:
+        # Registers the counter now, so events are counted before the rule first runs
+        counters = get_velocity_counters()
+        window = condition.window_seconds
+        counters.track(field, window)
+        key = SCOPE_KEYS[parse_counter(field)[0]]
+        return lambda ctx: counters.count(field, window, ctx.get(key)) > value
+
+    if condition_type == RuleConditionType.GREATER_THAN:
+        return lambda ctx: ctx.get(field) > value
+
+    if condition_type == RuleConditionType.LESS_THAN:
+        return lambda ctx: ctx.get(field) < value
+
+    if condition_type == RuleConditionType.EQUALS:
+        return lambda ctx: ctx.get(field) == value
+
+    if condition_type == RuleConditionType.IN_LIST:
+        return lambda ctx: ctx.get(field) in value
+
+    if condition_type == RuleConditionType.CONTAINS:
+        return lambda ctx: value in ctx.get(field)
+
+    return lambda ctx: False
+
+
+def compile_conditions(conditions: List[RuleCondition]) -> ConditionMatcher:
+    """Compiles the implicit AND of a rule's top-level conditions into one closure."""
+    return _all_of(tuple(compile_condition(condition) for condition in conditions or []))
+
+
+def _all_of(compiled: Tuple[ConditionMatcher, ...]) -> ConditionMatcher:
+    if not compiled:
+        return lambda ctx: True
+
+    if len(compiled) == 1:
+        return compiled[0]
+
+    def matches(ctx):
+        for condition in compiled:
+            if not condition(ctx):
+                return False
+        return True
+    return matches
+
+
+def compile_rule(rule: Rule) -> CompiledRule:
+    leaves: Dict[int, ConditionMatcher] = {}
+    conditions = tuple(compile_condition(condition, leaves) for condition in rule.conditions or [])
+    return CompiledRule(
+        rule=rule,
+        matches=_all_of(conditions),
+        leaves=leaves,
+        fields=condition_fields(rule.conditions),
+        calculates_tax=any(action.action_type == RuleActionType.CALCULATE_TAX for action in rule.actions),
+        terminal=any(action.action_type in TERMINAL_ACTIONS for action in rule.actions),
+        volatile=has_velocity(rule.conditions)
+    )
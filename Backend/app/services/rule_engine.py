@@ -1,6 +1,8 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, FrozenSet, List, Optional
 from dataclasses import dataclass
 from enum import Enum
+from app.services.fact_context import FactContext, FactRegistry, default_fact_registry
+from app.services.velocity_counters import get_velocity_counters
 
 
 class RuleConditionType(str, Enum):
@@ -11,6 +13,7 @@ class RuleConditionType(str, Enum):
     CONTAINS = "contains"
     AND = "and"
     OR = "or"
+    VELOCITY = "velocity"
 
 
 class RuleActionType(str, Enum):
@@ -21,6 +24,10 @@ class RuleActionType(str, Enum):
     SEND_NOTIFICATION = "send_notification"
 
 
+# Actions that decide the outcome on their own: once one fires the transition is rejected
+TERMINAL_ACTIONS = frozenset([RuleActionType.BLOCK_TRANSITION, RuleActionType.REQUIRE_REVIEW])
+
+
 @dataclass
 class RuleCondition:
     condition_type: RuleConditionType
@@ -28,6 +35,9 @@ class RuleCondition:
     value: Any
     operator: Optional[str] = None
     sub_conditions: Optional[List['RuleCondition']] = None
+    # VELOCITY only: field is a counter such as "customer.cancel" and the
+    # condition holds when it counted more than value events in this window
+    window_seconds: Optional[int] = None
 
 
 @dataclass
@@ -51,19 +61,179 @@ class Rule:
 
 class RuleEngine:
 
-    def __init__(self, rule_repository):
+    def __init__(
+        self,
+        rule_repository,
+        fact_registry: Optional[FactRegistry] = None,
+        outcome_cache=None,
+        short_circuit: bool = False,
+        profiler=None
+    ):
         self.rule_repository = rule_repository
+        self.fact_registry = fact_registry or default_fact_registry
+        self.outcome_cache = outcome_cache
+        self.short_circuit = short_circuit
+        self.profiler = profiler
+
+    def _active_profiler(self):
+        profiler = self.profiler
+        return profiler if profiler is not None and profiler.enabled else None
+
+    @staticmethod
+    def _profiled_match(profiler, compiled: Any, context: FactContext) -> bool:
+        return profiler.run(compiled.rule, lambda condition: compiled.leaf(condition)(context))
+
+    def required_fields(self, event: str) -> FrozenSet[str]:
+        """The fields the active rules for the event read, e.g. to decide what to prefetch."""
+        return self.rule_repository.snapshot().fields_for(event)
+
+    async def prefetch_facts(self, db: Any, orders: List[Any], event: str) -> Dict[Any, Dict[str, Any]]:
+        """Loads the async facts the active rules need for all orders, one query per provider."""
+        return await self.fact_registry.prefetch(db, orders, self.required_fields(event))
+
+    def evaluate(
+        self,
+        order: Any,
+        event: str,
+        action: Optional[str] = None,
+        facts: Optional[Dict[str, Any]] = None
+    ) -> List[RuleAction]:
+        """
+        Returns the actions of every matching rule, sorted by action priority.
+
+        In short-circuit mode rules are evaluated in tiers of equal Rule.priority,
+        lowest first, and evaluation stops after the first tier in which a
+        terminal action (BLOCK_TRANSITION, REQUIRE_REVIEW) fired. The transition
+        is then blocked exactly as in a full evaluation; block_reason, metadata and
+        tax come only from the tiers evaluated, whose actions are all kept. When
+        nothing blocks, every tier runs and the result equals a full evaluation.
+
+        facts holds values prefetched for this order (see prefetch_facts).
+        """
+        context = FactContext(order, action, self.fact_registry, facts)
+        current_state = getattr(order, "current_state", None)
+
+        if self.short_circuit:
+            tiers = self.rule_repository.get_candidate_tiers(event, action, current_state)
+            return self._short_circuit_actions(tiers, context)
+
+        applicable_rules = self.rule_repository.get_candidate_rules(event, action, current_state)
+        return self._matching_actions(applicable_rules, context)
+
+    def _short_circuit_actions(self, tiers: List[List[Any]], context: FactContext) -> List[RuleAction]:
+        profiler = self._active_profiler()
+        matched = []
+
+        for tier in tiers:
+            decided = False
+            for position, compiled in tier:
+                if not compiled.rule.enabled:
+                    continue
+                if compiled.matches(context) if profiler is None else self._profiled_match(profiler, compiled, context):
+                    matched.append((position, compiled))
+                    decided = decided or compiled.terminal
+            if decided:
+                break
+
+        # Back to rule order, so ties in action priority resolve as in a full evaluation
+        matched.sort(key=lambda item: item[0])
+        actions_to_execute = [action for _, compiled in matched for action in compiled.rule.actions]
+        actions_to_execute.sort(key=lambda x: x.priority)
+        return actions_to_execute
+
+    def _matching_actions(self, applicable_rules: List[Any], context: FactContext) -> List[RuleAction]:
+        profiler = self._active_profiler()
+        actions_to_execute = []
+
+        for compiled in applicable_rules:
+            if not compiled.rule.enabled:
+                continue
 
-    def evaluate(self, order: Any, event: str, action: Optional[str] = None) -> List[RuleAction]:
+            if compiled.matches(context) if profiler is None else self._profiled_match(profiler, compiled, context):
+                actions_to_execute.extend(compiled.rule.actions)
 
+        actions_to_execute.sort(key=lambda x: x.priority)
+        return actions_to_execute
+
+    def evaluate_outcome(
+        self,
+        order: Any,
+        event: str,
+        action: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+        facts: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        evaluate followed by execute_actions, memoized when an outcome cache is set.
+
+        The cache key holds only what the outcome depends on: the rule snapshot,
+        the event, action and state, and the values of the fields read by the
+        candidate rules (plus amount when one of them calculates tax). Candidates
+        with VELOCITY conditions are always evaluated. Cache hits are counted by
+        the profiler as cache_hits of the candidate rules.
+        """
+        snapshot = self.rule_repository.snapshot()
+        current_state = getattr(order, "current_state", None)
+        candidates = snapshot.index.candidates(event, action, current_state)
+
+        if self.outcome_cache is None or any(compiled.volatile for compiled in candidates):
+            # Velocity counts change over time, so those outcomes cannot be reused
+            return self.execute_actions(self.evaluate(order, event, action, facts), order, context or {})
+        fact_context = FactContext(order, action, self.fact_registry, facts)
+
+        def compute() -> Dict[str, Any]:
+            if self.short_circuit:
+                tiers = snapshot.index.tiers(event, action, current_state)
+                actions = self._short_circuit_actions(tiers, fact_context)
+            else:
+                actions = self._matching_actions(candidates, fact_context)
+            return self.execute_actions(actions, order, context or {})
+
+        fields = set().union(*(compiled.fields for compiled in candidates))
+        if any(compiled.calculates_tax for compiled in candidates):
+            fields.add("amount")
+        fields.difference_update(("action", "current_state"))
+
+        try:
+            fingerprint = tuple((field, fact_context.get(field)) for field in sorted(fields))
+            key = (self.fact_registry, self.short_circuit, event, action, current_state, fingerprint)
+            hash(key)
+        except Exception:
+            # Unhashable or unreadable fact: evaluate without the cache
+            return compute()
+
+        computed = []
+
+        def compute_once() -> Dict[str, Any]:
+            computed.append(True)
+            return compute()
+
+        outcome = self.outcome_cache.get_or_compute(snapshot, key, compute_once)
+        profiler = self._active_profiler()
+        if profiler is not None and not computed:
+            profiler.record_cache_hit(compiled.rule for compiled in candidates if compiled.rule.enabled)
+        return outcome
+
+    def evaluate_interpreted(self, order: Any, event: str, action: Optional[str] = None) -> List[RuleAction]:
+        """Reference implementation of evaluate that walks the condition trees directly."""
         applicable_rules = self.rule_repository.get_rules_by_event(event)
+        context = FactContext(order, action, self.fact_registry)
+        profiler = self._active_profiler()
         actions_to_execute = []
 
         for rule in applicable_rules:
             if not rule.enabled:
                 continue
 
-            if self._evaluate_conditions(order, rule.conditions, action):
+            if profiler is not None:
+                matched = profiler.run(
+                    rule,
+                    lambda condition: self._evaluate_single_condition(order, condition, action, context)
+                )
+            else:
+                matched = self._evaluate_conditions(order, rule.conditions, action, context)
+
+            if matched:
                 actions_to_execute.extend(rule.actions)
 
         actions_to_execute.sort(key=lambda x: x.priority)
@@ -73,13 +243,15 @@ class RuleEngine:
         self,
         order: Any,
         conditions: List[RuleCondition],
-        action: Optional[str] = None
+        action: Optional[str] = None,
+        context: Optional[FactContext] = None
     ) -> bool:
         if not conditions:
             return True
 
+        context = context or FactContext(order, action, self.fact_registry)
         for condition in conditions:
-            if not self._evaluate_single_condition(order, condition, action):
+            if not self._evaluate_single_condition(order, condition, action, context):
                 return False
         return True
 
@@ -87,22 +259,27 @@ class RuleEngine:
         self,
         order: Any,
         condition: RuleCondition,
-        action: Optional[str] = None
+        action: Optional[str] = None,
+        context: Optional[FactContext] = None
     ) -> bool:
+        context = context or FactContext(order, action, self.fact_registry)
 
         if condition.condition_type == RuleConditionType.AND:
             return all(
-                self._evaluate_single_condition(order, sub_cond, action)
+                self._evaluate_single_condition(order, sub_cond, action, context)
                 for sub_cond in condition.sub_conditions or []
             )
 
         if condition.condition_type == RuleConditionType.OR:
             return any(
-                self._evaluate_single_condition(order, sub_cond, action)
+                self._evaluate_single_condition(order, sub_cond, action, context)
                 for sub_cond in condition.sub_conditions or []
             )
 
-        field_value = self._get_field_value(order, condition.field, action)
+        if condition.condition_type == RuleConditionType.VELOCITY:
+            return get_velocity_counters().count_for(condition.field, condition.window_seconds, order) > condition.value
+
+        field_value = self._get_field_value(order, condition.field, action, context)
 
         if condition.condition_type == RuleConditionType.GREATER_THAN:
             return field_value > condition.value
@@ -121,38 +298,15 @@ class RuleEngine:
 
         return False
 
-    def _get_field_value(self, order: Any, field: str, action: Optional[str] = None) -> Any:
-
-        if field == "action":
-            return action
-
-        if field == "current_state":
-            return order.current_state
-
-        if hasattr(order, field):
-            return getattr(order, field)
-
-        if "." in field:
-            parts = field.split(".")
-            value = order
-            for part in parts:
-                if hasattr(value, part):
-                    value = getattr(value, part)
-                else:
-                    return None
-            return value
-
-        if field == "total_products":
-            return len(order.order_products) if hasattr(order, 'order_products') else 0
-
-        if field == "has_high_value_product":
-            if hasattr(order, 'order_products'):
-                for op in order.order_products:
-                    if hasattr(op, 'unit_price') and op.unit_price > 500:
-                        return True
-            return False
-
-        return None
+    def _get_field_value(
+        self,
+        order: Any,
+        field: str,
+        action: Optional[str] = None,
+        context: Optional[FactContext] = None
+    ) -> Any:
+        context = context or FactContext(order, action, self.fact_registry)
+        return context.get(field)
 
     def execute_actions(self, actions: List[RuleAction], order: Any, context: Dict[str, Any]) -> Dict[str, Any]:
 
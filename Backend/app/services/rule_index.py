@@ -0,0 +1,152 @@
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from enum import Enum
+from app.services.rule_engine import RuleCondition, RuleConditionType
+from app.services.rule_compiler import CompiledRule
+
+
+INDEXED_FIELDS = ("action", "current_state")
+
+
+def _key(value: Any) -> Any:
+    # str enums compare equal to their value but hash by name
+    return value.value if isinstance(value, Enum) else value
+
+
+def _allowed_values(condition: RuleCondition) -> Optional[FrozenSet[Any]]:
+    try:
+        if condition.condition_type == RuleConditionType.EQUALS:
+            return frozenset([_key(condition.value)])
+        if condition.condition_type == RuleConditionType.IN_LIST and not isinstance(condition.value, str):
+            return frozenset(_key(value) for value in condition.value)
+    except TypeError:
+        return None
+    return None
+
+
+def derive_constraints(conditions: List[RuleCondition]) -> Dict[str, FrozenSet[Any]]:
+    """
+    Returns, per indexed field, the only values for which the conditions can match.
+
+    Only conditions that must all hold are used: the rule's top-level list and
+    nested AND groups. A field without an EQUALS/IN_LIST pin is left out, meaning
+    any value is possible.
+    """
+    constraints: Dict[str, FrozenSet[Any]] = {}
+    for condition in conditions or []:
+        if condition.condition_type == RuleConditionType.AND:
+            nested = derive_constraints(condition.sub_conditions or [])
+        elif condition.field in INDEXED_FIELDS:
+            allowed = _allowed_values(condition)
+            nested = {condition.field: allowed} if allowed is not None else {}
+        else:
+            nested = {}
+
+        for field, allowed in nested.items():
+            constraints[field] = constraints[field] & allowed if field in constraints else allowed
+    return constraints
+
+
+class _EventIndex:
+
+    def __init__(self, rules: List[CompiledRule]):
+        self.rules = rules
+        self.constraints = [derive_constraints(compiled.rule.conditions) for compiled in rules]
+        self.postings: Dict[str, Dict[Any, List[int]]] = {field: {} for field in INDEXED_FIELDS}
+        self.unconstrained: Dict[str, List[int]] = {field: [] for field in INDEXED_FIELDS}
+
+        for position, constraints in enumerate(self.constraints):
+            for field in INDEXED_FIELDS:
+                allowed = constraints.get(field)
+                if allowed is None:
+                    self.unconstrained[field].append(position)
+                    continue
+                for value in allowed:
+                    self.postings[field].setdefault(value, []).append(position)
+
+    def candidates(self, action: Any, current_state: Any) -> List[CompiledRule]:
+        values = {"action": _key(action), "current_state": _key(current_state)}
+
+        try:
+            sides = {
+                field: (self.postings[field].get(value, []), self.unconstrained[field])
+                for field, value in values.items()
+            }
+        except TypeError:
+            return list(self.rules)
+
+        # Walk the smaller side and check the other field's pin per rule
+        field = min(sides, key=lambda f: len(sides[f][0]) + len(sides[f][1]))
+        other = "current_state" if field == "action" else "action"
+        other_value = values[other]
+
+        positions = []
+        for posting in sides[field]:
+            for position in posting:
+                allowed = self.constraints[position].get(other)
+                if allowed is None or other_value in allowed:
+                    positions.append(position)
+        positions.sort()
+        return [self.rules[position] for position in positions]
+
+
+class RuleIndex:
+    """
+    Maps (event, action, current_state) to the rules that can possibly match.
+
+    Candidates keep the original rule order, so evaluating them gives the same
+    actions as evaluating every rule. Lookups are memoized per key; the index is
+    immutable and rebuilt by the repository whenever the rule set changes.
+    """
+
+    MAX_MEMO_SIZE = 1024
+
+    def __init__(self, compiled_rules: List[CompiledRule]):
+        by_event: Dict[str, List[CompiledRule]] = {}
+        for compiled in compiled_rules:
+            by_event.setdefault(compiled.rule.event, []).append(compiled)
+        self._events = {event: _EventIndex(rules) for event, rules in by_event.items()}
+        self._memo: Dict[Tuple[str, Any, Any], List[CompiledRule]] = {}
+        self._tier_memo: Dict[Tuple[str, Any, Any], List[List[Tuple[int, CompiledRule]]]] = {}
+
+    def candidates(self, event: str, action: Any, current_state: Any) -> List[CompiledRule]:
+        event_index = self._events.get(event)
+        if event_index is None:
+            return []
+
+        try:
+            key = (event, _key(action), _key(current_state))
+            cached = self._memo.get(key)
+        except TypeError:
+            return event_index.candidates(action, current_state)
+
+        if cached is None:
+            cached = event_index.candidates(action, current_state)
+            if len(self._memo) >= self.MAX_MEMO_SIZE:
+                self._memo.clear()
+            self._memo[key] = cached
+        return cached
+
+    def tiers(self, event: str, action: Any, current_state: Any) -> List[List[Tuple[int, CompiledRule]]]:
+        """
+        The candidates grouped by Rule.priority, lowest first, as (position, rule)
+        pairs where position is the rule's place in the candidate list.
+        """
+        try:
+            key = (event, _key(action), _key(current_state))
+            cached = self._tier_memo.get(key)
+        except TypeError:
+            return _group_by_priority(self.candidates(event, action, current_state))
+
+        if cached is None:
+            cached = _group_by_priority(self.candidates(event, action, current_state))
+            if len(self._tier_memo) >= self.MAX_MEMO_SIZE:
+                self._tier_memo.clear()
+            self._tier_memo[key] = cached
+        return cached
+
+
+def _group_by_priority(rules: List[CompiledRule]) -> List[List[Tuple[int, CompiledRule]]]:
+    tiers: Dict[Any, List[Tuple[int, CompiledRule]]] = {}
+    for position, compiled in enumerate(rules):
+        tiers.setdefault(compiled.rule.priority, []).append((position, compiled))
+    return [tiers[priority] for priority in sorted(tiers)]
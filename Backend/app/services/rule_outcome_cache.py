@@ -0,0 +1,87 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+from app.config.database import settings
+
+
+class RuleOutcomeCache:
+    """
+    Bounded LRU cache of execute_actions results.
+
+    Keys start with the rule snapshot they were computed against. The first
+    lookup against a different snapshot drops every entry, so rule changes
+    invalidate the cache without anyone having to clear it.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._snapshot: Any = None
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, snapshot: Any, key: Hashable, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Returns a copy of the cached outcome for key, computing and storing it on a miss."""
+        if self.max_size <= 0:
+            return compute()
+
+        full_key = (snapshot, key)
+        with self._lock:
+            if snapshot is not self._snapshot:
+                self._entries.clear()
+                self._snapshot = snapshot
+            outcome = self._entries.get(full_key)
+            if outcome is not None:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return _copy_outcome(outcome)
+            self.misses += 1
+
+        outcome = compute()
+        with self._lock:
+            if snapshot is self._snapshot:
+                self._entries[full_key] = outcome
+                if len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return _copy_outcome(outcome)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "rules_version": getattr(self._snapshot, "version", None)
+        }
+
+
+def _copy_outcome(outcome: Dict[str, Any]) -> Dict[str, Any]:
+    # Callers may add to metadata/calculations; the cached dicts must not change
+    return {
+        **outcome,
+        "metadata": dict(outcome["metadata"]),
+        "calculations": {name: dict(value) for name, value in outcome["calculations"].items()}
+    }
+
+
+_default_cache: Optional[RuleOutcomeCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_rule_outcome_cache() -> RuleOutcomeCache:
+    """Returns the process-wide rule outcome cache."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = RuleOutcomeCache(settings.RULE_OUTCOME_CACHE_SIZE)
+    return _default_cache
@@ -0,0 +1,206 @@
+import threading
+from bisect import bisect_left
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+from app.config.database import settings
+from app.services.rule_engine import Rule, RuleCondition, RuleConditionType
+
+
+# Upper bounds, in microseconds, of the rule latency histogram buckets
+LATENCY_BUCKETS_US = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+
+def describe_condition(condition: RuleCondition) -> str:
+    condition_type = getattr(condition.condition_type, "value", condition.condition_type)
+    if condition.condition_type in (RuleConditionType.AND, RuleConditionType.OR):
+        inner = ", ".join(describe_condition(sub) for sub in condition.sub_conditions or [])
+        return f"{condition_type}({inner})"
+    return f"{condition.field} {condition_type} {condition.value!r}"
+
+
+class _ConditionStats:
+    __slots__ = ("index", "path", "label", "evaluations", "passed", "total_ns", "subs")
+
+    def __init__(self, condition: RuleCondition, index: int, path: str):
+        self.index = index
+        self.path = path
+        self.label = describe_condition(condition)
+        self.evaluations = 0
+        self.passed = 0
+        self.total_ns = 0
+        self.subs = [
+            _ConditionStats(sub, index, f"{path}.{i}") for i, sub in enumerate(condition.sub_conditions or [])
+        ]
+
+    def walk(self):
+        yield self
+        for sub in self.subs:
+            yield from sub.walk()
+
+
+class _RuleStats:
+    __slots__ = ("rule", "name", "evaluations", "matches", "cache_hits", "total_ns", "histogram", "conditions")
+
+    def __init__(self, rule: Rule):
+        self.rule = rule
+        self.name = rule.name
+        self.evaluations = 0
+        self.matches = 0
+        self.cache_hits = 0
+        self.total_ns = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_US) + 1)
+        self.conditions = [_ConditionStats(c, i, str(i)) for i, c in enumerate(rule.conditions or [])]
+
+
+class RuleProfiler:
+    """
+    Per-rule and per-condition counters and latency histograms for the rule engine.
+
+    The engine only calls into the profiler while it is enabled; when disabled,
+    evaluation costs one attribute check per rule. Counters are updated without
+    a lock, so they are approximate under concurrent threads.
+
+    Conditions nested in AND/OR groups are counted too. Statistics belong to
+    one version of a rule: the rule repository publishes every edit as a new
+    Rule object, and a rule seen as a different object starts over. Outcomes
+    served by the outcome cache evaluate no rule; they are counted per
+    candidate rule as cache_hits.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._rules: Dict[str, _RuleStats] = {}
+        self._lock = threading.Lock()
+
+    def _stats_for(self, rule: Rule) -> _RuleStats:
+        stats = self._rules.get(rule.id)
+        if stats is None or stats.rule is not rule:
+            # First time seen, or another version of the rule: start over
+            with self._lock:
+                stats = self._rules[rule.id] = _RuleStats(rule)
+        return stats
+
+    def run(self, rule: Rule, evaluate: Callable[[RuleCondition], bool]) -> bool:
+        """
+        Evaluates the rule's conditions, recording what it cost.
+
+        evaluate is called with each leaf condition reached; AND/OR groups are
+        walked here, short-circuiting as the engine does, so every nested
+        condition gets its own counters.
+        """
+        stats = self._stats_for(rule)
+        started = perf_counter_ns()
+        matched = self._all(stats.conditions, rule.conditions or [], evaluate)
+
+        elapsed = perf_counter_ns() - started
+        stats.evaluations += 1
+        stats.total_ns += elapsed
+        stats.histogram[bisect_left(LATENCY_BUCKETS_US, elapsed / 1000)] += 1
+        if matched:
+            stats.matches += 1
+        return matched
+
+    def _all(self, stats: List[_ConditionStats], conditions: Sequence[RuleCondition], evaluate) -> bool:
+        for condition_stats, condition in zip(stats, conditions):
+            if not self._condition(condition_stats, condition, evaluate):
+                return False
+        return True
+
+    def _condition(self, stats: _ConditionStats, condition: RuleCondition, evaluate) -> bool:
+        started = perf_counter_ns()
+        if condition.condition_type == RuleConditionType.AND:
+            passed = self._all(stats.subs, condition.sub_conditions or [], evaluate)
+        elif condition.condition_type == RuleConditionType.OR:
+            passed = any(
+                self._condition(sub_stats, sub, evaluate)
+                for sub_stats, sub in zip(stats.subs, condition.sub_conditions or [])
+            )
+        else:
+            passed = evaluate(condition)
+        stats.total_ns += perf_counter_ns() - started
+        stats.evaluations += 1
+        if passed:
+            stats.passed += 1
+        return passed
+
+    def record_cache_hit(self, rules: Iterable[Rule]) -> None:
+        """Counts an outcome served from the cache against every rule it would have evaluated."""
+        for rule in rules:
+            self._stats_for(rule).cache_hits += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._rules = {}
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Rules by total time spent, most expensive first, with a suggested condition order."""
+        report = []
+        for rule_id, stats in list(self._rules.items()):
+            conditions = [
+                {
+                    "index": c.index,
+                    "path": c.path,
+                    "condition": c.label,
+                    "evaluations": c.evaluations,
+                    "passed": c.passed,
+                    "short_circuits": c.evaluations - c.passed,
+                    "pass_rate": c.passed / c.evaluations if c.evaluations else None,
+                    "mean_us": c.total_ns / c.evaluations / 1000 if c.evaluations else None
+                }
+                for top in stats.conditions
+                for c in top.walk()
+            ]
+            recommended = recommend_condition_order([c for c in conditions if c["path"] == str(c["index"])])
+            report.append({
+                "rule_id": rule_id,
+                "name": stats.name,
+                "evaluations": stats.evaluations,
+                "matches": stats.matches,
+                "cache_hits": stats.cache_hits,
+                "match_rate": stats.matches / stats.evaluations if stats.evaluations else None,
+                "total_ms": stats.total_ns / 1e6,
+                "mean_us": stats.total_ns / stats.evaluations / 1000 if stats.evaluations else None,
+                "histogram": {
+                    **{f"<={bound}us": stats.histogram[i] for i, bound in enumerate(LATENCY_BUCKETS_US)},
+                    f">{LATENCY_BUCKETS_US[-1]}us": stats.histogram[-1]
+                },
+                "conditions": conditions,
+                "recommended_order": recommended,
+                "reorder_suggested": recommended != list(range(len(stats.conditions)))
+            })
+        report.sort(key=lambda item: item["total_ms"], reverse=True)
+        return report
+
+
+def recommend_condition_order(conditions: List[Dict[str, Any]]) -> List[int]:
+    """
+    Orders the conditions of an AND by mean cost per rejection, cheapest first.
+
+    A condition that costs c and rejects a fraction f of the orders it sees
+    should run before one with a higher c / f. Conditions that never failed
+    rank after those that did; conditions never reached keep their place at
+    the end. Pass rates are measured under the current order, so they are
+    conditional on the conditions before them passing.
+    """
+    measured = [c for c in conditions if c["evaluations"]]
+    unmeasured = [c["index"] for c in conditions if not c["evaluations"]]
+
+    def rank(c):
+        fail_rate = 1 - c["pass_rate"]
+        return (0, c["mean_us"] / fail_rate) if fail_rate > 0 else (1, c["mean_us"])
+
+    return [c["index"] for c in sorted(measured, key=rank)] + unmeasured
+
+
+_default_profiler: Optional[RuleProfiler] = None
+_default_profiler_lock = threading.Lock()
+
+
+def get_rule_profiler() -> RuleProfiler:
+    """Returns the process-wide rule profiler, enabled from RULES_PROFILING."""
+    global _default_profiler
+    if _default_profiler is None:
+        with _default_profiler_lock:
+            if _default_profiler is None:
+                _default_profiler = RuleProfiler(enabled=settings.RULES_PROFILING)
+    return _default_profiler
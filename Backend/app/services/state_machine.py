@@ -25,6 +25,12 @@ class OrderStateMachine:
         OrderState.CANCELLED: {},
     }
 
+    # Actions available from each state, by value, so lookups need no enum conversion
+    ALLOWED_ACTIONS: Dict[str, List[str]] = {
+        state.value: [action.value for action in actions]
+        for state, actions in TRANSITIONS.items()
+    }
+
     @classmethod
     def is_valid_transition(
         cls,
@@ -52,8 +58,4 @@ class OrderStateMachine:
 
     @classmethod
     def get_allowed_actions(cls, current_state: str) -> List[str]:
-        try:
-            state = OrderState(current_state)
-            return [action.value for action in cls.TRANSITIONS.get(state, {}).keys()]
-        except ValueError:
-            return []
\ No newline at end of file
+        return list(cls.ALLOWED_ACTIONS.get(getattr(current_state, "value", current_state), []))
\ No newline at end of file
@@ -0,0 +1,109 @@
+import asyncio
+import csv
+import gzip
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from app.models.transition_log import TransitionLog
+from app.repositories.transition_log_partition_repository import (
+    TransitionLogPartitionRepository,
+    add_months,
+    month_start,
+)
+from typing import List, Optional
+
+
+@dataclass(frozen=True)
+class ArchivedSegment:
+    partition: str
+    path: str
+    rows: int
+
+
+class TransitionLogRetentionService:
+    """
+    Keeps the monthly transition_logs partitions ahead of time and moves expired
+    months out of the database.
+
+    A month expires once it ended more than retention_months ago. Its partition
+    is detached (a catalog change, no rows are rewritten), exported to
+    <archive_dir>/<partition>.csv.gz with a header row and dropped. Expired rows
+    of the default partition are moved into a standalone table first and
+    archived the same way. The file is written under a temporary name and
+    renamed once complete, and a table left detached by an interrupted run is
+    exported on the next one, so rows are only dropped after their segment file
+    exists.
+
+    archive_dir must be on persistent storage (a mounted volume in a
+    container): dropped rows only exist in the segment files.
+    """
+
+    def __init__(
+        self,
+        partition_repo: TransitionLogPartitionRepository,
+        archive_dir: str,
+        retention_months: int = 0,
+        months_ahead: int = 3,
+        chunk_size: int = 50000
+    ):
+        self.partition_repo = partition_repo
+        self.archive_dir = archive_dir
+        self.retention_months = retention_months
+        self.months_ahead = months_ahead
+        self.chunk_size = chunk_size
+
+    def retention_start(self, now: datetime) -> Optional[datetime]:
+        """The first month kept, or None when every month is kept."""
+        if self.retention_months <= 0:
+            return None
+        return add_months(month_start(now), -self.retention_months)
+
+    async def run(self, now: Optional[datetime] = None) -> List[ArchivedSegment]:
+        """Creates the upcoming partitions, then archives the expired ones."""
+        now = now or datetime.utcnow()
+        if not await self.partition_repo.is_partitioned():
+            return []
+        await self.partition_repo.ensure_partitions(self.months_ahead, now)
+        return await self.archive_expired(now)
+
+    async def archive_expired(self, now: datetime) -> List[ArchivedSegment]:
+        """Archives the expired months, unless another process is archiving right now."""
+        keep_from = self.retention_start(now)
+        if keep_from is None:
+            return []
+
+        async with self.partition_repo.archive_lock() as acquired:
+            if not acquired:
+                return []
+            return await self._archive(keep_from)
+
+    async def _archive(self, keep_from: datetime) -> List[ArchivedSegment]:
+        for partition in await self.partition_repo.get_partitions():
+            if partition.end <= keep_from:
+                await self.partition_repo.detach_partition(partition.name)
+        await self.partition_repo.move_expired_default_rows(keep_from)
+
+        archived = []
+        for name in await self.partition_repo.get_detached():
+            archived.append(await self._export(name))
+            await self.partition_repo.drop_detached(name)
+        return archived
+
+    async def _export(self, name: str) -> ArchivedSegment:
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"{name}.csv.gz")
+        partial = f"{path}.partial"
+        rows = 0
+
+        with gzip.open(partial, "wt", newline="") as segment:
+            writer = csv.writer(segment)
+            writer.writerow([c.name for c in TransitionLog.__table__.columns])
+            async for chunk in self.partition_repo.stream_rows(name, self.chunk_size):
+                # Compression is CPU bound: keep it off the event loop
+                await asyncio.to_thread(writer.writerows, chunk)
+                rows += len(chunk)
+        with open(partial, "rb") as segment:
+            os.fsync(segment.fileno())
+
+        os.replace(partial, path)
+        return ArchivedSegment(partition=name, path=path, rows=rows)
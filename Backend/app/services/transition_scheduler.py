@@ -0,0 +1,257 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from app.config.database import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SchedulePolicy:
+    """What to do with orders that stay in state for longer than after."""
+
+    name: str
+    state: str
+    after: timedelta
+    # Transition to fire when the deadline passes; None only flags the order as stuck
+    action: Optional[str] = None
+    cancellation_reason: Optional[str] = None
+
+
+def default_policies() -> List[SchedulePolicy]:
+    """The policies enabled in settings; a limit of 0 hours disables its policy."""
+    policies = []
+    if settings.SCHEDULER_PENDING_CANCEL_HOURS > 0:
+        hours = settings.SCHEDULER_PENDING_CANCEL_HOURS
+        policies.append(SchedulePolicy(
+            name="auto_cancel_pending",
+            state="pending",
+            after=timedelta(hours=hours),
+            action="cancel",
+            cancellation_reason=f"Automatically cancelled after {hours:g} hours pending"
+        ))
+    if settings.SCHEDULER_REVIEW_STUCK_HOURS > 0:
+        policies.append(SchedulePolicy(
+            name="stuck_in_review",
+            state="review",
+            after=timedelta(hours=settings.SCHEDULER_REVIEW_STUCK_HOURS)
+        ))
+    return policies
+
+
+# Returns the orders that could not be transitioned (None when all were)
+FireCallback = Callable[[SchedulePolicy, List[Any]], Awaitable[Optional[List[Any]]]]
+
+
+class TransitionScheduler:
+    """
+    Fires policy actions on orders that stay too long in a state.
+
+    Upcoming deadlines are kept in a min-heap. The scheduler is told about state
+    changes committed in this process (track) and about those of every process
+    through the change feed (merge), and never queries the orders table after
+    the initial load; an entry whose order has since moved on is discarded when
+    it reaches the top of the heap. Due orders are handed to the fire callback in batches
+    of at most batch_size per policy, and flagged orders are kept in flagged
+    until they change state. An order the callback fails to transition is
+    retried after retry_seconds, doubling each time, and flagged after
+    max_retries retries. State lives in this process only and is rebuilt on
+    startup, so exactly one process runs it.
+    """
+
+    def __init__(
+        self,
+        policies: Sequence[SchedulePolicy] = (),
+        batch_size: int = 500,
+        max_sleep_seconds: float = 60.0,
+        retry_seconds: float = 60.0,
+        max_retries: int = 5,
+        clock: Callable[[], datetime] = datetime.utcnow
+    ):
+        self.policies = list(policies)
+        self.batch_size = batch_size
+        self.max_sleep_seconds = max_sleep_seconds
+        self.retry_seconds = retry_seconds
+        self.max_retries = max_retries
+        self.clock = clock
+        self.running = False
+        self.flagged: Dict[Any, Tuple[SchedulePolicy, datetime, datetime]] = {}
+        self._by_state: Dict[str, List[SchedulePolicy]] = {}
+        for policy in self.policies:
+            self._by_state.setdefault(policy.state, []).append(policy)
+        self._heap: List[Tuple[datetime, int, Any, datetime, SchedulePolicy]] = []
+        self._entered: Dict[Any, Tuple[str, datetime]] = {}
+        self._retries: Dict[Any, int] = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def states(self) -> List[str]:
+        return list(self._by_state)
+
+    def __len__(self) -> int:
+        return len(self._entered)
+
+    def track(self, order_id: Any, state: str, entered_at: datetime) -> None:
+        """Records that the order entered state at entered_at, scheduling its deadlines."""
+        if not self.running:
+            return
+        with self._lock:
+            self.flagged.pop(order_id, None)
+            self._retries.pop(order_id, None)
+            policies = self._by_state.get(state)
+            if not policies:
+                self._entered.pop(order_id, None)
+                return
+            self._entered[order_id] = (state, entered_at)
+            earliest = self._heap[0][0] if self._heap else None
+            for policy in policies:
+                deadline = entered_at + policy.after
+                heapq.heappush(self._heap, (deadline, next(self._sequence), order_id, entered_at, policy))
+                if earliest is None or deadline < earliest:
+                    earliest = deadline
+                    if self._wakeup is not None:
+                        self._wakeup.set()
+
+    def pop_due(self, now: Optional[datetime] = None) -> Dict[SchedulePolicy, List[Any]]:
+        """Removes and returns the orders past a deadline, at most batch_size per policy."""
+        now = now or self.clock()
+        due: Dict[SchedulePolicy, List[Any]] = {}
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, order_id, entered_at, policy = self._heap[0]
+                batch = due.get(policy, [])
+                if len(batch) >= self.batch_size:
+                    break
+                heapq.heappop(self._heap)
+                if self._entered.get(order_id) != (policy.state, entered_at):
+                    continue
+                due[policy] = batch
+                batch.append(order_id)
+        return due
+
+    def next_deadline(self) -> Optional[datetime]:
+        return self._heap[0][0] if self._heap else None
+
+    def merge(self, entries: Iterable[Tuple[Any, str, datetime]]) -> int:
+        """
+        Tracks (order_id, state, entered_at) entries read from the database and
+        returns how many were new; an entry never replaces a newer or identical
+        tracked state.
+        """
+        merged = 0
+        for order_id, state, entered_at in entries:
+            current = self._entered.get(order_id)
+            if current is None or current[1] < entered_at:
+                self.track(order_id, state, entered_at)
+                merged += 1
+        return merged
+
+    def forget(self, order_id: Any) -> None:
+        """Stops scheduling a deleted order."""
+        with self._lock:
+            self._entered.pop(order_id, None)
+            self._retries.pop(order_id, None)
+            self.flagged.pop(order_id, None)
+
+    async def start(self, entries: Callable[[List[str]], Any]) -> None:
+        """
+        Begins tracking and loads the orders currently in scheduled states.
+
+        entries(states) is an async iterator of (order_id, state, entered_at)
+        chunks. Tracking starts before the load, so transitions made while it
+        runs are not missed; a loaded row never replaces a newer tracked state.
+        """
+        self.running = True
+        self._wakeup = asyncio.Event()
+        loaded = 0
+        async for chunk in entries(self.states):
+            loaded += self.merge(chunk)
+        logger.info("Scheduler loaded %s orders for %s policies", loaded, len(self.policies))
+
+    async def run(self, fire: FireCallback) -> None:
+        """Fires due deadlines until cancelled, sleeping until the next one in between."""
+        while True:
+            due = self.pop_due()
+            for policy, order_ids in due.items():
+                if policy.action is None:
+                    self._flag(policy, order_ids)
+                    continue
+                try:
+                    failed = await fire(policy, order_ids) or []
+                except Exception:
+                    logger.exception("Scheduled %s failed for %s orders", policy.name, len(order_ids))
+                    failed = order_ids
+                self._retry(policy, failed)
+            if due:
+                continue
+
+            self._wakeup.clear()
+            next_deadline = self.next_deadline()
+            timeout = self.max_sleep_seconds
+            if next_deadline is not None:
+                timeout = min(timeout, max((next_deadline - self.clock()).total_seconds(), 0))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _retry(self, policy: SchedulePolicy, order_ids: List[Any]) -> None:
+        """Reschedules failed orders that are still in the policy's state, with exponential backoff."""
+        now = self.clock()
+        exhausted = []
+        with self._lock:
+            for order_id in order_ids:
+                current = self._entered.get(order_id)
+                if current is None or current[0] != policy.state:
+                    continue
+                retries = self._retries.get(order_id, 0)
+                if retries >= self.max_retries:
+                    self._retries.pop(order_id, None)
+                    exhausted.append(order_id)
+                    continue
+                self._retries[order_id] = retries + 1
+                deadline = now + timedelta(seconds=self.retry_seconds * 2 ** retries)
+                heapq.heappush(self._heap, (deadline, next(self._sequence), order_id, current[1], policy))
+        if exhausted:
+            self._flag(policy, exhausted)
+
+    def _flag(self, policy: SchedulePolicy, order_ids: List[Any]) -> None:
+        now = self.clock()
+        with self._lock:
+            for order_id in order_ids:
+                current = self._entered.get(order_id)
+                if current is not None:
+                    self.flagged[order_id] = (policy, current[1], now)
+        logger.warning("%s orders flagged by %s", len(order_ids), policy.name)
+
+    def stop(self) -> None:
+        self.running = False
+        with self._lock:
+            self._heap = []
+            self._entered = {}
+            self._retries = {}
+            self.flagged = {}
+
+
+_default_scheduler: Optional[TransitionScheduler] = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_transition_scheduler() -> TransitionScheduler:
+    """Returns the process-wide scheduler; it only tracks orders once started from the app lifespan."""
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_scheduler_lock:
+            if _default_scheduler is None:
+                _default_scheduler = TransitionScheduler(
+                    default_policies(),
+                    batch_size=settings.SCHEDULER_BATCH_SIZE
+                )
+    return _default_scheduler
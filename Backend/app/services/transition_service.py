@@ -1,14 +1,31 @@
+from app.config.database import settings
 from app.repositories.order_repository import OrderRepository
 from app.repositories.transition_log_repository import TransitionLogRepository
 from app.repositories.ticket_repository import TicketRepository
-from app.repositories.rule_repository import RuleRepository
+from app.repositories.rule_repository import RuleRepository, get_rule_repository
 from app.services.state_machine import OrderStateMachine
 from app.services.rule_engine import RuleEngine, RuleActionType
-from app.schemas.transition import TransitionLogResponse
-from typing import List, Optional, Dict, Any
+from app.services import fact_providers  # registers the async fact providers on the default registry
+from app.services.rule_outcome_cache import get_rule_outcome_cache
+from app.services.rule_profiler import get_rule_profiler
+from app.services.velocity_counters import get_velocity_counters
+from app.services.transition_scheduler import get_transition_scheduler
+from app.services.event_broadcaster import get_event_broadcaster
+from app.schemas.transition import (
+    TransitionLogResponse,
+    BatchTransitionItem,
+    BatchTransitionResult,
+    AllowedActionsResult
+)
+from datetime import datetime
+from typing import Iterable, List, Optional, Dict, Any, Tuple
 from uuid import UUID
 
 
+class TransitionConflictError(Exception):
+    """Raised when an order changed state between being read and being transitioned."""
+
+
 class TransitionService:
     def __init__(
         self,
@@ -21,8 +38,16 @@ class TransitionService:
         self.log_repo = log_repo
         self.ticket_repo = ticket_repo
 
-        self.rule_repository = rule_repository or RuleRepository()
-        self.rule_engine = RuleEngine(self.rule_repository)
+        self.rule_repository = rule_repository or get_rule_repository()
+        self.rule_engine = RuleEngine(
+            self.rule_repository,
+            outcome_cache=get_rule_outcome_cache(),
+            short_circuit=settings.RULES_SHORT_CIRCUIT,
+            profiler=get_rule_profiler()
+        )
+        self.velocity_counters = get_velocity_counters()
+        self.scheduler = get_transition_scheduler()
+        self.broadcaster = get_event_broadcaster()
 
     async def transition_order(
         self,
@@ -36,39 +61,27 @@ class TransitionService:
         This operation is atomic: if it fails, neither the state change nor the transition log is saved.
         If the action is 'cancel', a ticket is created with the cancellation reason.
         Now includes rule engine evaluation before transition.
+
+        The state is changed with a compare-and-set on the state the order was loaded
+        in, so of two concurrent transitions from the same state only one succeeds;
+        the other raises TransitionConflictError. The log and ticket inserts are sent
+        with the commit, and the returned "order" is the loaded instance with its new
+        state, so callers do not need to reload it.
         """
 
         order = await self.order_repo.get_by_id(order_id)
         if not order:
             raise ValueError("Order not found")
 
-        rule_actions = self.rule_engine.evaluate(order, event="order_transition", action=action)
-
-        rule_results = self.rule_engine.execute_actions(
-            rule_actions,
-            order,
-            context={"action": action, "cancellation_reason": cancellation_reason}
-        )
-
-        if rule_results.get("blocked", False):
-            raise ValueError(rule_results.get("block_reason", "Transition blocked by business rules"))
-
-        is_valid, new_state, error_msg = OrderStateMachine.is_valid_transition(
-            current_state=order.current_state,
-            action=action,
-            order_amount=order.amount
-        )
-
-        if not is_valid:
-            raise ValueError(error_msg)
-
-        if action == "cancel":
-            if not cancellation_reason or not cancellation_reason.strip():
-                raise ValueError("Cancellation reason is required when cancelling an order")
+        facts = await self.rule_engine.prefetch_facts(self.order_repo.db, [order], "order_transition")
+        new_state, rule_results = self._plan_transition(order, action, cancellation_reason, facts.get(order.id))
 
         previous_state = order.current_state
 
-        order.current_state = new_state
+        if not await self.order_repo.compare_and_set_state(order, new_state):
+            raise TransitionConflictError(
+                f"Order changed state concurrently; it is no longer '{previous_state}'"
+            )
 
         log_data = {
             "order_id": order.id,
@@ -76,20 +89,21 @@ class TransitionService:
             "new_state": new_state,
             "action_taken": action
         }
-        await self.log_repo.create(log_data)
+        log = await self.log_repo.create(log_data)
 
         if action == "cancel" and self.ticket_repo:
             ticket_data = {
                 "order_id": order.id,
                 "cancellation_reason": cancellation_reason
             }
-            await self.ticket_repo.create(ticket_data)
+            await self.ticket_repo.create_many([ticket_data])
 
         await self.log_repo.db.commit()
-        await self.log_repo.db.refresh(order)
+        self._after_commit(order, {"id": log.id, **log_data, "transition_date": log.transition_date})
 
         return {
             "order_id": order.id,
+            "order": order,
             "previous_state": previous_state,
             "new_state": new_state,
             "action_taken": action,
@@ -97,10 +111,188 @@ class TransitionService:
             "calculations": rule_results.get("calculations", {})
         }
 
+    async def transition_orders_batch(self, items: List[BatchTransitionItem]) -> List[BatchTransitionResult]:
+        """
+        Performs many transitions at once, reporting success or failure per order.
+
+        Orders are loaded with one query and checked with the same rules as a single
+        transition. State updates, logs and tickets for the accepted ones are then
+        written in bulk and committed together. An order that changed state after it
+        was loaded is reported as failed instead of being overwritten.
+        """
+        orders = await self.order_repo.get_by_ids(item.order_id for item in items)
+        facts = await self.rule_engine.prefetch_facts(self.order_repo.db, list(orders.values()), "order_transition")
+
+        results: Dict[int, BatchTransitionResult] = {}
+        planned = []
+        seen = set()
+
+        for index, item in enumerate(items):
+            order = orders.get(item.order_id)
+            try:
+                if item.order_id in seen:
+                    raise ValueError("Order appears more than once in the batch")
+                seen.add(item.order_id)
+                if not order:
+                    raise ValueError("Order not found")
+                new_state, rule_results = self._plan_transition(
+                    order, item.action, item.cancellation_reason, facts.get(order.id)
+                )
+            except ValueError as e:
+                results[index] = BatchTransitionResult(order_id=item.order_id, success=False, error=str(e))
+                continue
+            planned.append((index, item, order.current_state, new_state, rule_results))
+
+        updated = await self.order_repo.update_states(
+            [(item.order_id, previous_state, new_state) for _, item, previous_state, new_state, _ in planned]
+        )
+
+        logs_data = []
+        tickets_data = []
+        for index, item, previous_state, new_state, rule_results in planned:
+            if item.order_id not in updated:
+                results[index] = BatchTransitionResult(
+                    order_id=item.order_id,
+                    success=False,
+                    error="Order state changed concurrently"
+                )
+                continue
+
+            logs_data.append({
+                "order_id": item.order_id,
+                "previous_state": previous_state,
+                "new_state": new_state,
+                "action_taken": item.action
+            })
+            if item.action == "cancel":
+                tickets_data.append({
+                    "order_id": item.order_id,
+                    "cancellation_reason": item.cancellation_reason
+                })
+            results[index] = BatchTransitionResult(
+                order_id=item.order_id,
+                success=True,
+                previous_state=previous_state,
+                new_state=new_state,
+                rule_metadata=rule_results.get("metadata", {}),
+                calculations=rule_results.get("calculations", {})
+            )
+
+        logs = await self.log_repo.create_many(logs_data)
+        if self.ticket_repo:
+            await self.ticket_repo.create_many(tickets_data)
+        await self.log_repo.db.commit()
+        for log in logs:
+            self._after_commit(orders[log["order_id"]], log)
+
+        return [results[index] for index in range(len(items))]
+
+    def _after_commit(self, order: Any, log: Dict[str, Any]) -> None:
+        """
+        Tells the in-process trackers about a committed transition: VELOCITY
+        counters count it under its action and as "transition", the scheduler
+        reschedules the order for its new state, and live feed subscribers get
+        the log.
+        """
+        self.velocity_counters.record(log["action_taken"], order)
+        self.velocity_counters.record("transition", order)
+        self.scheduler.track(order.id, log["new_state"], log["transition_date"] or datetime.utcnow())
+        self.broadcaster.publish("transition", {
+            "id": log["id"],
+            "order_id": log["order_id"],
+            "previous_state": log["previous_state"],
+            "new_state": log["new_state"],
+            "action_taken": log["action_taken"],
+            "transition_date": log["transition_date"]
+        })
+
+    async def get_allowed_actions(self, order_id: UUID) -> List[str]:
+        """
+        The actions a transition of the order would accept right now.
+
+        Each action the state machine allows from the current state is dry-run
+        through the business rules, and the ones the rules would block are left
+        out. The cancellation reason is not checked, as it is given with the action.
+        """
+        order = await self.order_repo.get_by_id(order_id)
+        if not order:
+            raise ValueError("Order not found")
+
+        facts = await self.rule_engine.prefetch_facts(self.order_repo.db, [order], "order_transition")
+        return self._allowed_actions(order, facts.get(order.id))
+
+    async def get_allowed_actions_batch(self, order_ids: Iterable[UUID]) -> List[AllowedActionsResult]:
+        """get_allowed_actions for many orders, with one load and one fact prefetch for all of them."""
+        order_ids = list(order_ids)
+        orders = await self.order_repo.get_by_ids(order_ids)
+        facts = await self.rule_engine.prefetch_facts(self.order_repo.db, list(orders.values()), "order_transition")
+
+        results = []
+        for order_id in order_ids:
+            order = orders.get(order_id)
+            if not order:
+                results.append(AllowedActionsResult(order_id=order_id, error="Order not found"))
+                continue
+            results.append(AllowedActionsResult(
+                order_id=order_id,
+                allowed_actions=self._allowed_actions(order, facts.get(order.id))
+            ))
+        return results
+
+    def _allowed_actions(self, order: Any, facts: Optional[Dict[str, Any]] = None) -> List[str]:
+        # Outcomes go through the rule outcome cache, so orders alike in the
+        # fields the rules read cost one evaluation per action between them
+        return [
+            action
+            for action in OrderStateMachine.get_allowed_actions(order.current_state)
+            if not self.rule_engine.evaluate_outcome(
+                order,
+                event="order_transition",
+                action=action,
+                context={"action": action, "cancellation_reason": None},
+                facts=facts
+            ).get("blocked", False)
+        ]
+
+    def _plan_transition(
+        self,
+        order: Any,
+        action: str,
+        cancellation_reason: Optional[str],
+        facts: Optional[Dict[str, Any]] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Runs business rules and the state machine, returning the new state or raising ValueError."""
+        rule_results = self.rule_engine.evaluate_outcome(
+            order,
+            event="order_transition",
+            action=action,
+            context={"action": action, "cancellation_reason": cancellation_reason},
+            facts=facts
+        )
+
+        if rule_results.get("blocked", False):
+            raise ValueError(rule_results.get("block_reason", "Transition blocked by business rules"))
+
+        is_valid, new_state, error_msg = OrderStateMachine.is_valid_transition(
+            current_state=order.current_state,
+            action=action,
+            order_amount=order.amount
+        )
+
+        if not is_valid:
+            raise ValueError(error_msg)
+
+        if action == "cancel":
+            if not cancellation_reason or not cancellation_reason.strip():
+                raise ValueError("Cancellation reason is required when cancelling an order")
+
+        return new_state, rule_results
+
     async def get_order_logs(self, order_id: UUID) -> List[TransitionLogResponse]:
         order = await self.order_repo.get_by_id(order_id)
         if not order:
             raise ValueError("Order not found")
 
-        logs = await self.log_repo.get_by_order_id(order_id)
+        # No log predates the order, so older partitions can be skipped
+        logs = await self.log_repo.get_by_order_id(order_id, since=order.creation_date)
         return [TransitionLogResponse.model_validate(log) for log in logs]
\ No newline at end of file
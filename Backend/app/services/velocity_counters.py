@@ -0,0 +1,139 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from app.config.database import settings
+
+
+# Order attribute that identifies the entity counted in each scope
+SCOPE_KEYS = {
+    "customer": "customer_id",
+    "order": "id",
+}
+
+
+def parse_counter(field: str) -> Tuple[str, str]:
+    """Splits a velocity field such as "customer.cancel" into (scope, event)."""
+    scope, _, event = field.partition(".")
+    if scope not in SCOPE_KEYS or not event:
+        raise ValueError(f"Invalid velocity field {field!r}: expected one of {sorted(SCOPE_KEYS)} followed by .<event>")
+    return scope, event
+
+
+class _Ring:
+    """Event counts for one key over one window, in a fixed ring of time buckets."""
+
+    __slots__ = ("counts", "epoch", "total")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * buckets
+        self.epoch = None
+        self.total = 0
+
+    def advance(self, epoch: int) -> None:
+        # Clears the buckets that fell out of the window since the last call;
+        # at most one pass over the ring, however long the key was idle
+        if self.epoch is None:
+            self.epoch = epoch
+            return
+        buckets = len(self.counts)
+        for stale in range(self.epoch + 1, min(epoch, self.epoch + buckets) + 1):
+            slot = stale % buckets
+            self.total -= self.counts[slot]
+            self.counts[slot] = 0
+        self.epoch = max(self.epoch, epoch)
+
+
+class VelocityCounters:
+    """
+    In-process sliding-window event counters for VELOCITY rule conditions.
+
+    Each tracked (scope.event, window) keeps, per key, a ring of buckets of
+    window / buckets seconds and a running total, so recording and reading
+    are O(1). Counts are exact to one bucket: the window slides in bucket
+    steps. Each (scope.event, window) holds at most max_keys keys, dropping
+    the least recently used one beyond that. Counters live in this process
+    only and start empty on restart.
+    """
+
+    def __init__(self, buckets: int = 10, max_keys: int = 10000, clock: Callable[[], float] = time.time):
+        self.buckets = buckets
+        self.max_keys = max_keys
+        self.clock = clock
+        self._windows: Dict[str, Set[int]] = {}
+        self._rings: Dict[Tuple[str, int], "OrderedDict[Any, _Ring]"] = {}
+        self._lock = threading.Lock()
+
+    def track(self, field: str, window_seconds: int) -> None:
+        """Starts counting field over window_seconds; events before this are not counted."""
+        parse_counter(field)
+        if window_seconds <= 0:
+            raise ValueError("window_seconds must be positive")
+        with self._lock:
+            self._windows.setdefault(field, set()).add(window_seconds)
+            self._rings.setdefault((field, window_seconds), OrderedDict())
+
+    def _epoch(self, window_seconds: int, now: float) -> int:
+        return math.floor(now / (window_seconds / self.buckets))
+
+    def record(self, event: str, order: Any, count: int = 1) -> None:
+        """Counts one occurrence of event for the order, in every scope that tracks it."""
+        now = self.clock()
+        with self._lock:
+            for scope, attribute in SCOPE_KEYS.items():
+                field = f"{scope}.{event}"
+                windows = self._windows.get(field)
+                if not windows:
+                    continue
+                key = getattr(order, attribute, None)
+                if key is None:
+                    continue
+                for window_seconds in windows:
+                    rings = self._rings[(field, window_seconds)]
+                    ring = rings.get(key)
+                    if ring is None:
+                        ring = rings[key] = _Ring(self.buckets)
+                        if len(rings) > self.max_keys:
+                            rings.popitem(last=False)
+                    else:
+                        rings.move_to_end(key)
+                    epoch = self._epoch(window_seconds, now)
+                    ring.advance(epoch)
+                    ring.counts[epoch % self.buckets] += count
+                    ring.total += count
+
+    def count(self, field: str, window_seconds: int, key: Any) -> int:
+        """Events of field for key within the last window_seconds."""
+        rings = self._rings.get((field, window_seconds))
+        if not rings or key is None:
+            return 0
+        with self._lock:
+            ring = rings.get(key)
+            if ring is None:
+                return 0
+            ring.advance(self._epoch(window_seconds, self.clock()))
+            return ring.total
+
+    def count_for(self, field: str, window_seconds: int, order: Any) -> int:
+        scope, _ = parse_counter(field)
+        return self.count(field, window_seconds, getattr(order, SCOPE_KEYS[scope], None))
+
+    def clear(self) -> None:
+        with self._lock:
+            for rings in self._rings.values():
+                rings.clear()
+
+
+_default_counters: Optional[VelocityCounters] = None
+_default_counters_lock = threading.Lock()
+
+
+def get_velocity_counters() -> VelocityCounters:
+    """Returns the process-wide velocity counters."""
+    global _default_counters
+    if _default_counters is None:
+        with _default_counters_lock:
+            if _default_counters is None:
+                _default_counters = VelocityCounters(max_keys=settings.VELOCITY_MAX_KEYS)
+    return _default_counters
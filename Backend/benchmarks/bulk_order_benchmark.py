@@ -0,0 +1,98 @@
+"""
+Benchmark for order creation: one create_order call (one POST /orders) per order
+vs a single create_orders_bulk call (POST /orders/bulk), on in-memory SQLite.
+
+SQLite has no network round trips, so against PostgreSQL the gap is larger:
+each single create costs several round trips, while the bulk path costs a few
+multi-row statements per INSERT_CHUNK_SIZE orders.
+
+Run from the Backend directory:
+
+    python -m benchmarks.bulk_order_benchmark
+"""
+import asyncio
+import time
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from app.config.database import Base
+from app.models.customer import Customer
+from app.models.product import Product
+from app.models.ticket import Ticket  # noqa: F401 - Order's relationships need every model mapped
+from app.repositories.customer_repository import CustomerRepository
+from app.repositories.order_repository import OrderRepository
+from app.repositories.product_repository import ProductRepository
+from app.schemas.order import OrderCreate
+from app.schemas.product import ProductInOrder
+from app.services.order_service import OrderService
+
+
+async def make_session():
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)()
+
+
+async def make_orders(db: AsyncSession, count: int) -> list:
+    customer = Customer(name="Bench", email="bench@example.com")
+    products = [Product(name=f"Product {i}", unit_price=10.0 + i) for i in range(3)]
+    db.add_all([customer, *products])
+    await db.commit()
+    return [
+        OrderCreate(
+            amount=60.0,
+            customer_id=customer.id,
+            products=[
+                ProductInOrder(product_id=product.id, name=product.name, quantity=1, unit_price=product.unit_price)
+                for product in products
+            ]
+        )
+        for _ in range(count)
+    ]
+
+
+def make_service(db: AsyncSession) -> OrderService:
+    return OrderService(OrderRepository(db), CustomerRepository(db), ProductRepository(db))
+
+
+async def bench(count: int):
+    async def timed(create):
+        engine, db = await make_session()
+        try:
+            orders = await make_orders(db, count)
+            start = time.perf_counter()
+            await create(make_service(db), orders)
+            return time.perf_counter() - start
+        finally:
+            await db.close()
+            await engine.dispose()
+
+    async def create_each(service, orders):
+        for order in orders:
+            await service.create_order(order)
+
+    async def create_bulk(service, orders):
+        results = await service.create_orders_bulk(orders)
+        assert all(result.success for result in results)
+
+    single = await timed(create_each)
+    bulk = await timed(create_bulk)
+
+    print(
+        f"{count:>6,} orders   single {single * 1e3:9.1f} ms"
+        f"   bulk {bulk * 1e3:9.1f} ms"
+        f"   speedup x{single / bulk:.2f}"
+    )
+
+
+async def main():
+    for count in (100, 1000, 5000):
+        await bench(count)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
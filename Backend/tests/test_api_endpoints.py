@@ -1,8 +1,23 @@
 """
 Integration tests for API endpoints.
 """
+import csv
+import io
+import json
 import pytest
+from datetime import datetime, timedelta
 from httpx import AsyncClient
+from sqlalchemy import delete, update
+from uuid import uuid4
+from app.controllers import order_controller, transition_controller
+from app.models.order_claim import OrderClaim
+from app.models.transition_log import TransitionLog
+from app.repositories.order_repository import OrderRepository
+from app.repositories.pagination import decode_change_cursor
+from app.repositories.transition_log_repository import TransitionLogRepository
+from app.repositories.rule_repository import get_rule_repository
+from app.services.event_broadcaster import get_event_broadcaster
+from app.services.rule_engine import Rule, RuleAction, RuleActionType, RuleCondition, RuleConditionType
 
 
 class TestMainEndpoint:
@@ -89,6 +104,81 @@ class TestOrderEndpoints:
         assert order["current_state"] == "pending"
         assert "products" in order
 
+    @pytest.mark.asyncio
+    async def test_create_order_snapshots_catalog_price(self, client: AsyncClient, sample_customer_data, sample_product_data):
+        """Test that order lines take the catalog price and unknown products are rejected."""
+        customer_resp = await client.post("/customers/", json=sample_customer_data)
+        customer_id = customer_resp.json()["id"]
+
+        product_resp = await client.post("/products/", json=sample_product_data)
+        product = product_resp.json()
+
+        order_data = {
+            "amount": 199.98,
+            "customer_id": customer_id,
+            "products": [{
+                "product_id": product["id"],
+                "name": product["name"],
+                "quantity": 2,
+                "unit_price": 1.0
+            }]
+        }
+
+        response = await client.post("/orders", json=order_data)
+        assert response.status_code == 201
+        lines = response.json()["products"]
+        assert len(lines) == 1
+        assert lines[0]["name"] == product["name"]
+        assert float(lines[0]["unit_price"]) == product["unit_price"]
+
+        stored = await client.get(f"/orders/{response.json()['id']}")
+        assert stored.json()["products"] == lines
+
+        order_data["products"][0]["product_id"] = "00000000-0000-0000-0000-000000000000"
+        response = await client.post("/orders", json=order_data)
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_create_orders_bulk(self, client: AsyncClient, sample_customer_data, sample_product_data, monkeypatch):
+        """Test bulk creation reports a result for every item."""
+        customer_resp = await client.post("/customers/", json=sample_customer_data)
+        customer_id = customer_resp.json()["id"]
+
+        product_resp = await client.post("/products/", json=sample_product_data)
+        product = product_resp.json()
+
+        line = {
+            "product_id": product["id"],
+            "name": product["name"],
+            "quantity": 1,
+            "unit_price": product["unit_price"]
+        }
+        payload = [
+            {"amount": 99.99, "customer_id": customer_id, "products": [line]},
+            {"amount": 99.99, "customer_id": "00000000-0000-0000-0000-000000000000", "products": [line]},
+            {"amount": 199.98, "customer_id": customer_id, "products": [{**line, "quantity": 2}]},
+            {"amount": 199.98, "customer_id": customer_id, "products": [line, line]},
+        ]
+
+        response = await client.post("/orders/bulk", json=payload)
+        assert response.status_code == 200
+        results = response.json()
+        assert [r["index"] for r in results] == [0, 1, 2, 3]
+        assert [r["success"] for r in results] == [True, False, True, False]
+        assert results[1]["error"] == "Customer not found"
+        assert results[3]["error"] == f"Product {product['id']} is listed more than once"
+
+        monkeypatch.setattr(order_controller, "MAX_BULK_ORDERS", 3)
+        too_many = await client.post("/orders/bulk", json=payload)
+        assert too_many.status_code == 400
+
+        order = await client.get(f"/orders/{results[2]['order_id']}")
+        assert order.status_code == 200
+        assert order.json()["products"][0]["quantity"] == 2
+
+        logs = await client.get(f"/orders/{results[0]['order_id']}/logs")
+        assert [log["action_taken"] for log in logs.json()] == ["create"]
+
     @pytest.mark.asyncio
     async def test_list_orders(self, client: AsyncClient):
         """Test listing all orders."""
@@ -96,6 +186,90 @@ class TestOrderEndpoints:
         assert response.status_code == 200
         assert isinstance(response.json(), list)
 
+    @pytest.mark.asyncio
+    async def test_list_orders_keyset_pagination(self, client: AsyncClient, sample_customer_data, sample_product_data):
+        """Test paging through orders with the next cursor and filtering by state."""
+        customer_resp = await client.post("/customers/", json=sample_customer_data)
+        customer_id = customer_resp.json()["id"]
+
+        product_resp = await client.post("/products/", json=sample_product_data)
+        product = product_resp.json()
+
+        created_ids = []
+        for _ in range(3):
+            order_resp = await client.post("/orders", json={
+                "amount": 99.99,
+                "customer_id": customer_id,
+                "products": [{
+                    "product_id": product["id"],
+                    "name": product["name"],
+                    "quantity": 1,
+                    "unit_price": product["unit_price"]
+                }]
+            })
+            created_ids.append(order_resp.json()["id"])
+
+        first_page = await client.get("/orders", params={"limit": 2})
+        assert first_page.status_code == 200
+        assert len(first_page.json()) == 2
+        next_cursor = first_page.headers["X-Next-Cursor"]
+
+        second_page = await client.get("/orders", params={"limit": 2, "cursor": next_cursor})
+        assert second_page.status_code == 200
+        assert len(second_page.json()) == 1
+        assert "X-Next-Cursor" not in second_page.headers
+
+        seen = [o["id"] for o in first_page.json() + second_page.json()]
+        assert sorted(seen) == sorted(created_ids)
+
+        default_page = await client.get("/orders")
+        assert sorted(o["id"] for o in default_page.json()) == sorted(created_ids)
+        assert "X-Next-Cursor" not in default_page.headers
+        assert (await client.get("/orders", params={"limit": 5000})).status_code == 422
+
+        filtered = await client.get("/orders", params={"current_state": "shipped"})
+        assert filtered.json() == []
+
+        invalid = await client.get("/orders", params={"cursor": "not-a-cursor"})
+        assert invalid.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_export_orders_ndjson_and_csv(self, client: AsyncClient, sample_customer_data, sample_product_data):
+        """Test streaming the export with line items and customer."""
+        customer_resp = await client.post("/customers/", json=sample_customer_data)
+        customer_id = customer_resp.json()["id"]
+
+        product_resp = await client.post("/products/", json=sample_product_data)
+        product = product_resp.json()
+
+        order_resp = await client.post("/orders", json={
+            "amount": 199.98,
+            "customer_id": customer_id,
+            "products": [{
+                "product_id": product["id"],
+                "name": product["name"],
+                "quantity": 2,
+                "unit_price": product["unit_price"]
+            }]
+        })
+        order_id = order_resp.json()["id"]
+
+        response = await client.get("/orders/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["id"] for line in lines] == [order_id]
+        assert lines[0]["customer"]["email"] == sample_customer_data["email"]
+        assert lines[0]["products"][0]["name"] == product["name"]
+        assert lines[0]["products"][0]["quantity"] == 2
+
+        response = await client.get("/orders/export", params={"format": "csv"})
+        assert response.status_code == 200
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0][0] == "order_id"
+        assert rows[1][0] == order_id
+        assert rows[1][9] == product["name"]
+
 
 class TestTransitionEndpoints:
     """Test state transition operations."""
@@ -134,6 +308,76 @@ class TestTransitionEndpoints:
         assert response.status_code == 200
         assert response.json()["current_state"] == "in_preparation"
 
+    @pytest.mark.asyncio
+    async def test_batch_transitions(self, client: AsyncClient, sample_customer_data, sample_product_data):
+        """Test batch transitions report a result per order."""
+        customer_resp = await client.post("/customers/", json=sample_customer_data)
+        customer_id = customer_resp.json()["id"]
+
+        product_resp = await client.post("/products/", json=sample_product_data)
+        product = product_resp.json()
+
+        line = {
+            "product_id": product["id"],
+            "name": product["name"],
+            "quantity": 1,
+            "unit_price": product["unit_price"]
+        }
+        created = await client.post("/orders/bulk", json=[
+            {"amount": 99.99, "customer_id": customer_id, "products": [line]}
+            for _ in range(3)
+        ])
+        order_ids = [r["order_id"] for r in created.json()]
+
+        response = await client.post("/orders/transitions:batch", json={"transitions": [
+            {"order_id": order_ids[0], "action": "start_preparation"},
+            {"order_id": order_ids[1], "action": "cancel", "cancellation_reason": "Out of stock"},
+            {"order_id": order_ids[2], "action": "deliver"},
+            {"order_id": "00000000-0000-0000-0000-000000000000", "action": "ship"},
+        ]})
+
+        assert response.status_code == 200
+        results = response.json()
+        assert [r["success"] for r in results] == [True, True, False, False]
+        assert results[0]["new_state"] == "in_preparation"
+        assert results[1]["new_state"] == "cancelled"
+        assert results[1]["rule_metadata"]["notification_sent"] is True
+        assert results[3]["error"] == "Order not found"
+
+        order = await client.get(f"/orders/{order_ids[0]}")
+        assert order.json()["current_state"] == "in_preparation"
+
+        untouched = await client.get(f"/orders/{order_ids[2]}")
+        assert untouched.json()["current_state"] == "pending"
+
+        ticket = await client.get(f"/tickets/order/{order_ids[1]}")
+        assert ticket.json()["cancellation_reason"] == "Out of stock"
+
+        logs = await client.get(f"/orders/{order_ids[0]}/logs")
+        assert [log["action_taken"] for log in logs.json()] == ["create", "start_preparation"]
+
+    @pytest.mark.asyncio
+    async def test_batch_transitions_write_in_chunks(
+        self, client: AsyncClient, sample_customer_data, sample_product_data, monkeypatch
+    ):
+        """Test a batch larger than one chunk is written completely, and oversized batches are rejected."""
+        monkeypatch.setattr(OrderRepository, "INSERT_CHUNK_SIZE", 2)
+        monkeypatch.setattr(TransitionLogRepository, "INSERT_CHUNK_SIZE", 2)
+        order_ids = await TestClaimEndpoints().create_orders(client, sample_customer_data, sample_product_data, 5)
+        transitions = [{"order_id": order_id, "action": "start_preparation"} for order_id in order_ids]
+
+        response = await client.post("/orders/transitions:batch", json={"transitions": transitions})
+        assert [r["success"] for r in response.json()] == [True] * 5
+        for order_id in order_ids:
+            logs = await client.get(f"/orders/{order_id}/logs")
+            assert [log["action_taken"] for log in logs.json()] == ["create", "start_preparation"]
+        changes = (await client.get("/orders/changes")).json()["changes"]
+        assert [c["current_state"] for c in changes] == ["in_preparation"] * 5
+
+        monkeypatch.setattr(transition_controller, "MAX_BATCH_TRANSITIONS", 4)
+        too_many = await client.post("/orders/transitions:batch", json={"transitions": transitions})
+        assert too_many.status_code == 400
+
     @pytest.mark.asyncio
     async def test_get_allowed_actions(self, client: AsyncClient, sample_customer_data, sample_product_data):
         """Test getting allowed actions for an order."""
@@ -166,6 +410,45 @@ class TestTransitionEndpoints:
         assert isinstance(actions, list)
         assert "start_preparation" in actions
 
+    @pytest.mark.asyncio
+    async def test_allowed_actions_respect_rules(self, client: AsyncClient, sample_customer_data, sample_product_data):
+        """Test actions the rules would block are not offered, one order or many."""
+        customer_resp = await client.post("/customers/", json=sample_customer_data)
+        customer_id = customer_resp.json()["id"]
+        product = (await client.post("/products/", json=sample_product_data)).json()
+
+        order_ids = []
+        for amount in (500.0, 1500.0):
+            order_resp = await client.post("/orders", json={
+                "amount": amount,
+                "current_state": "pending",
+                "customer_id": customer_id,
+                "products": [{
+                    "product_id": product["id"],
+                    "name": product["name"],
+                    "quantity": 1,
+                    "unit_price": amount
+                }]
+            })
+            order_ids.append(order_resp.json()["id"])
+
+        response = await client.get(f"/orders/{order_ids[1]}/allowed-actions")
+        assert response.status_code == 200
+        assert "start_preparation" not in response.json()
+        assert "submit_for_review" in response.json()
+
+        missing_id = str(uuid4())
+        response = await client.post("/orders/allowed-actions", json={"order_ids": order_ids + [missing_id]})
+        assert response.status_code == 200
+        results = response.json()
+        assert [r["order_id"] for r in results] == order_ids + [missing_id]
+        assert "start_preparation" in results[0]["allowed_actions"]
+        assert results[1]["allowed_actions"] == (await client.get(f"/orders/{order_ids[1]}/allowed-actions")).json()
+        assert results[2]["error"] == "Order not found"
+
+        too_many = await client.post("/orders/allowed-actions", json={"order_ids": [missing_id] * 1001})
+        assert too_many.status_code == 422
+
     @pytest.mark.asyncio
     async def test_get_logs(self, client: AsyncClient):
         """Test retrieving all logs."""
@@ -173,6 +456,36 @@ class TestTransitionEndpoints:
         assert response.status_code == 200
         assert isinstance(response.json(), list)
 
+    @pytest.mark.asyncio
+    async def test_logs_pagination_and_filters(self, client: AsyncClient, sample_customer_data, sample_product_data):
+        """Test walking the logs with the cursor, and filtering them."""
+        order_ids = await TestClaimEndpoints().create_orders(client, sample_customer_data, sample_product_data, 3)
+        await client.post(f"/orders/{order_ids[0]}/transition", json={"action": "start_preparation"})
+
+        seen = []
+        params = {"limit": 2}
+        while True:
+            page = await client.get("/orders/logs", params=params)
+            assert page.status_code == 200
+            seen.extend(page.json())
+            if "X-Next-Cursor" not in page.headers:
+                break
+            params["cursor"] = page.headers["X-Next-Cursor"]
+
+        assert len(seen) == 4
+        assert len({log["id"] for log in seen}) == 4
+        assert seen[0]["action_taken"] == "start_preparation"
+
+        created = await client.get("/orders/logs", params={"action": "create", "new_state": "pending"})
+        assert {log["order_id"] for log in created.json()} == set(order_ids)
+        by_order = await client.get("/orders/logs", params={"order_id": order_ids[0]})
+        assert [log["action_taken"] for log in by_order.json()] == ["start_preparation", "create"]
+        later = await client.get("/orders/logs", params={"transition_from": "2999-01-01T00:00:00"})
+        assert later.json() == []
+
+        invalid = await client.get("/orders/logs", params={"cursor": "not-a-cursor"})
+        assert invalid.status_code == 400
+
     @pytest.mark.asyncio
     async def test_cancel_order_creates_ticket(self, client: AsyncClient, sample_customer_data, sample_product_data):
         """Test that cancelling an order creates a ticket."""
@@ -228,3 +541,420 @@ class TestTicketEndpoints:
         assert response.status_code == 200
         assert isinstance(response.json(), list)
 
+
+class TestRuleEndpoints:
+    """Test rule set administration."""
+
+    @pytest.mark.asyncio
+    async def test_get_rules_version(self, client: AsyncClient):
+        """Test reporting the active rule set version."""
+        response = await client.get("/rules/version")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["version"] >= 1
+        assert body["rule_count"] > 0
+        assert body["checksum"]
+
+    @pytest.mark.asyncio
+    async def test_audit_rules(self, client: AsyncClient, sample_customer_data, sample_product_data):
+        """Test evaluating the rules over stored orders for a hypothetical action."""
+        customer_resp = await client.post("/customers/", json=sample_customer_data)
+        customer_id = customer_resp.json()["id"]
+
+        product_resp = await client.post("/products/", json=sample_product_data)
+        product = product_resp.json()
+
+        for amount in (500.0, 1500.0, 2000.0):
+            await client.post("/orders", json={
+                "amount": amount,
+                "customer_id": customer_id,
+                "products": [{
+                    "product_id": product["id"],
+                    "name": product["name"],
+                    "quantity": 1,
+                    "unit_price": product["unit_price"]
+                }]
+            })
+
+        response = await client.get("/rules/audit", params={"action": "start_preparation"})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["order_count"] == 3
+        assert body["blocked_count"] == 2
+        assert body["taxed_count"] == 2
+        assert body["total_tax"] == pytest.approx(3500.0 * 0.15)
+        assert body["rule_matches"] == {"rule_001": 2, "rule_003": 2, "rule_005": 0}
+
+    @pytest.mark.asyncio
+    async def test_backtest_rules(self, client: AsyncClient, sample_customer_data, sample_product_data):
+        """Test replaying logged transitions through candidate rules."""
+        customer_resp = await client.post("/customers/", json=sample_customer_data)
+        customer_id = customer_resp.json()["id"]
+
+        product_resp = await client.post("/products/", json=sample_product_data)
+        product = product_resp.json()
+
+        line = {
+            "product_id": product["id"],
+            "name": product["name"],
+            "quantity": 1,
+            "unit_price": product["unit_price"]
+        }
+        created = await client.post("/orders/bulk", json=[
+            {"amount": amount, "customer_id": customer_id, "products": [line]}
+            for amount in (500.0, 1500.0)
+        ])
+        order_ids = [r["order_id"] for r in created.json()]
+        await client.post("/orders/transitions:batch", json={"transitions": [
+            {"order_id": order_ids[0], "action": "start_preparation"},
+            {"order_id": order_ids[1], "action": "cancel", "cancellation_reason": "Out of stock"},
+        ]})
+
+        response = await client.post("/rules/backtest", json={"rule_ids": ["rule_003", "rule_005"]})
+        assert response.status_code == 200
+        events = [json.loads(line) for line in response.text.splitlines()]
+        result = events[-1]
+        assert result["type"] == "result"
+        assert result["rows"] == 2
+        assert {r["rule_id"]: r["matched"] for r in result["rules"]} == {"rule_003": 0, "rule_005": 1}
+
+        response = await client.post("/rules/backtest", json={"rule_ids": ["rule_999"]})
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_outcome_cache_stats(self, client: AsyncClient):
+        """Test reading and clearing the rule outcome cache."""
+        response = await client.delete("/rules/cache")
+        assert response.status_code == 200
+        assert response.json()["hits"] == 0
+        assert response.json()["size"] == 0
+
+        response = await client.get("/rules/cache")
+        assert response.status_code == 200
+        assert response.json()["max_size"] > 0
+
+    @pytest.mark.asyncio
+    async def test_rule_profile(self, client: AsyncClient, sample_customer_data, sample_product_data):
+        """Test enabling profiling and reading per-rule counters."""
+        customer_resp = await client.post("/customers/", json=sample_customer_data)
+        product_resp = await client.post("/products/", json=sample_product_data)
+        product = product_resp.json()
+        order_resp = await client.post("/orders", json={
+            "amount": 321.0,
+            "customer_id": customer_resp.json()["id"],
+            "products": [{
+                "product_id": product["id"],
+                "name": product["name"],
+                "quantity": 1,
+                "unit_price": product["unit_price"]
+            }]
+        })
+
+        await client.delete("/rules/cache")
+        await client.delete("/rules/profile")
+        response = await client.put("/rules/profile", params={"enabled": True})
+        assert response.json()["enabled"] is True
+        try:
+            await client.post(f"/orders/{order_resp.json()['id']}/transition", json={"action": "start_preparation"})
+            response = await client.get("/rules/profile")
+        finally:
+            await client.put("/rules/profile", params={"enabled": False})
+            await client.delete("/rules/profile")
+
+        assert response.status_code == 200
+        rules = {item["rule_id"]: item for item in response.json()["rules"]}
+        assert rules["rule_001"]["evaluations"] == 1
+        assert rules["rule_001"]["matches"] == 0
+        assert rules["rule_001"]["conditions"][0]["short_circuits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_rules_on_prefetched_facts(self, client: AsyncClient, sample_customer_data, sample_product_data):
+        """Test rules on customer history and product names, loaded with one query per provider."""
+        customer_resp = await client.post("/customers/", json=sample_customer_data)
+        customer_id = customer_resp.json()["id"]
+        product_resp = await client.post("/products/", json=sample_product_data)
+        product = product_resp.json()
+
+        line = {
+            "product_id": product["id"],
+            "name": product["name"],
+            "quantity": 1,
+            "unit_price": product["unit_price"]
+        }
+        created = await client.post("/orders/bulk", json=[
+            {"amount": 10.0 + i, "customer_id": customer_id, "products": [line]} for i in range(3)
+        ])
+        order_ids = [r["order_id"] for r in created.json()]
+        await client.post(
+            f"/orders/{order_ids[0]}/transition",
+            json={"action": "cancel", "cancellation_reason": "Changed mind"}
+        )
+
+        rule_repo = get_rule_repository()
+        rule_repo.add_rule(Rule(
+            id="test_prefetched_facts",
+            name="Repeat canceller buying the test product",
+            description="Uses customer history and product names",
+            event="order_transition",
+            conditions=[
+                RuleCondition(RuleConditionType.GREATER_THAN, "customer_cancelled_orders", 0),
+                RuleCondition(RuleConditionType.CONTAINS, "product_names", sample_product_data["name"]),
+            ],
+            actions=[RuleAction(RuleActionType.BLOCK_TRANSITION, {"reason": "Customer has cancelled before"})]
+        ))
+        try:
+            single = await client.post(f"/orders/{order_ids[1]}/transition", json={"action": "start_preparation"})
+            batch = await client.post("/orders/transitions:batch", json={"transitions": [
+                {"order_id": order_ids[2], "action": "start_preparation"}
+            ]})
+            audit = await client.get("/rules/audit", params={"action": "start_preparation"})
+            backtest = await client.post("/rules/backtest", json={"rule_ids": ["test_prefetched_facts"]})
+        finally:
+            rule_repo.delete_rule("test_prefetched_facts")
+
+        assert audit.status_code == 200
+        assert audit.json()["rule_matches"]["test_prefetched_facts"] == 3
+        result = json.loads(backtest.text.splitlines()[-1])
+        assert (result["rows"], result["rules"][0]["matched"]) == (1, 1)
+
+        assert single.status_code == 400
+        assert single.json()["detail"] == "Customer has cancelled before"
+        assert batch.json()[0]["error"] == "Customer has cancelled before"
+
+
+class TestClaimEndpoints:
+    """Test suite for the order claim queue."""
+
+    async def create_orders(self, client: AsyncClient, customer_data, product_data, count):
+        customer_id = (await client.post("/customers/", json=customer_data)).json()["id"]
+        product = (await client.post("/products/", json=product_data)).json()
+        line = {
+            "product_id": product["id"],
+            "name": product["name"],
+            "quantity": 1,
+            "unit_price": product["unit_price"]
+        }
+        created = await client.post("/orders/bulk", json=[
+            {"amount": 10.0 + i, "customer_id": customer_id, "products": [line]} for i in range(count)
+        ])
+        return [r["order_id"] for r in created.json()]
+
+    @pytest.mark.asyncio
+    async def test_claims_are_disjoint(self, client: AsyncClient, sample_customer_data, sample_product_data):
+        """Test concurrent workers get separate batches until leases are released."""
+        order_ids = await self.create_orders(client, sample_customer_data, sample_product_data, 5)
+
+        first = await client.post("/orders/claim?state=pending&limit=3&worker_id=w1")
+        second = await client.post("/orders/claim?state=pending&limit=3&worker_id=w2")
+        assert first.status_code == 200
+        first_ids = [order["id"] for order in first.json()["orders"]]
+        second_ids = [order["id"] for order in second.json()["orders"]]
+        assert len(first_ids) == 3 and len(second_ids) == 2
+        assert sorted(first_ids + second_ids) == sorted(order_ids)
+
+        empty = await client.post("/orders/claim?state=pending")
+        assert empty.json()["orders"] == []
+
+        lease_id = first.json()["lease_id"]
+        heartbeat = await client.post(f"/orders/claims/{lease_id}/heartbeat?lease_seconds=600")
+        assert heartbeat.status_code == 200
+        assert sorted(heartbeat.json()["order_ids"]) == sorted(first_ids)
+
+        release = await client.delete(f"/orders/claims/{lease_id}", params={"order_ids": first_ids[:1]})
+        assert release.status_code == 204
+        reclaimed = await client.post("/orders/claim?state=pending")
+        assert [order["id"] for order in reclaimed.json()["orders"]] == first_ids[:1]
+
+    @pytest.mark.asyncio
+    async def test_expired_leases_are_reclaimed(
+        self, client: AsyncClient, test_db_session, sample_customer_data, sample_product_data
+    ):
+        """Test orders return to the queue once their lease expires, and the old lease is gone."""
+        await self.create_orders(client, sample_customer_data, sample_product_data, 2)
+        first = (await client.post("/orders/claim?state=pending")).json()
+
+        await test_db_session.execute(
+            update(OrderClaim).values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        await test_db_session.commit()
+
+        assert (await client.post(f"/orders/claims/{first['lease_id']}/heartbeat")).status_code == 404
+        second = (await client.post("/orders/claim?state=pending")).json()
+        assert len(second["orders"]) == 2
+        assert second["lease_id"] != first["lease_id"]
+
+    @pytest.mark.asyncio
+    async def test_claim_invalid_state(self, client: AsyncClient):
+        """Test claiming an unknown state is rejected."""
+        response = await client.post("/orders/claim?state=lost")
+        assert response.status_code == 400
+
+
+class TestSchedulerEndpoints:
+    """Test suite for scheduled transitions."""
+
+    @pytest.mark.asyncio
+    async def test_state_entries_follow_transitions(
+        self, client: AsyncClient, test_db_session, sample_customer_data, sample_product_data
+    ):
+        """Test the scheduler load sees each order in its current state since its last transition."""
+        order_ids = await TestClaimEndpoints().create_orders(client, sample_customer_data, sample_product_data, 2)
+        await client.post(f"/orders/{order_ids[0]}/transition", json={"action": "submit_for_review"})
+
+        entries = []
+        async for chunk in OrderRepository(test_db_session).stream_state_entries(["pending", "review"]):
+            entries.extend(chunk)
+
+        states = {str(order_id): state for order_id, state, _ in entries}
+        assert states == {order_ids[0]: "review", order_ids[1]: "pending"}
+        entered = {str(order_id): entered_at for order_id, _, entered_at in entries}
+        assert entered[order_ids[0]] > entered[order_ids[1]]
+
+    @pytest.mark.asyncio
+    async def test_scheduler_status(self, client: AsyncClient):
+        """Test the status lists the configured policies."""
+        response = await client.get("/scheduler")
+        assert response.status_code == 200
+        assert {policy["name"] for policy in response.json()["policies"]} == {"auto_cancel_pending", "stuck_in_review"}
+        assert (await client.get("/scheduler/stuck")).json() == []
+
+
+class TestEventEndpoints:
+    """Test suite for the live feed."""
+
+    @pytest.mark.asyncio
+    async def test_committed_changes_are_published(self, client: AsyncClient, sample_customer_data, sample_product_data):
+        """Test order creation and transitions reach feed subscribers."""
+        broadcaster = get_event_broadcaster()
+        subscription = broadcaster.subscribe()
+        try:
+            order_ids = await TestClaimEndpoints().create_orders(client, sample_customer_data, sample_product_data, 2)
+            await client.post(f"/orders/{order_ids[0]}/transition", json={"action": "start_preparation"})
+            await client.post("/orders/transitions:batch", json={"transitions": [
+                {"order_id": order_ids[1], "action": "cancel", "cancellation_reason": "Changed mind"}
+            ]})
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+        events = []
+        while not subscription.queue.empty():
+            frame = subscription.queue.get_nowait()
+            event_type = frame.split("\n")[1].removeprefix("event: ")
+            events.append((event_type, json.loads(frame.split("\n")[2].removeprefix("data: "))))
+
+        assert [event_type for event_type, _ in events] == ["order_created", "order_created", "transition", "transition"]
+        assert [data["id"] for _, data in events[:2]] == order_ids
+        assert events[2][1]["order_id"] == order_ids[0]
+        assert events[2][1]["new_state"] == "in_preparation"
+        assert datetime.fromisoformat(events[2][1]["transition_date"])
+        assert events[3][1]["action_taken"] == "cancel"
+
+        logs = (await client.get("/orders/logs", params={"order_id": order_ids[0], "limit": 1})).json()
+        assert events[2][1]["id"] == logs[0]["id"]
+
+
+class TestOrderChangesEndpoint:
+    """Test suite for the order change feed."""
+
+    @pytest.mark.asyncio
+    async def test_sync_cycle(self, client: AsyncClient, test_db_session, sample_customer_data, sample_product_data):
+        """Test a client catches up in pages, then only sees what changed since its cursor."""
+        order_ids = await TestClaimEndpoints().create_orders(client, sample_customer_data, sample_product_data, 3)
+
+        first = (await client.get("/orders/changes", params={"limit": 2})).json()
+        assert first["has_more"] is True
+        second = (await client.get("/orders/changes", params={"since": first["cursor"], "limit": 2})).json()
+        assert [c["order_id"] for c in first["changes"] + second["changes"]] == order_ids
+        assert all(c["change_type"] == "created" and c["order"]["id"] == c["order_id"] for c in first["changes"])
+        cursor = second["cursor"]
+
+        idle = (await client.get("/orders/changes", params={"since": cursor})).json()
+        assert idle == {"changes": [], "cursor": cursor, "has_more": False}
+        assert await OrderRepository(test_db_session).get_changes_head() == decode_change_cursor(cursor)
+
+        await client.post(f"/orders/{order_ids[0]}/transition", json={"action": "submit_for_review"})
+        await client.post(f"/orders/{order_ids[0]}/transition", json={"action": "approve"})
+        await client.post("/orders/transitions:batch", json={"transitions": [
+            {"order_id": order_ids[1], "action": "start_preparation"}
+        ]})
+        await client.delete(f"/orders/{order_ids[2]}")
+
+        delta = (await client.get("/orders/changes", params={"since": cursor})).json()
+        changes = {c["order_id"]: c for c in delta["changes"]}
+        assert list(changes) == order_ids
+        assert changes[order_ids[0]]["current_state"] == "in_preparation"
+        assert changes[order_ids[0]]["order"]["current_state"] == "in_preparation"
+        assert changes[order_ids[1]]["change_type"] == "transitioned"
+        assert changes[order_ids[2]]["change_type"] == "deleted"
+        assert changes[order_ids[2]]["order"] is None
+        assert decode_change_cursor(delta["cursor"]) > decode_change_cursor(cursor)
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self, client: AsyncClient):
+        """Test a malformed cursor is rejected."""
+        response = await client.get("/orders/changes", params={"since": "abc"})
+        assert response.status_code == 400
+
+
+class TestOrderHistoryEndpoints:
+    """Test suite for point-in-time order states."""
+
+    @pytest.mark.asyncio
+    async def test_states_as_of_replay_from_snapshot(self, client: AsyncClient, test_db_session):
+        """Test states at past timestamps, before and after a snapshot replaces the older history."""
+        first, second, third = uuid4(), uuid4(), uuid4()
+        history = [
+            (first, None, "pending", "create", datetime(2024, 1, 1)),
+            (first, "pending", "in_preparation", "start_preparation", datetime(2024, 1, 10)),
+            (second, None, "pending", "create", datetime(2024, 1, 20)),
+            (second, "pending", "cancelled", "cancel", datetime(2024, 2, 2)),
+            (first, "in_preparation", "shipped", "ship", datetime(2024, 2, 5)),
+            (third, None, "pending", "create", datetime(2024, 2, 10)),
+        ]
+        test_db_session.add_all([
+            TransitionLog(
+                order_id=order_id,
+                previous_state=previous_state,
+                new_state=new_state,
+                action_taken=action,
+                transition_date=at
+            )
+            for order_id, previous_state, new_state, action, at in history
+        ])
+        await test_db_session.commit()
+
+        async def states_at(ts, order_ids=(first, second, third)):
+            response = await client.post("/orders/as-of", json={"ts": ts, "order_ids": [str(i) for i in order_ids]})
+            assert response.status_code == 200
+            return [result["state"] for result in response.json()]
+
+        assert await states_at("2024-01-31T00:00:00") == ["in_preparation", "pending", None]
+        assert await states_at("2024-01-31T00:00:00Z") == ["in_preparation", "pending", None]
+
+        snapshot = await client.post("/orders/as-of/snapshots", params={"ts": "2024-01-31T00:00:00"})
+        assert snapshot.status_code == 201
+        assert snapshot.json()["orders"] == 2
+        duplicate = await client.post("/orders/as-of/snapshots", params={"ts": "2024-01-31T00:00:00"})
+        assert duplicate.status_code == 409
+        future = await client.post("/orders/as-of/snapshots", params={"ts": (datetime.utcnow() + timedelta(minutes=1)).isoformat()})
+        assert future.status_code == 400
+
+        # From now on the January logs are not needed: queries replay from the snapshot
+        await test_db_session.execute(delete(TransitionLog).where(TransitionLog.transition_date < datetime(2024, 1, 31)))
+        await test_db_session.commit()
+
+        assert await states_at("2024-02-03T00:00:00") == ["in_preparation", "cancelled", None]
+        assert await states_at("2024-02-28T00:00:00") == ["shipped", "cancelled", "pending"]
+
+        single = await client.get(f"/orders/{second}/as-of", params={"ts": "2024-01-31T12:00:00"})
+        assert single.json() == {"order_id": str(second), "state": "pending"}
+        missing = await client.get(f"/orders/{third}/as-of", params={"ts": "2024-01-31T12:00:00"})
+        assert missing.status_code == 404
+
+        report = await client.get("/orders/as-of", params={"ts": "2024-02-28T00:00:00"})
+        lines = [json.loads(line) for line in report.text.splitlines()]
+        assert {line["order_id"]: line["state"] for line in lines} == {
+            str(first): "shipped", str(second): "cancelled", str(third): "pending"
+        }
+        pending = await client.get("/orders/as-of", params={"ts": "2024-02-28T00:00:00", "state": "pending"})
+        assert [json.loads(line)["order_id"] for line in pending.text.splitlines()] == [str(third)]
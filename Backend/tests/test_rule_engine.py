@@ -1,6 +1,19 @@
+import random
 import pytest
 from app.repositories.rule_repository import RuleRepository
-from app.services.rule_engine import RuleEngine, RuleActionType
+from app.services.batch_rule_evaluator import BatchRuleEvaluator, OrderFacts
+from app.services.fact_context import FactContext, FactRegistry, default_fact_registry
+from app.services.rule_outcome_cache import RuleOutcomeCache
+from app.services.rule_profiler import RuleProfiler, recommend_condition_order
+from app.services.velocity_counters import VelocityCounters, get_velocity_counters
+from app.services.rule_engine import (
+    RuleEngine,
+    RuleActionType,
+    Rule,
+    RuleAction,
+    RuleCondition,
+    RuleConditionType
+)
 
 
 class MockOrder:
@@ -260,5 +273,723 @@ class TestRuleConditionEvaluation:
         assert result is True
 
 
+def make_random_condition(rng, depth=0):
+    """Builds a random condition over the fields the engine knows about"""
+    if depth < 2 and rng.random() < 0.2:
+        return RuleCondition(
+            condition_type=rng.choice([RuleConditionType.AND, RuleConditionType.OR]),
+            field="amount",
+            value=None,
+            sub_conditions=[make_random_condition(rng, depth + 1) for _ in range(rng.randint(1, 3))]
+        )
+
+    kind = rng.choice(["amount", "total_products", "action", "current_state", "has_high_value_product", "customer.name"])
+    if kind in ("amount", "total_products"):
+        return RuleCondition(
+            condition_type=rng.choice([RuleConditionType.GREATER_THAN, RuleConditionType.LESS_THAN]),
+            field=kind,
+            value=rng.choice([1, 5, 100.0, 500.0, 1000.0])
+        )
+    if kind in ("action", "current_state"):
+        values = ["pending", "review", "cancel", "approve", "start_preparation", "ship"]
+        if rng.random() < 0.5:
+            return RuleCondition(condition_type=RuleConditionType.EQUALS, field=kind, value=rng.choice(values))
+        return RuleCondition(condition_type=RuleConditionType.IN_LIST, field=kind, value=rng.sample(values, 2))
+    if kind == "customer.name":
+        return RuleCondition(condition_type=RuleConditionType.CONTAINS, field=kind, value=rng.choice(["Jo", "Ann"]))
+    return RuleCondition(condition_type=RuleConditionType.EQUALS, field=kind, value=rng.random() < 0.5)
+
+
+def make_random_rules(count, seed=7):
+    """Builds a deterministic synthetic rule set"""
+    rng = random.Random(seed)
+    return [
+        Rule(
+            id=f"synthetic_{i}",
+            name=f"Synthetic {i}",
+            description="Generated for equivalence tests",
+            event="order_transition",
+            conditions=[make_random_condition(rng) for _ in range(rng.randint(0, 3))],
+            actions=[RuleAction(
+                action_type=RuleActionType.ADD_METADATA,
+                parameters={"data": {f"synthetic_{i}": True}},
+                priority=rng.randint(0, 5)
+            )],
+            priority=rng.randint(0, 5)
+        )
+        for i in range(count)
+    ]
+
+
+def make_random_orders(count, seed=11):
+    """Builds orders with customers and a varying number of products"""
+    rng = random.Random(seed)
+
+    class MockCustomer:
+        def __init__(self, name):
+            self.name = name
+
+    orders = []
+    for _ in range(count):
+        products = [MockProduct(f"p{i}", rng.choice([50.0, 200.0, 600.0])) for i in range(rng.randint(0, 12))]
+        order = MockOrder(
+            amount=rng.choice([50.0, 500.0, 1000.0, 1500.0]),
+            current_state=rng.choice(["pending", "review", "in_preparation", "shipped"]),
+            order_products=products
+        )
+        order.customer = MockCustomer(rng.choice(["John", "Joanna", "Annie"]))
+        orders.append(order)
+    return orders
+
+
+class TestFactContext:
+    """Tests for per-evaluation fact resolution"""
+
+    def test_derived_fact_computed_once(self):
+        """Test: a fact read by ten conditions across rules is computed once per evaluation"""
+        calls = []
+        registry = FactRegistry()
+        registry.register("line_count", lambda order: calls.append(order) or len(order.order_products))
+
+        rule_repo = RuleRepository()
+        for i in range(10):
+            rule_repo.add_rule(Rule(
+                id=f"line_count_{i}",
+                name=f"Line count {i}",
+                description="Reads line_count",
+                event="order_transition",
+                conditions=[RuleCondition(condition_type=RuleConditionType.GREATER_THAN, field="line_count", value=i)],
+                actions=[RuleAction(action_type=RuleActionType.ADD_METADATA, parameters={"data": {f"over_{i}": True}})]
+            ))
+
+        order = MockOrder(amount=100.0, current_state="pending", order_products=[MockProduct("p1", 10.0)] * 3)
+        actions = RuleEngine(rule_repo, fact_registry=registry).evaluate(order, event="order_transition", action="approve")
+
+        assert [a.parameters["data"] for a in actions[-3:]] == [{"over_0": True}, {"over_1": True}, {"over_2": True}]
+        assert len(calls) == 1
+
+    def test_registered_provider_used_by_both_paths(self):
+        """Test: a new fact is available without touching the engine"""
+        registry = FactRegistry()
+        registry.register("is_bulk", lambda order: len(order.order_products) >= 2)
+        rule_engine = RuleEngine(RuleRepository(), fact_registry=registry)
+        condition = RuleCondition(condition_type=RuleConditionType.EQUALS, field="is_bulk", value=True)
+
+        order = MockOrder(amount=100.0, current_state="pending", order_products=[MockProduct("p1", 10.0)] * 2)
+        assert rule_engine._evaluate_single_condition(order, condition, None) is True
+        assert rule_engine._get_field_value(order, "is_bulk") is True
+        assert rule_engine._get_field_value(order, "total_products") is None
+
+    def test_attribute_takes_precedence_over_provider(self):
+        """Test: a value carried by the order wins over the derived fact"""
+        order = MockOrder(amount=100.0, current_state="pending")
+        order.total_products = 42
+        assert FactContext(order).get("total_products") == 42
+        assert "total_products" in default_fact_registry
+
+
+class TestCompiledRules:
+    """The compiled evaluation path must agree with the interpreter"""
+
+    ACTIONS = ["start_preparation", "approve", "cancel", "ship", "submit_for_review"]
+
+    def assert_equivalent(self, rule_engine, orders):
+        for order in orders:
+            for action in self.ACTIONS:
+                compiled = rule_engine.evaluate(order, event="order_transition", action=action)
+                interpreted = rule_engine.evaluate_interpreted(order, event="order_transition", action=action)
+                assert compiled == interpreted
+
+    def test_default_rules_match_interpreter(self):
+        """Test: rule_001/rule_003/rule_005 give the same actions compiled and interpreted"""
+        rule_engine = RuleEngine(RuleRepository())
+        self.assert_equivalent(rule_engine, make_random_orders(50))
+
+    def test_synthetic_rules_match_interpreter(self):
+        """Test: a synthetic set of 1,000 rules gives the same actions compiled and interpreted"""
+        rule_repo = RuleRepository()
+        for rule in make_random_rules(1000):
+            rule_repo.add_rule(rule)
+
+        self.assert_equivalent(RuleEngine(rule_repo), make_random_orders(20))
+
+    def test_rule_changes_are_recompiled(self):
+        """Test: updated and deleted rules are reflected in the compiled set"""
+        rule_repo = RuleRepository()
+        rule_engine = RuleEngine(rule_repo)
+        order = MockOrder(amount=500.0, current_state="pending")
+
+        rule = rule_repo.get_rule_by_id("rule_005")
+        rule_repo.update_rule("rule_005", Rule(
+            id="rule_005",
+            name=rule.name,
+            description=rule.description,
+            event=rule.event,
+            conditions=[RuleCondition(condition_type=RuleConditionType.EQUALS, field="action", value="ship")],
+            actions=rule.actions,
+            priority=rule.priority
+        ))
+        assert rule_engine.evaluate(order, event="order_transition", action="cancel") == []
+        assert rule_engine.evaluate(order, event="order_transition", action="ship") == rule.actions
+
+        rule_repo.delete_rule("rule_005")
+        assert rule_engine.evaluate(order, event="order_transition", action="ship") == []
+
+
+class TestRuleIndex:
+    """Tests for candidate rule lookup by event, action and state"""
+
+    def setup_method(self):
+        self.rule_repo = RuleRepository()
+
+    def candidate_ids(self, action, current_state):
+        return [
+            compiled.rule.id
+            for compiled in self.rule_repo.get_candidate_rules("order_transition", action, current_state)
+        ]
+
+    def test_candidates_follow_action_and_state_pins(self):
+        """Test: only rules whose action/state conditions allow the key are candidates"""
+        assert self.candidate_ids("start_preparation", "pending") == ["rule_001", "rule_003"]
+        assert self.candidate_ids("start_preparation", "review") == ["rule_003"]
+        assert self.candidate_ids("approve", "review") == ["rule_003"]
+        assert self.candidate_ids("cancel", "shipped") == ["rule_005"]
+        assert self.candidate_ids("ship", "in_preparation") == []
+        assert self.rule_repo.get_candidate_rules("unknown_event", "cancel", "pending") == []
+
+    def test_index_rebuilt_on_rule_changes(self):
+        """Test: toggle, add and delete are reflected in the candidates"""
+        self.rule_repo.toggle_rule("rule_005", False)
+        assert self.candidate_ids("cancel", "pending") == []
+
+        self.rule_repo.toggle_rule("rule_005", True)
+        assert self.candidate_ids("cancel", "pending") == ["rule_005"]
+
+        self.rule_repo.add_rule(Rule(
+            id="rule_ship",
+            name="Ship any state",
+            description="Pinned through a nested AND",
+            event="order_transition",
+            conditions=[RuleCondition(
+                condition_type=RuleConditionType.AND,
+                field="action",
+                value=None,
+                sub_conditions=[
+                    RuleCondition(condition_type=RuleConditionType.EQUALS, field="action", value="ship"),
+                    RuleCondition(condition_type=RuleConditionType.GREATER_THAN, field="amount", value=0)
+                ]
+            )],
+            actions=[]
+        ))
+        assert self.candidate_ids("ship", "in_preparation") == ["rule_ship"]
+        assert self.candidate_ids("cancel", "in_preparation") == ["rule_005"]
+
+        self.rule_repo.delete_rule("rule_ship")
+        assert self.candidate_ids("ship", "in_preparation") == []
+
+    def test_unpinned_rules_are_always_candidates(self):
+        """Test: rules with OR or non-indexed conditions are never filtered out"""
+        self.rule_repo.add_rule(Rule(
+            id="rule_or",
+            name="Either action",
+            description="OR groups are not indexed",
+            event="order_transition",
+            conditions=[RuleCondition(
+                condition_type=RuleConditionType.OR,
+                field="action",
+                value=None,
+                sub_conditions=[
+                    RuleCondition(condition_type=RuleConditionType.EQUALS, field="action", value="ship"),
+                    RuleCondition(condition_type=RuleConditionType.EQUALS, field="action", value="deliver")
+                ]
+            )],
+            actions=[]
+        ))
+        assert "rule_or" in self.candidate_ids("approve", "review")
+
+
+class TestBatchRuleEvaluator:
+    """The vectorized evaluator must give the scalar engine's outcome for every order"""
+
+    ACTIONS = ["start_preparation", "approve", "cancel", "ship", "submit_for_review"]
+
+    def make_rules(self, count, seed=3):
+        rng = random.Random(seed)
+        rules = make_random_rules(count)
+        for rule in rules:
+            kind = rng.choice([RuleActionType.CALCULATE_TAX, RuleActionType.BLOCK_TRANSITION,
+                               RuleActionType.REQUIRE_REVIEW, RuleActionType.SEND_NOTIFICATION])
+            parameters = {"rate": rng.choice([0.05, 0.15, 0.21])} if kind == RuleActionType.CALCULATE_TAX \
+                else {"reason": f"{rule.id} blocked"}
+            rule.actions.append(RuleAction(action_type=kind, parameters=parameters, priority=rng.randint(0, 5)))
+        return rules
+
+    def assert_matches_scalar(self, rule_repo, orders, action):
+        rule_engine = RuleEngine(rule_repo)
+        facts = OrderFacts.from_orders(orders, action=action, extra_fields=["customer.name"])
+        result = BatchRuleEvaluator(rule_repo).evaluate(facts)
+
+        for row, order in enumerate(orders):
+            row_action = action if isinstance(action, str) else action[row]
+            actions = rule_engine.evaluate(order, event="order_transition", action=row_action)
+            assert result.outcome(row) == rule_engine.execute_actions(actions, order, {})
+
+    def test_default_rules_match_scalar_engine(self):
+        """Test: rule_001/rule_003/rule_005 give the same per-order outcome vectorized"""
+        rule_repo = RuleRepository()
+        orders = make_random_orders(200)
+        for action in self.ACTIONS:
+            self.assert_matches_scalar(rule_repo, orders, action)
+
+    def test_synthetic_rules_match_scalar_engine(self):
+        """Test: 300 synthetic rules with tax and blocking actions agree, with one action per order"""
+        rule_repo = RuleRepository()
+        for rule in self.make_rules(300):
+            rule_repo.add_rule(rule)
+
+        orders = make_random_orders(100)
+        rng = random.Random(5)
+        self.assert_matches_scalar(rule_repo, orders, [rng.choice(self.ACTIONS) for _ in orders])
+
+    def test_matched_matrix_and_totals(self):
+        """Test: the matched matrix has one column per enabled rule and tax applies per row"""
+        rule_repo = RuleRepository()
+        orders = [MockOrder(amount=1500.0, current_state="pending"), MockOrder(amount=500.0, current_state="pending")]
+
+        result = BatchRuleEvaluator(rule_repo).evaluate(OrderFacts.from_orders(orders, action="start_preparation"))
+
+        assert [rule.id for rule in result.rules] == ["rule_001", "rule_003", "rule_005"]
+        assert result.matched.tolist() == [[True, True, False], [False, False, False]]
+        assert result.blocked.tolist() == [True, False]
+        assert result.tax_amount.tolist() == [1500.0 * 0.15, 0.0]
+        assert result.total_with_tax.tolist() == [1500.0 + 1500.0 * 0.15, 500.0]
+
+    def test_empty_facts(self):
+        """Test: no orders gives empty results"""
+        result = BatchRuleEvaluator(RuleRepository()).evaluate(OrderFacts.from_fact_rows([], action="approve"))
+        assert result.matched.shape == (0, 3)
+        assert not result.blocked.any()
+
+
+class TestRuleOutcomeCache:
+    """Tests for memoized rule outcomes"""
+
+    ACTIONS = ["start_preparation", "approve", "cancel", "ship"]
+
+    def test_cached_outcomes_match_uncached(self):
+        """Test: outcomes are the same with and without the cache, and repeats are hits"""
+        rule_repo = RuleRepository()
+        for rule in TestBatchRuleEvaluator().make_rules(200):
+            rule_repo.add_rule(rule)
+        cache = RuleOutcomeCache(max_size=10000)
+        cached_engine = RuleEngine(rule_repo, outcome_cache=cache)
+        plain_engine = RuleEngine(rule_repo)
+
+        orders = make_random_orders(50)
+        for _ in range(2):
+            for order in orders:
+                for action in self.ACTIONS:
+                    assert cached_engine.evaluate_outcome(order, "order_transition", action) == \
+                        plain_engine.evaluate_outcome(order, "order_transition", action)
+
+        assert cache.misses <= len(orders) * len(self.ACTIONS)
+        assert cache.hits >= len(orders) * len(self.ACTIONS)
+
+    def test_key_ignores_fields_no_rule_reads(self):
+        """Test: orders that differ only in unread fields share an entry"""
+        cache = RuleOutcomeCache()
+        rule_engine = RuleEngine(RuleRepository(), outcome_cache=cache)
+
+        first = MockOrder(amount=1500.0, current_state="pending", order_products=[MockProduct("p1", 10.0)])
+        second = MockOrder(amount=1500.0, current_state="pending", order_products=[MockProduct("p2", 900.0)] * 4)
+        outcome = rule_engine.evaluate_outcome(first, "order_transition", "approve")
+        assert rule_engine.evaluate_outcome(second, "order_transition", "approve") == outcome
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        # amount feeds the tax calculation, so it is part of the key
+        rule_engine.evaluate_outcome(MockOrder(amount=1600.0, current_state="pending"), "order_transition", "approve")
+        assert cache.misses == 2
+
+    def test_rule_change_invalidates(self):
+        """Test: a new rule snapshot is never served outcomes of the previous one"""
+        rule_repo = RuleRepository()
+        cache = RuleOutcomeCache()
+        rule_engine = RuleEngine(rule_repo, outcome_cache=cache)
+        order = MockOrder(amount=1500.0, current_state="pending")
+
+        assert rule_engine.evaluate_outcome(order, "order_transition", "start_preparation")["blocked"] is True
+        rule_repo.toggle_rule("rule_001", False)
+        assert rule_engine.evaluate_outcome(order, "order_transition", "start_preparation")["blocked"] is False
+        assert cache.stats()["size"] == 1
+        assert cache.stats()["rules_version"] == rule_repo.version
+
+    def test_lru_eviction_and_copies(self):
+        """Test: the cache stays bounded and callers cannot mutate cached outcomes"""
+        cache = RuleOutcomeCache(max_size=2)
+        rule_engine = RuleEngine(RuleRepository(), outcome_cache=cache)
+
+        for amount in (1100.0, 1200.0, 1300.0):
+            outcome = rule_engine.evaluate_outcome(MockOrder(amount=amount, current_state="pending"), "order_transition", "approve")
+            outcome["calculations"]["tax"]["rate"] = 0
+        assert cache.stats()["size"] == 2
+
+        outcome = rule_engine.evaluate_outcome(MockOrder(amount=1300.0, current_state="pending"), "order_transition", "approve")
+        assert outcome["calculations"]["tax"]["rate"] == 0.15
+        assert cache.hits == 1
+
+
+class TestShortCircuitEvaluation:
+    """Tests for priority-tiered evaluation that stops at the first blocking tier"""
+
+    ACTIONS = ["start_preparation", "approve", "cancel", "ship"]
+
+    def test_blocked_flag_matches_full_evaluation(self):
+        """Test: short-circuit and full evaluation always agree on whether a transition is blocked"""
+        rule_repo = RuleRepository()
+        for rule in TestBatchRuleEvaluator().make_rules(300):
+            rule_repo.add_rule(rule)
+        full = RuleEngine(rule_repo)
+        short = RuleEngine(rule_repo, short_circuit=True)
+
+        for order in make_random_orders(50):
+            for action in self.ACTIONS:
+                full_outcome = full.evaluate_outcome(order, "order_transition", action)
+                short_outcome = short.evaluate_outcome(order, "order_transition", action)
+                assert short_outcome["blocked"] == full_outcome["blocked"]
+                if not full_outcome["blocked"]:
+                    assert short_outcome == full_outcome
+
+    def test_stops_after_blocking_tier(self):
+        """Test: rules in lower-priority tiers are not evaluated once a blocker fired"""
+        probes = []
+        registry = FactRegistry()
+        rule_repo = RuleRepository()
+        rule_repo.add_rule(Rule(
+            id="early_block",
+            name="Early block",
+            description="Blocks large orders first",
+            event="order_transition",
+            conditions=[RuleCondition(condition_type=RuleConditionType.GREATER_THAN, field="amount", value=100.0)],
+            actions=[
+                RuleAction(action_type=RuleActionType.BLOCK_TRANSITION, parameters={"reason": "Too large"}),
+                RuleAction(action_type=RuleActionType.ADD_METADATA, parameters={"data": {"early": True}}, priority=1)
+            ],
+            priority=-1
+        ))
+        for i in range(50):
+            registry.register(f"probe_{i}", lambda order, i=i: probes.append(i) or True)
+            rule_repo.add_rule(Rule(
+                id=f"late_{i}",
+                name=f"Late {i}",
+                description="Reads a probe",
+                event="order_transition",
+                conditions=[RuleCondition(condition_type=RuleConditionType.EQUALS, field=f"probe_{i}", value=True)],
+                actions=[RuleAction(action_type=RuleActionType.ADD_METADATA, parameters={"data": {f"late_{i}": True}})],
+                priority=5
+            ))
+
+        rule_engine = RuleEngine(rule_repo, fact_registry=registry, short_circuit=True)
+        order = MockOrder(amount=500.0, current_state="pending")
+        outcome = rule_engine.execute_actions(rule_engine.evaluate(order, "order_transition", "approve"), order, {})
+
+        assert outcome["blocked"] is True
+        assert outcome["block_reason"] == "Too large"
+        assert outcome["metadata"] == {"early": True}
+        assert probes == []
+
+        small = MockOrder(amount=50.0, current_state="pending")
+        actions = rule_engine.evaluate(small, "order_transition", "approve")
+        assert len(actions) == 50
+        assert len(probes) == 50
+
+
+class TestRuleProfiler:
+    """Tests for rule and condition profiling"""
+
+    def test_profiling_counts_without_changing_results(self):
+        """Test: profiled evaluation returns the same actions and counts rules and conditions"""
+        rule_repo = RuleRepository()
+        profiler = RuleProfiler(enabled=True)
+        profiled = RuleEngine(rule_repo, profiler=profiler)
+        plain = RuleEngine(rule_repo)
+
+        orders = [MockOrder(amount=amount, current_state="pending") for amount in (500.0, 1500.0, 2000.0)]
+        for order in orders:
+            for action in ("start_preparation", "approve"):
+                assert profiled.evaluate(order, "order_transition", action) == \
+                    plain.evaluate(order, "order_transition", action)
+                assert profiled.evaluate_interpreted(order, "order_transition", action) == \
+                    plain.evaluate(order, "order_transition", action)
+
+        report = {item["rule_id"]: item for item in profiler.report()}
+        rule_003 = report["rule_003"]
+        assert rule_003["evaluations"] == 12
+        assert rule_003["matches"] == 8
+        amount_condition, action_condition = rule_003["conditions"]
+        assert (amount_condition["evaluations"], amount_condition["short_circuits"]) == (12, 4)
+        assert (action_condition["evaluations"], action_condition["passed"]) == (8, 8)
+        assert amount_condition["condition"] == "amount greater_than 1000.0"
+        assert sum(rule_003["histogram"].values()) == 12
+
+    def test_disabled_profiler_records_nothing(self):
+        """Test: a disabled profiler is never called"""
+        profiler = RuleProfiler(enabled=False)
+        rule_engine = RuleEngine(RuleRepository(), profiler=profiler)
+        rule_engine.evaluate(MockOrder(amount=1500.0, current_state="pending"), "order_transition", "approve")
+        assert profiler.report() == []
+
+    def test_nested_conditions_edits_and_cache_hits(self):
+        """Test: AND/OR members are counted, edits start over and cached outcomes count as cache hits"""
+        rule_repo = RuleRepository()
+        profiler = RuleProfiler(enabled=True)
+        rule_engine = RuleEngine(rule_repo, outcome_cache=RuleOutcomeCache(), profiler=profiler)
+        rule = rule_repo.get_rule_by_id("rule_005")
+        rule_repo.update_rule("rule_005", Rule(
+            id="rule_005",
+            name=rule.name,
+            description=rule.description,
+            event=rule.event,
+            conditions=[RuleCondition(
+                condition_type=RuleConditionType.OR,
+                field="",
+                value=None,
+                sub_conditions=[
+                    RuleCondition(condition_type=RuleConditionType.EQUALS, field="action", value="cancel"),
+                    RuleCondition(condition_type=RuleConditionType.GREATER_THAN, field="amount", value=100.0),
+                ]
+            )],
+            actions=rule.actions,
+            priority=rule.priority
+        ))
+        order = MockOrder(amount=500.0, current_state="pending")
+
+        rule_engine.evaluate_interpreted(order, "order_transition", "start_preparation")
+        rule_engine.evaluate_outcome(order, "order_transition", "start_preparation")
+        rule_engine.evaluate_outcome(order, "order_transition", "start_preparation")
+
+        report = {item["rule_id"]: item for item in profiler.report()}["rule_005"]
+        assert (report["evaluations"], report["matches"], report["cache_hits"]) == (2, 2, 1)
+        assert [(c["path"], c["evaluations"], c["passed"]) for c in report["conditions"]] == [
+            ("0", 2, 2), ("0.0", 2, 0), ("0.1", 2, 2)
+        ]
+
+        rule_repo.toggle_rule("rule_005", True)
+        rule_engine.evaluate_interpreted(order, "order_transition", "start_preparation")
+        report = {item["rule_id"]: item for item in profiler.report()}["rule_005"]
+        assert (report["evaluations"], report["cache_hits"]) == (1, 0)
+
+    def test_recommended_order_puts_cheap_selective_conditions_first(self):
+        """Test: conditions are ranked by cost per rejection"""
+        conditions = [
+            {"index": 0, "evaluations": 100, "pass_rate": 0.9, "mean_us": 5.0},
+            {"index": 1, "evaluations": 90, "pass_rate": 0.1, "mean_us": 1.0},
+            {"index": 2, "evaluations": 9, "pass_rate": 1.0, "mean_us": 0.1},
+            {"index": 3, "evaluations": 0, "pass_rate": None, "mean_us": None},
+        ]
+        assert recommend_condition_order(conditions) == [1, 0, 2, 3]
+
+
+class TestRuleRegistry:
+    """Tests for versioned rule snapshots loaded from a rules file"""
+
+    RULES = """
+rules:
+  - id: rule_cancel
+    name: Cancellation Notification
+    event: order_transition
+    conditions:
+      - condition_type: equals
+        field: action
+        value: cancel
+    actions:
+      - action_type: add_metadata
+        parameters:
+          data:
+            cancelled: true
+"""
+
+    def test_loads_rules_from_file(self, tmp_path):
+        """Test: rules are parsed from YAML into dataclasses"""
+        rules_file = tmp_path / "rules.yaml"
+        rules_file.write_text(self.RULES)
+
+        rule_repo = RuleRepository(str(rules_file))
+
+        rule = rule_repo.get_rule_by_id("rule_cancel")
+        assert rule.conditions[0].condition_type == RuleConditionType.EQUALS
+        assert rule.actions[0].action_type == RuleActionType.ADD_METADATA
+        assert rule_repo.version == 1
+
+    def test_reload_swaps_snapshot(self, tmp_path):
+        """Test: reload publishes a new version while old snapshots stay intact"""
+        rules_file = tmp_path / "rules.yaml"
+        rules_file.write_text(self.RULES)
+        rule_repo = RuleRepository(str(rules_file))
+        rule_engine = RuleEngine(rule_repo)
+        order = MockOrder(amount=500.0, current_state="pending")
+
+        before = rule_repo.snapshot()
+        assert rule_repo.reload() is before
+
+        rules_file.write_text(self.RULES.replace("value: cancel", "value: ship"))
+        after = rule_repo.reload()
+
+        assert after.version == before.version + 1
+        assert before.rules[0].conditions[0].value == "cancel"
+        assert rule_engine.evaluate(order, event="order_transition", action="cancel") == []
+        assert len(rule_engine.evaluate(order, event="order_transition", action="ship")) == 1
+
+    def test_edits_survive_reload_of_unchanged_file(self, tmp_path):
+        """Test: API edits are kept by the watcher until the rules file itself changes"""
+        rules_file = tmp_path / "rules.yaml"
+        rules_file.write_text(self.RULES)
+        rule_repo = RuleRepository(str(rules_file))
+
+        rule_repo.toggle_rule("rule_cancel", False)
+        edited = rule_repo.snapshot()
+        assert rule_repo.reload() is edited
+        assert rule_repo.get_rule_by_id("rule_cancel").enabled is False
+
+        rules_file.write_text(self.RULES.replace("value: cancel", "value: ship"))
+        assert rule_repo.reload().version == edited.version + 1
+        assert rule_repo.get_rule_by_id("rule_cancel").enabled is True
+
+    def test_rules_handed_out_are_copies(self, tmp_path):
+        """Test: changing a rule in place does not touch the compiled snapshot"""
+        rules_file = tmp_path / "rules.yaml"
+        rules_file.write_text(self.RULES)
+        rule_repo = RuleRepository(str(rules_file))
+        rule_engine = RuleEngine(rule_repo)
+        order = MockOrder(amount=500.0, current_state="pending")
+
+        rule = rule_repo.get_rule_by_id("rule_cancel")
+        rule.conditions[0].value = "ship"
+
+        assert len(rule_engine.evaluate(order, event="order_transition", action="cancel")) == 1
+
+        rule_repo.update_rule("rule_cancel", rule)
+        rule.conditions[0].value = "deliver"
+        assert rule_engine.evaluate(order, event="order_transition", action="cancel") == []
+        assert len(rule_engine.evaluate(order, event="order_transition", action="ship")) == 1
+
+    def test_invalid_file_keeps_current_rules(self, tmp_path):
+        """Test: a broken rules file is rejected and the active version is kept"""
+        rules_file = tmp_path / "rules.yaml"
+        rules_file.write_text(self.RULES)
+        rule_repo = RuleRepository(str(rules_file))
+
+        rules_file.write_text(self.RULES.replace("equals", "no_such_condition"))
+        with pytest.raises(ValueError):
+            rule_repo.reload()
+
+        assert rule_repo.version == 1
+        assert rule_repo.get_rule_by_id("rule_cancel") is not None
+
+    def test_changes_publish_new_versions(self):
+        """Test: edits create new snapshots instead of mutating the active one"""
+        rule_repo = RuleRepository()
+        snapshot = rule_repo.snapshot()
+
+        rule_repo.toggle_rule("rule_001", False)
+
+        assert rule_repo.version == snapshot.version + 1
+        assert rule_repo.get_rule_by_id("rule_001").enabled is False
+        assert next(r for r in snapshot.rules if r.id == "rule_001").enabled is True
+
+
+class TestVelocityConditions:
+    """Tests for sliding-window velocity counters and VELOCITY conditions"""
+
+    class Clock:
+        def __init__(self):
+            self.now = 1000.0
+
+        def __call__(self):
+            return self.now
+
+    def make_order(self, customer_id, state="pending"):
+        order = MockOrder(amount=100.0, current_state=state)
+        order.customer_id = customer_id
+        return order
+
+    def test_window_slides_by_bucket(self):
+        """Test: events leave the count once their bucket is past the window"""
+        clock = self.Clock()
+        counters = VelocityCounters(buckets=10, clock=clock)
+        counters.track("customer.cancel", 60)
+        order = self.make_order("c1")
+
+        counters.record("cancel", order)
+        clock.now += 30
+        counters.record("cancel", order, count=2)
+        counters.record("approve", order)
+        assert counters.count_for("customer.cancel", 60, order) == 3
+
+        clock.now += 35
+        assert counters.count_for("customer.cancel", 60, order) == 2
+        clock.now += 3600
+        assert counters.count_for("customer.cancel", 60, order) == 0
+        assert counters.count_for("customer.cancel", 60, self.make_order("c2")) == 0
+
+    def test_keys_are_bounded(self):
+        """Test: beyond max_keys the least recently used key is dropped"""
+        counters = VelocityCounters(max_keys=2, clock=self.Clock())
+        counters.track("customer.order_created", 60)
+        for customer_id in ("a", "b", "a", "c"):
+            counters.record("order_created", self.make_order(customer_id))
+
+        assert counters.count("customer.order_created", 60, "a") == 2
+        assert counters.count("customer.order_created", 60, "b") == 0
+        assert counters.count("customer.order_created", 60, "c") == 1
+
+    def test_invalid_counters_rejected(self):
+        """Test: unknown scopes and non-positive windows raise ValueError"""
+        counters = VelocityCounters()
+        with pytest.raises(ValueError):
+            counters.track("merchant.cancel", 60)
+        with pytest.raises(ValueError):
+            counters.track("customer.cancel", 0)
+
+    def test_velocity_rule_blocks_and_bypasses_cache(self):
+        """Test: a VELOCITY rule blocks once the count exceeds its value, in every evaluation path"""
+        counters = get_velocity_counters()
+        counters.clear()
+        rule_repo = RuleRepository()
+        rule_repo.add_rule(Rule(
+            id="rule_cancel_velocity",
+            name="Cancellation Velocity",
+            description="Block customers cancelling too often",
+            event="order_transition",
+            conditions=[
+                RuleCondition(RuleConditionType.EQUALS, "action", "cancel"),
+                RuleCondition(RuleConditionType.VELOCITY, "customer.cancel", 1, window_seconds=3600)
+            ],
+            actions=[RuleAction(RuleActionType.BLOCK_TRANSITION, {"reason": "Too many cancellations"})]
+        ))
+        cache = RuleOutcomeCache()
+        rule_engine = RuleEngine(rule_repo, outcome_cache=cache)
+        order = self.make_order("velocity-customer")
+
+        def blocked():
+            return rule_engine.evaluate_outcome(order, "order_transition", "cancel")["blocked"]
+
+        assert not blocked()
+        counters.record("cancel", order)
+        assert not blocked()
+        counters.record("cancel", order)
+        assert blocked()
+
+        rule = rule_repo.get_rule_by_id("rule_cancel_velocity")
+        assert rule_engine.evaluate_interpreted(order, "order_transition", "cancel")[0].action_type == \
+            RuleActionType.BLOCK_TRANSITION
+        facts = OrderFacts.from_orders([order, self.make_order("other")], "cancel", extra_fields=["customer_id"])
+        result = BatchRuleEvaluator(rule_repo).evaluate(facts, rules=[rule])
+        assert result.blocked.tolist() == [True, False]
+        with pytest.raises(ValueError, match="customer_id"):
+            BatchRuleEvaluator(rule_repo).evaluate(OrderFacts.from_orders([order], "cancel"), rules=[rule])
+        assert cache.stats()["size"] == 0
+        counters.clear()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -2,12 +2,46 @@
 Unit tests for service layer.
 Tests business logic with mocked dependencies.
 """
+import asyncio
+import gzip
+import os
 import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import AsyncMock, MagicMock
 from uuid import uuid4
 
-from app.services.transition_service import TransitionService
+from app.services.transition_service import TransitionService, TransitionConflictError
+from app.services.order_service import DuplicateProductError, OrderService
+from app.repositories.order_repository import OrderRepository
+from app.services.rule_backtest_service import RuleBacktestService
+from app.services.transition_scheduler import SchedulePolicy, TransitionScheduler
+from app.services.event_broadcaster import EventBroadcaster
+from app.services.order_history_service import OrderHistoryService
+from app.services.transition_log_retention_service import TransitionLogRetentionService
+from app.repositories.transition_log_partition_repository import (
+    LogPartition,
+    TransitionLogPartitionRepository,
+    add_months,
+    is_archivable,
+    partition_month,
+)
+from app.repositories.rule_repository import RuleRepository
+from app.schemas.order import OrderCreate
+from app.schemas.transition import BatchTransitionItem
+from app.services.fact_context import AsyncFactProvider, FactRegistry
+from app.services.rule_engine import Rule, RuleAction, RuleActionType, RuleCondition, RuleConditionType
+from app.schemas.product import ProductInOrder
 from app.models.order import Order
+from app.config.database import Base, _create_indexes, _upgrade_schema
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+
+# Partition DDL only runs on PostgreSQL; point this at a scratch database to test it
+TEST_POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
 
 
 class TestTransitionService:
@@ -47,6 +81,23 @@ class TestTransitionService:
         assert result["new_state"] == "in_preparation"
         mock_log_repo.create.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_transition_order_conflict(self, service, mock_order_repo, mock_log_repo):
+        """Test that losing the compare-and-set raises a conflict and writes nothing."""
+        mock_order = MagicMock(spec=Order)
+        mock_order.id = uuid4()
+        mock_order.current_state = "pending"
+        mock_order.amount = 500.0
+
+        mock_order_repo.get_by_id.return_value = mock_order
+        mock_order_repo.compare_and_set_state.return_value = False
+
+        with pytest.raises(TransitionConflictError):
+            await service.transition_order(mock_order.id, "start_preparation")
+
+        mock_log_repo.create.assert_not_called()
+        mock_log_repo.db.commit.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_transition_order_not_found(self, service, mock_order_repo):
         """Test transition fails when order not found."""
@@ -69,6 +120,86 @@ class TestTransitionService:
         with pytest.raises(ValueError, match="require review"):
             await service.transition_order(order_id, "start_preparation")
 
+    @pytest.mark.asyncio
+    async def test_batch_prefetches_async_facts_once(self, mock_order_repo, mock_log_repo):
+        """Test async facts are loaded with one provider call for the whole batch."""
+        class CancellationsProvider(AsyncFactProvider):
+            facts = frozenset(["customer_cancelled_orders"])
+
+            def __init__(self):
+                self.calls = []
+
+            async def load(self, db, orders):
+                self.calls.append(len(orders))
+                return {order.id: {"customer_cancelled_orders": 3 if order.amount > 100 else 0} for order in orders}
+
+        registry = FactRegistry()
+        provider = registry.register_async(CancellationsProvider())
+        rule_repo = RuleRepository()
+        rule_repo.add_rule(Rule(
+            id="frequent_canceller",
+            name="Frequent canceller",
+            description="Customers with many cancellations need review",
+            event="order_transition",
+            conditions=[RuleCondition(RuleConditionType.GREATER_THAN, "customer_cancelled_orders", 2)],
+            actions=[RuleAction(RuleActionType.BLOCK_TRANSITION, {"reason": "Too many cancellations"})]
+        ))
+        service = TransitionService(mock_order_repo, mock_log_repo, rule_repository=rule_repo)
+        service.rule_engine.fact_registry = registry
+
+        orders = {}
+        for amount in (50.0, 200.0, 300.0):
+            order = MagicMock(spec=Order)
+            order.id = uuid4()
+            order.current_state = "pending"
+            order.amount = amount
+            orders[order.id] = order
+        order_ids = list(orders)
+        mock_order_repo.get_by_ids.return_value = orders
+        mock_order_repo.update_states.return_value = {order_ids[0]}
+
+        results = await service.transition_orders_batch(
+            [BatchTransitionItem(order_id=order_id, action="start_preparation") for order_id in order_ids]
+        )
+
+        assert provider.calls == [3]
+        assert [r.success for r in results] == [True, False, False]
+        assert results[1].error == "Too many cancellations"
+
+    @pytest.mark.asyncio
+    async def test_velocity_rule_counts_committed_transitions(self, mock_order_repo, mock_log_repo):
+        """Test a VELOCITY rule sees the customer's earlier transitions."""
+        rule_repo = RuleRepository()
+        rule_repo.add_rule(Rule(
+            id="preparation_velocity",
+            name="Preparation velocity",
+            description="At most two preparations per customer and hour",
+            event="order_transition",
+            conditions=[
+                RuleCondition(RuleConditionType.EQUALS, "action", "start_preparation"),
+                RuleCondition(RuleConditionType.VELOCITY, "customer.start_preparation", 1, window_seconds=3600)
+            ],
+            actions=[RuleAction(RuleActionType.BLOCK_TRANSITION, {"reason": "Too many preparations"})]
+        ))
+        service = TransitionService(mock_order_repo, mock_log_repo, rule_repository=rule_repo)
+        customer_id = uuid4()
+
+        def pending_order():
+            order = MagicMock(spec=Order)
+            order.id = uuid4()
+            order.customer_id = customer_id
+            order.current_state = "pending"
+            order.amount = 500.0
+            mock_order_repo.get_by_id.return_value = order
+            return order
+
+        for _ in range(2):
+            result = await service.transition_order(pending_order().id, "start_preparation")
+            assert result["new_state"] == "in_preparation"
+
+        with pytest.raises(ValueError, match="Too many preparations"):
+            await service.transition_order(pending_order().id, "start_preparation")
+
     @pytest.mark.asyncio
     async def test_cannot_cancel_after_shipped(self, service, mock_order_repo):
         """Test business rule: cannot cancel after shipping."""
@@ -83,3 +214,497 @@ class TestTransitionService:
         with pytest.raises(ValueError):
             await service.transition_order(order_id, "cancel")
 
+
+class TestOrderService:
+    """Test suite for OrderService."""
+
+    @pytest.fixture
+    def repos(self):
+        """Create mocked order, customer and product repositories."""
+        return AsyncMock(), AsyncMock(), AsyncMock()
+
+    @pytest.mark.asyncio
+    async def test_create_order_looks_up_products_in_one_call(self, repos):
+        """Test that every line is validated with a single batched product lookup."""
+        order_repo, customer_repo, product_repo = repos
+        customer = MagicMock(id=uuid4(), email="jane@example.com")
+        customer.name = "Jane"
+        customer_repo.get_by_id.return_value = customer
+
+        products = [MagicMock(id=uuid4(), unit_price=10.0 * (i + 1)) for i in range(3)]
+        for i, product in enumerate(products):
+            product.name = f"Product {i}"
+        product_repo.get_by_ids.return_value = {p.id: p for p in products}
+
+        order_repo.create.side_effect = lambda data, lines: Order(
+            id=uuid4(), creation_date=datetime.utcnow(), **data
+        )
+
+        service = OrderService(order_repo, customer_repo, product_repo)
+        response = await service.create_order(OrderCreate(
+            amount=60.0,
+            customer_id=customer_repo.get_by_id.return_value.id,
+            products=[
+                ProductInOrder(product_id=p.id, name="ignored", quantity=1, unit_price=0)
+                for p in products
+            ]
+        ))
+
+        product_repo.get_by_ids.assert_called_once()
+        product_repo.get_by_id.assert_not_called()
+        order_repo.get_by_id.assert_not_called()
+        assert [line.name for line in response.products] == ["Product 0", "Product 1", "Product 2"]
+        assert [float(line.unit_price) for line in response.products] == [10.0, 20.0, 30.0]
+
+    @pytest.mark.asyncio
+    async def test_create_order_unknown_product(self, repos):
+        """Test that a missing product aborts creation before any insert."""
+        order_repo, customer_repo, product_repo = repos
+        customer_repo.get_by_id.return_value = MagicMock()
+        product_repo.get_by_ids.return_value = {}
+
+        service = OrderService(order_repo, customer_repo, product_repo)
+        with pytest.raises(ValueError, match="not found"):
+            await service.create_order(OrderCreate(
+                amount=10.0,
+                customer_id=uuid4(),
+                products=[ProductInOrder(product_id=uuid4(), name="x", quantity=1, unit_price=1)]
+            ))
+
+        order_repo.create.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_bulk_failure_only_fails_its_transaction(self, repos, monkeypatch):
+        """Test bulk writes are split into transactions and a failed one only fails its own orders."""
+        monkeypatch.setattr(OrderRepository, "INSERT_CHUNK_SIZE", 2)
+        order_repo, customer_repo, product_repo = repos
+        customer_id, product = uuid4(), MagicMock(id=uuid4(), unit_price=10.0)
+        customer_repo.get_by_ids.return_value = {customer_id: MagicMock()}
+        product_repo.get_by_ids.return_value = {product.id: product}
+        order_repo.create_many.side_effect = [
+            [MagicMock(id=uuid4()), MagicMock(id=uuid4())],
+            SQLAlchemyError("deadlock"),
+            [MagicMock(id=uuid4())],
+        ]
+
+        line = ProductInOrder(product_id=product.id, name="x", quantity=1, unit_price=1)
+        results = await OrderService(order_repo, customer_repo, product_repo).create_orders_bulk(
+            [OrderCreate(amount=10.0, customer_id=customer_id, products=[line]) for _ in range(5)]
+        )
+
+        assert [len(call.args[0]) for call in order_repo.create_many.await_args_list] == [2, 2, 1]
+        assert [result.success for result in results] == [True, True, False, False, True]
+        assert results[2].error == "Batch write failed: SQLAlchemyError"
+
+    @pytest.mark.asyncio
+    async def test_duplicate_product_error(self, repos):
+        """Test a product listed twice raises DuplicateProductError."""
+        order_repo, customer_repo, product_repo = repos
+        customer_repo.get_by_id.return_value = MagicMock()
+        line = ProductInOrder(product_id=uuid4(), name="x", quantity=1, unit_price=1)
+
+        with pytest.raises(DuplicateProductError):
+            await OrderService(order_repo, customer_repo, product_repo).create_order(
+                OrderCreate(amount=10.0, customer_id=uuid4(), products=[line, line])
+            )
+
+
+class TestRuleBacktestService:
+    """Test suite for RuleBacktestService."""
+
+    @pytest.fixture
+    def log_repo(self):
+        """A log repository replaying three partitions of transitions."""
+        customer_id = uuid4()
+        partitions = [
+            [
+                ("pending", "start_preparation", 1500.0, 2, True, uuid4(), customer_id),
+                ("pending", "start_preparation", 500.0, 1, False, uuid4(), customer_id)
+            ],
+            [("in_preparation", "cancel", 1500.0, 1, False, uuid4(), customer_id)],
+            [("review", "approve", 2000.0, 3, True, uuid4(), uuid4())],
+        ]
+
+        async def stream(*args):
+            for rows in partitions:
+                yield rows
+
+        repo = MagicMock()
+        repo.stream_rule_replay_rows = stream
+        return repo
+
+    @pytest.mark.asyncio
+    async def test_backtest_aggregates_partitions(self, log_repo):
+        """Test per-rule counts are summed over every partition."""
+        rule_repo = RuleRepository()
+        rule_repo.toggle_rule("rule_001", False)
+        service = RuleBacktestService(log_repo, rule_repo, max_workers=2, executor_factory=ThreadPoolExecutor)
+
+        rules = service.select_rules(["rule_001", "rule_003", "rule_005"])
+        events = [event async for event in service.run(rules)]
+
+        assert {event["type"] for event in events[:-1]} == {"progress"}
+        result = events[-1]
+        assert result["type"] == "result"
+        assert result["partitions"] == 3
+        assert result["rows"] == 4
+        assert result["blocked"] == 1
+        assert result["taxed"] == 2
+        assert result["total_tax"] == pytest.approx((1500.0 + 2000.0) * 0.15)
+        assert [(r["rule_id"], r["enabled"], r["matched"], r["blocked"], r["taxed"]) for r in result["rules"]] == [
+            ("rule_001", False, 1, 1, 0),
+            ("rule_003", True, 2, 0, 2),
+            ("rule_005", True, 1, 0, 0),
+        ]
+
+    def test_select_rules_unknown_id(self, log_repo):
+        """Test unknown candidate rules are rejected."""
+        service = RuleBacktestService(log_repo, RuleRepository())
+        with pytest.raises(ValueError, match="rule_999"):
+            service.select_rules(["rule_001", "rule_999"])
+
+    def test_select_rules_rejects_velocity(self, log_repo):
+        """Test rules with velocity conditions cannot be backtested."""
+        service = RuleBacktestService(log_repo, RuleRepository())
+        with pytest.raises(ValueError, match="rule_006"):
+            service.select_rules(["rule_003", "rule_006"])
+
+
+class TestTransitionScheduler:
+    """Test suite for the deadline scheduler."""
+
+    CANCEL = SchedulePolicy("auto_cancel", "pending", timedelta(hours=48), "cancel", "Expired")
+    FLAG = SchedulePolicy("stuck_in_review", "review", timedelta(hours=4))
+
+    def make_scheduler(self, now, batch_size=500):
+        clock = {"now": now}
+        scheduler = TransitionScheduler([self.CANCEL, self.FLAG], batch_size=batch_size, clock=lambda: clock["now"])
+        scheduler.running = True
+        return scheduler, clock
+
+    def test_due_orders_by_policy(self):
+        """Test deadlines fire in batches per policy and moved orders are skipped."""
+        start = datetime(2024, 1, 1)
+        scheduler, clock = self.make_scheduler(start, batch_size=2)
+        order_ids = [uuid4() for _ in range(4)]
+        for i, order_id in enumerate(order_ids[:3]):
+            scheduler.track(order_id, "pending", start + timedelta(minutes=i))
+        scheduler.track(order_ids[3], "review", start)
+        scheduler.track(order_ids[1], "in_preparation", start + timedelta(hours=1))
+
+        assert scheduler.pop_due(start + timedelta(hours=47)) == {self.FLAG: [order_ids[3]]}
+        assert scheduler.pop_due(start + timedelta(hours=49)) == {self.CANCEL: [order_ids[0], order_ids[2]]}
+        assert scheduler.pop_due(start + timedelta(hours=100)) == {}
+        assert len(scheduler) == 3
+
+    @pytest.mark.asyncio
+    async def test_start_and_run(self):
+        """Test the loaded orders fire once due, flag-only policies flag, and a transition clears the flag."""
+        now = datetime(2024, 1, 3)
+        scheduler, _ = self.make_scheduler(now)
+        overdue, fresh, stuck = uuid4(), uuid4(), uuid4()
+
+        async def entries(states):
+            assert sorted(states) == ["pending", "review"]
+            yield [(overdue, "pending", now - timedelta(hours=50)), (fresh, "pending", now)]
+            yield [(stuck, "review", now - timedelta(hours=5))]
+
+        fired = []
+
+        async def fire(policy, order_ids):
+            fired.append((policy.name, order_ids))
+            for order_id in order_ids:
+                scheduler.track(order_id, "cancelled", now)
+
+        await scheduler.start(entries)
+        task = asyncio.create_task(scheduler.run(fire))
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+        assert fired == [("auto_cancel", [overdue])]
+        assert list(scheduler.flagged) == [stuck]
+        assert len(scheduler) == 2
+
+        scheduler.track(stuck, "in_preparation", now)
+        assert scheduler.flagged == {}
+
+    def test_merge_applies_changes_from_other_processes(self):
+        """Test feed entries are tracked unless a newer state is already known, and deleted orders are forgotten."""
+        start = datetime(2024, 1, 1)
+        scheduler, _ = self.make_scheduler(start)
+        moved, deleted = uuid4(), uuid4()
+        scheduler.track(moved, "pending", start)
+        scheduler.track(deleted, "pending", start)
+
+        reviewed = uuid4()
+        assert scheduler.merge([
+            (moved, "review", start + timedelta(hours=1)),
+            (deleted, "pending", start),
+            (reviewed, "review", start),
+        ]) == 2
+        assert scheduler.merge([(moved, "pending", start)]) == 0
+        scheduler.forget(deleted)
+
+        assert len(scheduler) == 2
+        assert scheduler.pop_due(start + timedelta(hours=48)) == {self.FLAG: [reviewed, moved]}
+
+    @pytest.mark.asyncio
+    async def test_failed_orders_are_retried_then_flagged(self):
+        """Test orders the callback could not transition are retried with backoff, then flagged."""
+        start = datetime(2024, 1, 1)
+        scheduler = TransitionScheduler([self.CANCEL], retry_seconds=60, max_retries=2, clock=lambda: start)
+        scheduler.running = True
+        blocked, moved = uuid4(), uuid4()
+        scheduler.track(blocked, "pending", start - timedelta(hours=49))
+        scheduler.track(moved, "pending", start - timedelta(hours=49))
+
+        async def fire(policy, order_ids):
+            scheduler.track(moved, "in_preparation", start)
+            return order_ids
+
+        task = asyncio.create_task(scheduler.run(fire))
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+        assert scheduler.next_deadline() == start + timedelta(seconds=60)
+        assert scheduler.pop_due(start + timedelta(seconds=60)) == {self.CANCEL: [blocked]}
+        scheduler._retry(self.CANCEL, [blocked])
+        assert scheduler.next_deadline() == start + timedelta(seconds=120)
+        assert scheduler.pop_due(start + timedelta(seconds=120)) == {self.CANCEL: [blocked]}
+        scheduler._retry(self.CANCEL, [blocked])
+        assert scheduler.next_deadline() is None
+        assert list(scheduler.flagged) == [blocked]
+
+
+class TestOrderHistoryService:
+    """Test suite for order state snapshots."""
+
+    @pytest.mark.asyncio
+    async def test_snapshots_stop_at_the_oldest_open_transaction(self):
+        """Test snapshots default to the settled time and later times are rejected."""
+        settled = datetime(2024, 1, 1, 12)
+        snapshot_repo = AsyncMock()
+        snapshot_repo.settled_at.return_value = settled
+        snapshot_repo.latest_snapshot_at.return_value = None
+        snapshot_repo.create_snapshot.return_value = 3
+        service = OrderHistoryService(snapshot_repo)
+
+        result = await service.take_snapshot()
+        assert (result.snapshot_at, result.orders) == (settled, 3)
+        with pytest.raises(ValueError, match="still open"):
+            await service.take_snapshot(settled + timedelta(seconds=1))
+
+
+class TestSchemaUpgrade:
+    """Test suite for upgrading tables created by older versions."""
+
+    def test_adds_state_entered_at_from_creation_date(self):
+        """Test the missing column is added and backfilled and missing indexes are created."""
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            Base.metadata.create_all(conn)
+            conn.execute(text("DROP INDEX ix_orders_state_entered_at"))
+            conn.execute(text("ALTER TABLE orders DROP COLUMN state_entered_at"))
+            conn.execute(text(
+                "INSERT INTO orders (id, amount, current_state, creation_date, customer_id) "
+                "VALUES ('1', 10.0, 'pending', '2024-01-01 00:00:00', '2')"
+            ))
+
+            _upgrade_schema(conn)
+            _create_indexes(conn)
+
+            assert conn.execute(text("SELECT state_entered_at FROM orders")).scalar() == "2024-01-01 00:00:00"
+            assert "ix_orders_state_entered_at" in {index["name"] for index in inspect(conn).get_indexes("orders")}
+
+
+class TestEventBroadcaster:
+    """Test suite for the live feed fan-out."""
+
+    @pytest.mark.asyncio
+    async def test_fan_out_encodes_once(self):
+        """Test every subscriber receives the same encoded frame."""
+        broadcaster = EventBroadcaster(queue_size=10)
+        subscriptions = [broadcaster.subscribe() for _ in range(1000)]
+
+        broadcaster.publish("transition", {"order_id": uuid4(), "new_state": "shipped"})
+
+        frames = [subscription.queue.get_nowait() for subscription in subscriptions]
+        assert all(frame is frames[0] for frame in frames)
+        assert frames[0].startswith("id: 1\nevent: transition\ndata: {")
+
+    @pytest.mark.asyncio
+    async def test_slow_subscriber_is_dropped(self):
+        """Test a full queue drops only that subscriber, whose stream then ends."""
+        broadcaster = EventBroadcaster(queue_size=2)
+        slow = broadcaster.subscribe()
+        fast = broadcaster.subscribe()
+        stream = fast.frames()
+        assert await stream.__anext__() == ": connected\n\n"
+
+        for i in range(3):
+            broadcaster.publish("order_created", {"id": i})
+            assert '"id": %d' % i in await stream.__anext__()
+
+        assert slow.dropped and not fast.dropped
+        assert len(broadcaster) == 1
+        frames = [frame async for frame in slow.frames()]
+        assert frames == [": connected\n\n", "event: dropped\ndata: {}\n\n"]
+
+        await stream.aclose()
+        assert len(broadcaster) == 0
+
+
+class TestTransitionLogRetentionService:
+    """Test suite for transition log partition retention."""
+
+    def test_month_arithmetic(self):
+        """Test month offsets across year boundaries and partition names."""
+        assert add_months(datetime(2024, 11, 1), 3) == datetime(2025, 2, 1)
+        assert add_months(datetime(2024, 1, 1), -1) == datetime(2023, 12, 1)
+        assert partition_month("transition_logs_p202402") == datetime(2024, 2, 1)
+        assert partition_month("transition_logs_default") is None
+        assert is_archivable("transition_logs_default_20240415000000")
+        assert not is_archivable("transition_logs_default")
+
+    @pytest.mark.asyncio
+    async def test_archives_expired_months(self, tmp_path):
+        """Test that months past retention are detached, exported to gzipped CSV and dropped."""
+        repo = archiving_repo(acquired=True)
+        repo.get_partitions.return_value = [
+            LogPartition(f"transition_logs_p2024{month:02d}", datetime(2024, month, 1), datetime(2024, month + 1, 1))
+            for month in (1, 2, 3)
+        ]
+        detached = []
+        repo.detach_partition.side_effect = detached.append
+        repo.get_detached.side_effect = lambda: list(detached)
+        row = (uuid4(), uuid4(), "pending", "cancelled", "cancel", datetime(2024, 1, 5))
+
+        async def stream_rows(name, chunk_size):
+            yield [row, row]
+            yield [row]
+        repo.stream_rows = stream_rows
+
+        service = TransitionLogRetentionService(repo, str(tmp_path), retention_months=2)
+        archived = await service.run(now=datetime(2024, 4, 15))
+
+        repo.ensure_partitions.assert_awaited_once_with(3, datetime(2024, 4, 15))
+        assert detached == ["transition_logs_p202401"]
+        repo.move_expired_default_rows.assert_awaited_once_with(datetime(2024, 2, 1))
+        repo.drop_detached.assert_awaited_once_with("transition_logs_p202401")
+        assert [(segment.partition, segment.rows) for segment in archived] == [("transition_logs_p202401", 3)]
+        with gzip.open(archived[0].path, "rt") as segment:
+            lines = segment.read().splitlines()
+        assert lines[0] == "id,order_id,previous_state,new_state,action_taken,transition_date"
+        assert len(lines) == 4
+
+    @pytest.mark.asyncio
+    async def test_keeps_everything_without_retention(self, tmp_path):
+        """Test that only upcoming partitions are created when retention is disabled."""
+        repo = AsyncMock()
+        repo.is_partitioned.return_value = True
+
+        assert await TransitionLogRetentionService(repo, str(tmp_path)).run() == []
+        repo.ensure_partitions.assert_awaited_once()
+        repo.detach_partition.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_skips_archiving_while_another_process_archives(self, tmp_path):
+        """Test that nothing is detached, exported or dropped without the archive lock."""
+        repo = archiving_repo(acquired=False)
+        repo.get_partitions.return_value = [
+            LogPartition("transition_logs_p202401", datetime(2024, 1, 1), datetime(2024, 2, 1))
+        ]
+
+        service = TransitionLogRetentionService(repo, str(tmp_path), retention_months=2)
+        assert await service.run(now=datetime(2024, 4, 15)) == []
+        repo.ensure_partitions.assert_awaited_once()
+        repo.detach_partition.assert_not_awaited()
+        repo.move_expired_default_rows.assert_not_awaited()
+        repo.drop_detached.assert_not_awaited()
+
+
+def archiving_repo(acquired: bool) -> AsyncMock:
+    repo = AsyncMock()
+    repo.is_partitioned.return_value = True
+
+    @asynccontextmanager
+    async def archive_lock():
+        yield acquired
+    repo.archive_lock = archive_lock
+    return repo
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL is not set")
+class TestTransitionLogPartitionRepository:
+    """Test suite for the partition DDL, against a real PostgreSQL database."""
+
+    @pytest.fixture
+    async def partition_repo(self):
+        schema = f"test_partitions_{uuid4().hex[:8]}"
+        engine = create_async_engine(TEST_POSTGRES_URL, connect_args={"server_settings": {"search_path": schema}})
+        async with engine.begin() as conn:
+            await conn.execute(text(f"CREATE SCHEMA {schema}"))
+            await conn.execute(text(
+                "CREATE TABLE transition_logs (id UUID NOT NULL, order_id UUID NOT NULL, "
+                "previous_state VARCHAR(50), new_state VARCHAR(50) NOT NULL, action_taken VARCHAR(50) NOT NULL, "
+                "transition_date TIMESTAMP NOT NULL, PRIMARY KEY (id, transition_date)) "
+                "PARTITION BY RANGE (transition_date)"
+            ))
+        async with AsyncSession(engine) as db:
+            yield TransitionLogPartitionRepository(db)
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_default_partition_rows_are_moved_and_archived(self, partition_repo, tmp_path):
+        """Test default partition rows move into a month created later and expire with the other months."""
+        db = partition_repo.db
+
+        async def count(table):
+            return (await db.execute(text(f"SELECT count(*) FROM {table}"))).scalar()
+
+        await partition_repo.ensure_partitions(0, datetime(2024, 1, 15))
+        for at in (datetime(2023, 6, 1), datetime(2024, 1, 10), datetime(2024, 5, 10)):
+            await db.execute(
+                text("INSERT INTO transition_logs VALUES (:id, :order_id, NULL, 'pending', 'create', :at)"),
+                {"id": uuid4(), "order_id": uuid4(), "at": at}
+            )
+        await db.commit()
+        assert await count("transition_logs_default") == 2
+
+        assert await partition_repo.ensure_partitions(0, datetime(2024, 5, 15)) == ["transition_logs_p202405"]
+        assert await count("transition_logs_p202405") == 1
+        assert await count("transition_logs_default") == 1
+
+        service = TransitionLogRetentionService(partition_repo, str(tmp_path), retention_months=2, months_ahead=0)
+        archived = await service.run(now=datetime(2024, 5, 15))
+
+        assert [segment.rows for segment in archived] == [1, 1]
+        assert [partition.name for partition in await partition_repo.get_partitions()] == ["transition_logs_p202405"]
+        assert await partition_repo.get_detached() == []
+        assert await count("transition_logs") == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_processes_create_partitions_once(self, partition_repo):
+        """Test that workers starting together all succeed and create each partition once."""
+        async with AsyncSession(partition_repo.db.bind) as other:
+            created = await asyncio.gather(
+                partition_repo.ensure_partitions(2, datetime(2024, 1, 15)),
+                TransitionLogPartitionRepository(other).ensure_partitions(2, datetime(2024, 1, 15))
+            )
+
+        assert sorted(created[0] + created[1]) == [
+            "transition_logs_p202401", "transition_logs_p202402", "transition_logs_p202403"
+        ]
+
+    @pytest.mark.asyncio
+    async def test_archive_lock_is_held_by_one_process(self, partition_repo):
+        """Test that a second process does not get the archive lock until the first releases it."""
+        other = TransitionLogPartitionRepository(AsyncSession(partition_repo.db.bind))
+        async with partition_repo.archive_lock() as first:
+            async with other.archive_lock() as second:
+                assert (first, second) == (True, False)
+        async with other.archive_lock() as again:
+            assert again
+        await other.db.close()
@@ -7,7 +7,16 @@ import type { CreateOrderDTO } from './types/order.types';
 
 const App: React.FC = () => {
   const [view, setView] = useState<'orders' | 'logs'>('orders');
-  const { orders, logs, loading, createOrder, createProduct, transitionOrder } = useOrders();
+  const {
+    orders,
+    hasMoreOrders,
+    loadMoreOrders,
+    logs,
+    loading,
+    createOrder,
+    createProduct,
+    transitionOrder
+  } = useOrders();
 
   const handleCreateOrder = async (orderData: CreateOrderDTO) => {
     try {
@@ -43,6 +52,8 @@ const App: React.FC = () => {
       {view === 'orders' ? (
         <OrdersPage
           orders={orders}
+          hasMoreOrders={hasMoreOrders}
+          onLoadMoreOrders={loadMoreOrders}
           onCreateOrder={handleCreateOrder}
           onCreateProduct={createProduct}
           onTransitionOrder={handleTransitionOrder}
@@ -1,5 +1,5 @@
 import { useState, useEffect, useCallback } from 'react';
-import { orderService } from '../services/order.service';
+import { orderService, TransitionRequestItem } from '../services/order.service';
 import { productService } from '../services/product.service';
 import { logService, TransitionLog } from '../services/log.service';
 import type { Order, CreateOrderDTO } from '../types/order.types';
@@ -7,18 +7,31 @@ import type { CreateProductDTO } from '../types/product.types';
 
 export const useOrders = () => {
   const [orders, setOrders] = useState<Order[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [logs, setLogs] = useState<TransitionLog[]>([]);
   const [loading, setLoading] = useState(true);
 
   const fetchOrders = useCallback(async () => {
     try {
-      const data = await orderService.getOrders();
-      setOrders(data);
+      const page = await orderService.getOrders();
+      setOrders(page.orders);
+      setNextCursor(page.nextCursor);
     } catch (error) {
       console.error('Failed to fetch orders:', error);
     }
   }, []);
 
+  const loadMoreOrders = useCallback(async () => {
+    if (!nextCursor) return;
+    try {
+      const page = await orderService.getOrders(nextCursor);
+      setOrders(current => [...current, ...page.orders]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Failed to fetch orders:', error);
+    }
+  }, [nextCursor]);
+
   const fetchLogs = useCallback(async () => {
     try {
       const data = await logService.getAllLogs(100);
@@ -52,12 +65,22 @@ export const useOrders = () => {
     await fetchLogs();
   };
 
+  const transitionOrders = async (transitions: TransitionRequestItem[]) => {
+    const results = await orderService.transitionOrders(transitions);
+    await fetchOrders();
+    await fetchLogs();
+    return results;
+  };
+
   return {
     orders,
+    hasMoreOrders: nextCursor !== null,
+    loadMoreOrders,
     logs,
     loading,
     createOrder,
     createProduct,
-    transitionOrder
+    transitionOrder,
+    transitionOrders
   };
 };
\ No newline at end of file
@@ -8,6 +8,8 @@ import '../styles/pages/OrdersPage.css';
 
 interface OrdersPageProps {
   orders: Order[];
+  hasMoreOrders: boolean;
+  onLoadMoreOrders: () => Promise<void>;
   onCreateOrder: (order: CreateOrderDTO) => Promise<void>;
   onCreateProduct: (product: CreateProductDTO) => Promise<void>;
   onTransitionOrder: (orderId: string, action: string) => Promise<void>;
@@ -15,6 +17,8 @@ interface OrdersPageProps {
 
 export const OrdersPage: React.FC<OrdersPageProps> = ({
   orders,
+  hasMoreOrders,
+  onLoadMoreOrders,
   onCreateOrder,
   onCreateProduct,
   onTransitionOrder
@@ -27,7 +31,7 @@ export const OrdersPage: React.FC<OrdersPageProps> = ({
         <div>
           <h1 className="orders-page-title">Orders</h1>
           <p className="orders-page-subtitle">
-            Manage and track your orders · {orders.length} total orders
+            Manage and track your orders · {orders.length}{hasMoreOrders ? '+' : ''} orders
           </p>
         </div>
         <button onClick={() => setShowCreateModal(true)} className="create-order-btn">
@@ -41,6 +45,14 @@ export const OrdersPage: React.FC<OrdersPageProps> = ({
         onTransitionOrder={onTransitionOrder}
       />
 
+      {hasMoreOrders && (
+        <div className="load-more-container">
+          <button onClick={onLoadMoreOrders} className="load-more-btn">
+            Load more orders
+          </button>
+        </div>
+      )}
+
       {showCreateModal && (
         <CreateOrderModal
           onClose={() => setShowCreateModal(false)}
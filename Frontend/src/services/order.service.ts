@@ -19,6 +19,25 @@ interface BackendOrder {
   notes?: string;
 }
 
+export interface OrderPage {
+  orders: Order[];
+  nextCursor: string | null;
+}
+
+export interface TransitionRequestItem {
+  orderId: string;
+  action: string;
+  cancellationReason?: string;
+}
+
+export interface BatchTransitionResult {
+  order_id: string;
+  success: boolean;
+  previous_state: string | null;
+  new_state: string | null;
+  error: string | null;
+}
+
 class OrderService {
   private readonly BASE_PATH = '/orders';
 
@@ -38,9 +57,14 @@ class OrderService {
     };
   }
 
-  async getOrders(): Promise<Order[]> {
-    const response = await apiClient.get<BackendOrder[]>(this.BASE_PATH);
-    return response.data.map(order => this.mapBackendOrderToFrontend(order));
+  async getOrders(cursor?: string, limit = 100): Promise<OrderPage> {
+    const response = await apiClient.get<BackendOrder[]>(this.BASE_PATH, {
+      params: { limit, ...(cursor ? { cursor } : {}) }
+    });
+    return {
+      orders: response.data.map(order => this.mapBackendOrderToFrontend(order)),
+      nextCursor: (response.headers['x-next-cursor'] as string | undefined) ?? null
+    };
   }
 
   async createOrder(order: CreateOrderDTO): Promise<Order> {
@@ -69,6 +93,20 @@ class OrderService {
     return this.mapBackendOrderToFrontend(response.data);
   }
 
+  async transitionOrders(transitions: TransitionRequestItem[]): Promise<BatchTransitionResult[]> {
+    const response = await apiClient.post<BatchTransitionResult[]>(
+      `${this.BASE_PATH}/transitions:batch`,
+      {
+        transitions: transitions.map(t => ({
+          order_id: t.orderId,
+          action: t.action,
+          cancellation_reason: t.cancellationReason
+        }))
+      }
+    );
+    return response.data;
+  }
+
   async getOrderLogs(orderId: string): Promise<any[]> {
     const response = await apiClient.get(`${this.BASE_PATH}/${orderId}/logs`);
     return response.data;